@@ -12,24 +12,61 @@ import os
 import sys
 
 import anki
-from aqt import mw
+from aqt import gui_hooks, mw
 # pylint: disable=no-name-in-module
 from aqt.qt import QAction # type: ignore[attr-defined]
-from aqt.utils import qconnect
+from aqt.operations import QueryOp
+from aqt.utils import qconnect, show_info
 
 moduledir = os.path.dirname(__file__)
 sys.path.append(moduledir)
 sys.path.append(os.path.join(moduledir, 'vendor'))
 
+# Only what is needed for the menu and the hooks is imported when Anki
+# starts.  The dialog, the importer and python-chess are imported, when
+# they are used for the first time.
 # pylint: disable=wrong-import-order, wrong-import-position
-from .dialog import ImportDialog
+from .auto_import import AutoImport
 from .delete_hook import DeleteHook
 
 def show_import_dialog() -> None:
+	# pylint: disable=import-outside-toplevel
+	from .dialog import ImportDialog
+
 	dlg = ImportDialog()
 	dlg.exec()
 
 
+def remove_unused() -> None:
+	if mw is None or mw.col is None:
+		return
+
+	# pylint: disable=import-outside-toplevel
+	from .media_index import user_media_index
+	from .repair import remove_unused_images
+
+	def _remove(col) -> int:
+		return remove_unused_images(col, user_media_index(col.media.dir()))
+
+	def _on_success(count: int) -> None:
+		show_info(ngettext('%d unused image deleted.', '%d unused images deleted.',
+		                   count) % count)
+
+	op = QueryOp(parent=mw, op=_remove, success=_on_success)
+	op.with_progress().run_in_background()
+
+
+def migrate_media() -> None:
+	# An interrupted migration of the images continues.
+	# pylint: disable=import-outside-toplevel
+	from .media_migration import migration_journal
+	if mw is None or mw.col is None or not os.path.exists(migration_journal()):
+		return
+
+	from .dialog import start_media_migration
+	start_media_migration(mw)
+
+
 def init_i18n() -> None:
 	supported = ['en', 'en-GB', 'de']
 	lang = anki.lang.current_lang
@@ -51,8 +88,19 @@ def add_menu_item():
 	if mw is not None:
 		mw.form.menuTools.addAction(action)
 
+	# Full scan of the media directory, only done on request.
+	repair_action = QAction(_('Chess Opening Trainer: Delete Unused Images'), mw)
+	qconnect(repair_action.triggered, remove_unused)
+	if mw is not None:
+		mw.form.menuTools.addAction(repair_action)
+
 
 
 init_i18n()
 DeleteHook().installHook()
 add_menu_item()
+gui_hooks.profile_did_open.append(migrate_media)
+
+if mw is not None:
+	auto_import = AutoImport(mw)
+	auto_import.start()
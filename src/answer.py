@@ -32,8 +32,8 @@ class Answer(Page):
 		fen = parse.quote(self.board.fen(), safe="")
 		return f"https://lichess.org/analysis?fen={fen}"
 	
-	def extra_html(self, note_id: int) -> str:
-		rendered = super().extra_html(note_id)
+	def extra_html(self) -> str:
+		rendered = super().extra_html()
 		link = self.lichess_link()
 		if link is not None:
 			rendered += (
@@ -46,12 +46,12 @@ class Answer(Page):
 			)
 		return rendered
 
-	def render(self, note_id) -> str:
+	def render(self) -> str:
 		rendered = str(self.fullmove_number) + '.'
 		if not self.turn:
 			rendered += '...'
 		rendered += ' ' + self.move
-		rendered += self.extra_html(note_id)
+		rendered += self.extra_html()
 
 		return rendered
 
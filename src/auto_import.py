@@ -0,0 +1,123 @@
+# Copyright (C) 2023-2024 Guido Flohr <guido.flohr@cantanea.com>,
+# all rights reserved.
+
+# This program is free software. It comes without any warranty, to
+# the extent permitted by applicable law. You can redistribute it
+# and/or modify it under the terms of the Do What the Fuck You Want
+# to Public License, Version 2, as published by Sam Hocevar. See
+# http://www.wtfpl.net/ for more details.
+
+import os
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from anki.collection import Collection
+from aqt import AnkiQt
+from aqt.operations import QueryOp
+# pylint: disable=no-name-in-module
+from aqt.qt import QTimer # type: ignore[attr-defined]
+from aqt.utils import qconnect, tooltip
+
+from .watcher import FileWatcher, imported_states
+
+if TYPE_CHECKING:
+	from .parse_cache import ParseCache
+	from .sync import DeckImport, SyncResult
+
+# Milliseconds between two looks at the files.
+POLL_INTERVAL = 5000
+
+
+def _parse_cache() -> 'ParseCache':
+	# pylint: disable=import-outside-toplevel
+	from .parse_cache import ParseCache
+	from .utils import user_files_dir
+
+	return ParseCache(os.path.join(user_files_dir(), 'cache'))
+
+
+class AutoImport:
+	# Imports the files again in the background, when they have changed,
+	# if enabled in the configuration.
+	def __init__(self, main_window: AnkiQt) -> None:
+		self.mw = main_window
+		self.watcher: Optional[FileWatcher] = None
+		self.running = False
+		self.timer = QTimer(main_window)
+		qconnect(self.timer.timeout, self._poll)
+
+	def start(self) -> None:
+		self.timer.start(POLL_INTERVAL)
+
+	def _poll(self) -> None:
+		# Only one import at a time, and none while cards are reviewed.
+		# Changes are still there, when it is checked the next time.
+		if self.running or self.mw.col is None or self.mw.state == 'review':
+			return
+
+		config = self.mw.addonManager.getConfig(__name__)
+		if not config or not config.get('watch'):
+			return
+
+		# The importer is only loaded, when the files are watched.
+		# pylint: disable=import-outside-toplevel
+		from .sync import configured_imports
+
+		configured = configured_imports(config)
+		if self.watcher is None:
+			self.watcher = FileWatcher(
+			    imported_states(_parse_cache(), self.mw.col.path, configured))
+
+		imports = self.watcher.poll(configured)
+		if imports:
+			self._sync(config, imports)
+
+	def _sync(self, config: Dict[str, Any], imports: List['DeckImport']) -> None:
+		# pylint: disable=import-outside-toplevel
+		from .import_stats import import_log_path
+		from .media_index import user_media_index
+		from .sync import Sync
+
+		self.running = True
+		watcher = self.watcher
+		assert watcher is not None
+
+		def _do_sync(col: Collection) -> 'SyncResult':
+			sync = Sync(
+			    collection=col,
+			    imports=imports,
+			    notetype_id=config['notetype'],
+			    workers=config.get('workers', 1),
+			    cache=_parse_cache(),
+			    media_index=user_media_index(col.media.dir()),
+			)
+			results = sync.run()
+			sync.write_log(import_log_path(), results)
+
+			return sync, results
+
+		def _on_success(result: 'SyncResult') -> None:
+			self.running = False
+			watcher.imported(imports)
+			sync, results = result
+			names = [
+			    importer.deck['name']
+			    for importer, counts in zip(sync.importers, results) if sum(counts)
+			]
+			if names:
+				# A review that has started in the meantime is not
+				# interrupted.
+				if self.mw.state != 'review':
+					self.mw.reset()
+				tooltip(_('Chess Opening Trainer: Updated {decks}.').format(
+				    decks=', '.join(names)))
+
+		def _on_failure(e: Exception) -> None:
+			self.running = False
+			watcher.import_failed(imports)
+			tooltip(_('Chess Opening Trainer: Import failed: {error}').format(error=e))
+
+		QueryOp(
+		    parent=self.mw,
+		    op=_do_sync,
+		    success=_on_success,
+		).failure(_on_failure).run_in_background()
@@ -0,0 +1,258 @@
+# Copyright (C) 2023-2024 Guido Flohr <guido.flohr@cantanea.com>,
+# all rights reserved.
+
+# This program is free software. It comes without any warranty, to
+# the extent permitted by applicable law. You can redistribute it
+# and/or modify it under the terms of the Do What the Fuck You Want
+# to Public License, Version 2, as published by Sam Hocevar. See
+# http://www.wtfpl.net/ for more details.
+
+# Renders the same images as chess.svg.board() with the options that the
+# add-on uses.  Everything that does not depend on the position is
+# serialized once, and the images are put together from the cached
+# fragments.  This relies on the internals of python-chess 1.10.
+
+import math
+import xml.etree.ElementTree as ET
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import chess
+import chess.svg
+# pylint: disable=protected-access
+
+SQUARE_SIZE = chess.svg.SQUARE_SIZE
+MARGIN = 15
+FULL_SIZE = 2 * MARGIN + 8 * SQUARE_SIZE
+
+
+def _tostring(element: ET.Element) -> str:
+	return ET.tostring(element).decode('utf-8')
+
+
+def _xy(square: chess.Square, orientation: chess.Color) -> Tuple[int, int]:
+	file_index = chess.square_file(square)
+	rank_index = chess.square_rank(square)
+	x = (file_index if orientation else 7 - file_index) * SQUARE_SIZE + MARGIN
+	y = (7 - rank_index if orientation else rank_index) * SQUARE_SIZE + MARGIN
+
+	return x, y
+
+
+@lru_cache(maxsize=None)
+def _svg_tags() -> Tuple[str, str]:
+	svg = chess.svg._svg(FULL_SIZE, None)
+	ET.SubElement(svg, 'content')
+	start, end = _tostring(svg).split('<content />')
+
+	return start, end
+
+
+@lru_cache(maxsize=None)
+def _piece_def(symbol: str) -> str:
+	return _tostring(ET.fromstring(chess.svg.PIECES[symbol]))
+
+
+@lru_cache(maxsize=None)
+def _check_def() -> str:
+	return _tostring(ET.fromstring(chess.svg.CHECK_GRADIENT))
+
+
+@lru_cache(maxsize=None)
+def _frame(orientation: chess.Color) -> str:
+	# The margin and the coordinates.
+	svg = ET.Element('svg')
+	margin_color, _ = chess.svg._select_color({}, 'margin')
+	ET.SubElement(svg, 'rect', chess.svg._attrs({
+	    'x': MARGIN / 2,
+	    'y': MARGIN / 2,
+	    'width': FULL_SIZE - MARGIN,
+	    'height': FULL_SIZE - MARGIN,
+	    'fill': 'none',
+	    'stroke': margin_color,
+	    'stroke-width': MARGIN,
+	}))
+
+	coord_color, coord_opacity = chess.svg._select_color({}, 'coord')
+	for file_index, file_name in enumerate(chess.FILE_NAMES):
+		x = (file_index if orientation else 7 - file_index) * SQUARE_SIZE + MARGIN
+		for y in (1, FULL_SIZE - MARGIN):
+			svg.append(chess.svg._coord(file_name, x, y, SQUARE_SIZE, MARGIN, True,
+			                            MARGIN, color=coord_color,
+			                            opacity=coord_opacity))
+	for rank_index, rank_name in enumerate(chess.RANK_NAMES):
+		y = (7 - rank_index if orientation else rank_index) * SQUARE_SIZE + MARGIN
+		for x in (0, FULL_SIZE - MARGIN):
+			svg.append(chess.svg._coord(rank_name, x, y, MARGIN, SQUARE_SIZE, False,
+			                            MARGIN, color=coord_color,
+			                            opacity=coord_opacity))
+
+	return ''.join(_tostring(child) for child in svg)
+
+
+@lru_cache(maxsize=None)
+def _square(square: chess.Square, orientation: chess.Color,
+            lastmove: bool) -> str:
+	x, y = _xy(square, orientation)
+	cls = [
+	    'square',
+	    'light' if chess.BB_LIGHT_SQUARES & chess.BB_SQUARES[square] else 'dark'
+	]
+	if lastmove:
+		cls.append('lastmove')
+	square_color, _ = chess.svg._select_color({}, ' '.join(cls))
+	cls.append(chess.SQUARE_NAMES[square])
+
+	return _tostring(
+	    ET.Element('rect', chess.svg._attrs({
+	        'x': x,
+	        'y': y,
+	        'width': SQUARE_SIZE,
+	        'height': SQUARE_SIZE,
+	        'class': ' '.join(cls),
+	        'stroke': 'none',
+	        'fill': square_color,
+	    })))
+
+
+@lru_cache(maxsize=None)
+def _check(square: chess.Square, orientation: chess.Color) -> str:
+	x, y = _xy(square, orientation)
+
+	return _tostring(
+	    ET.Element('rect', chess.svg._attrs({
+	        'x': x,
+	        'y': y,
+	        'width': SQUARE_SIZE,
+	        'height': SQUARE_SIZE,
+	        'class': 'check',
+	        'fill': 'url(#check_gradient)',
+	    })))
+
+
+@lru_cache(maxsize=None)
+def _piece(piece: chess.Piece, square: chess.Square,
+           orientation: chess.Color) -> str:
+	x, y = _xy(square, orientation)
+	href = (f'#{chess.COLOR_NAMES[piece.color]}'
+	        f'-{chess.PIECE_NAMES[piece.piece_type]}')
+
+	return _tostring(
+	    ET.Element('use', {
+	        'href': href,
+	        'xlink:href': href,
+	        'transform': f'translate({x:d}, {y:d})',
+	    }))
+
+
+@lru_cache(maxsize=4096)
+def _arrow(tail: chess.Square, head: chess.Square, color: str,
+           orientation: chess.Color) -> str:
+	try:
+		color, opacity = chess.svg._select_color({}, 'arrow ' + color)
+	except KeyError:
+		opacity = 1.0
+
+	tail_file = chess.square_file(tail)
+	tail_rank = chess.square_rank(tail)
+	head_file = chess.square_file(head)
+	head_rank = chess.square_rank(head)
+
+	xtail = MARGIN + (tail_file + 0.5 if orientation else 7.5 - tail_file) * SQUARE_SIZE
+	ytail = MARGIN + (7.5 - tail_rank if orientation else tail_rank + 0.5) * SQUARE_SIZE
+	xhead = MARGIN + (head_file + 0.5 if orientation else 7.5 - head_file) * SQUARE_SIZE
+	yhead = MARGIN + (7.5 - head_rank if orientation else head_rank + 0.5) * SQUARE_SIZE
+
+	if tail == head:
+		return _tostring(
+		    ET.Element('circle', chess.svg._attrs({
+		        'cx': xhead,
+		        'cy': yhead,
+		        'r': SQUARE_SIZE * 0.9 / 2,
+		        'stroke-width': SQUARE_SIZE * 0.1,
+		        'stroke': color,
+		        'opacity': opacity if opacity < 1.0 else None,
+		        'fill': 'none',
+		        'class': 'circle',
+		    })))
+
+	marker_size = 0.75 * SQUARE_SIZE
+	marker_margin = 0.1 * SQUARE_SIZE
+
+	dx, dy = xhead - xtail, yhead - ytail
+	hypot = math.hypot(dx, dy)
+
+	shaft_x = xhead - dx * (marker_size + marker_margin) / hypot
+	shaft_y = yhead - dy * (marker_size + marker_margin) / hypot
+
+	xtip = xhead - dx * marker_margin / hypot
+	ytip = yhead - dy * marker_margin / hypot
+
+	line = ET.Element('line', chess.svg._attrs({
+	    'x1': xtail,
+	    'y1': ytail,
+	    'x2': shaft_x,
+	    'y2': shaft_y,
+	    'stroke': color,
+	    'opacity': opacity if opacity < 1.0 else None,
+	    'stroke-width': SQUARE_SIZE * 0.2,
+	    'stroke-linecap': 'butt',
+	    'class': 'arrow',
+	}))
+
+	marker = [(xtip, ytip),
+	          (shaft_x + dy * 0.5 * marker_size / hypot,
+	           shaft_y - dx * 0.5 * marker_size / hypot),
+	          (shaft_x - dy * 0.5 * marker_size / hypot,
+	           shaft_y + dx * 0.5 * marker_size / hypot)]
+
+	polygon = ET.Element('polygon', chess.svg._attrs({
+	    'points': ' '.join(f'{x},{y}' for x, y in marker),
+	    'fill': color,
+	    'opacity': opacity if opacity < 1.0 else None,
+	    'class': 'arrow',
+	}))
+
+	return _tostring(line) + _tostring(polygon)
+
+
+def render(fen: str, lastmove: Optional[chess.Move], check: Optional[chess.Square],
+           arrows: Iterable[Tuple[chess.Square, chess.Square, str]],
+           orientation: chess.Color) -> str:
+	board = chess.BaseBoard(fen.split(' ', 1)[0])
+	start, end = _svg_tags()
+	parts: List[str] = [start, '<desc><pre>', str(board), '</pre></desc>']
+
+	defs = [
+	    _piece_def(chess.Piece(piece_type, piece_color).symbol())
+	    for piece_color in chess.COLORS for piece_type in chess.PIECE_TYPES
+	    if board.pieces_mask(piece_type, piece_color)
+	]
+	if check is not None:
+		defs.append(_check_def())
+	if defs:
+		parts += ['<defs>', *defs, '</defs>']
+	else:
+		parts.append('<defs />')
+
+	parts.append(_frame(orientation))
+
+	highlighted = (lastmove.from_square, lastmove.to_square) if lastmove else ()
+	for square in chess.SQUARES:
+		parts.append(_square(square, orientation, square in highlighted))
+
+	if check is not None:
+		parts.append(_check(check, orientation))
+
+	pieces: Dict[chess.Square, chess.Piece] = board.piece_map()
+	for square in chess.SQUARES:
+		piece = pieces.get(square)
+		if piece is not None:
+			parts.append(_piece(piece, square, orientation))
+
+	for tail, head, color in arrows:
+		parts.append(_arrow(tail, head, color, orientation))
+
+	parts.append(end)
+
+	return ''.join(parts)
@@ -0,0 +1,44 @@
+# Copyright (C) 2023-2024 Guido Flohr <guido.flohr@cantanea.com>,
+# all rights reserved.
+
+# This program is free software. It comes without any warranty, to
+# the extent permitted by applicable law. You can redistribute it
+# and/or modify it under the terms of the Do What the Fuck You Want
+# to Public License, Version 2, as published by Sam Hocevar. See
+# http://www.wtfpl.net/ for more details.
+
+
+from typing import Dict
+
+from .question import Question
+
+
+class CardSet:
+
+
+	# pylint: disable=too-few-public-methods
+	def __init__(self, merge_transpositions: bool = False) -> None:
+		self.merge_transpositions = merge_transpositions
+		self.cards: Dict[str, Question] = {}
+		self.positions: Dict[int, str] = {}
+
+	# Merges the cards read from one file into the set.  Merging the
+	# results of the files in order gives exactly the same cards as reading
+	# all of them with one visitor.  Answers that are already known are
+	# dropped with their comments, and the visitor ignores the comments on
+	# them, too.
+	def merge(self, cards: Dict[str, Question]) -> None:
+		for text, question in cards.items():
+			if (self.merge_transpositions and text not in self.cards
+			    and question.position in self.positions):
+				text = self.positions[question.position]
+
+			if text not in self.cards:
+				self.cards[text] = question
+				self.positions.setdefault(question.position, text)
+				continue
+
+			target = self.cards[text]
+			for answer in question.answers:
+				if not answer.find(target.answers):
+					target.add_answer(answer)
@@ -0,0 +1,206 @@
+# Copyright (C) 2023-2024 Guido Flohr <guido.flohr@cantanea.com>,
+# all rights reserved.
+
+# This program is free software. It comes without any warranty, to
+# the extent permitted by applicable law. You can redistribute it
+# and/or modify it under the terms of the Do What the Fuck You Want
+# to Public License, Version 2, as published by Sam Hocevar. See
+# http://www.wtfpl.net/ for more details.
+
+# Imports without Anki's user interface, for example from cron.  Nothing
+# here may import aqt.
+
+import argparse
+import gettext
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+
+from anki.collection import Collection
+from anki.models import NotetypeId
+
+from .import_stats import IMPORT_LOG
+from .importer import Importer
+from .media_index import MEDIA_INDEX, MediaIndex
+from .parse_cache import ParseCache, import_key
+from .sync import DeckImport, Sync, configured_imports
+from .utils import user_files_dir
+from .visitor import localisation
+
+LOCALE_DIR = os.path.join(os.path.dirname(__file__), 'locale')
+
+
+def install_translations(lang: str) -> None:
+	# The card keys contain translated text.  The language must therefore
+	# be the same as in Anki, or all notes are replaced.
+	translations = gettext.translation('anki-chess-opening-trainer',
+	                                   localedir=LOCALE_DIR,
+	                                   languages=[lang],
+	                                   fallback=True)
+	translations.install(names=['ngettext'])
+
+
+def import_language(cache: ParseCache, collection: Collection,
+                    imports: List[DeckImport], lang: Optional[str]) -> str:
+	# The language of the last imports into the decks.  It is not recorded
+	# itself, but the translated strings in the card keys are.
+	options = []
+	for deck_import in imports:
+		record = cache.last_import(import_key(collection.path, deck_import.deck_id))
+		if record is not None:
+			options.append(record['options'])
+	if not options:
+		return lang or 'en'
+
+	def matches(candidate: str) -> bool:
+		install_translations(candidate)
+		strings = repr(localisation())
+		return all(strings in record for record in options)
+
+	if lang is not None:
+		if not matches(lang):
+			raise ValueError(
+			    _('The decks were last imported in another language.  Importing'
+			      ' them in this language would replace all notes.'))
+		return lang
+
+	for candidate in sorted(os.listdir(LOCALE_DIR)):
+		if matches(candidate):
+			return candidate
+
+	raise ValueError(_('The language of the last import is not known.'
+	                   '  Please select it with --lang.'))
+
+
+def read_config(filename: Optional[str]) -> Dict[str, Any]:
+	# Anki keeps the configuration of the user in meta.json, and falls back
+	# to the defaults in config.json.
+	directory = os.path.dirname(__file__)
+	if filename is None:
+		filename = os.path.join(directory, 'meta.json')
+		if not os.path.exists(filename):
+			filename = os.path.join(directory, 'config.json')
+
+	with open(filename, encoding='utf-8') as file:
+		data = json.load(file)
+
+	if 'config' in data and 'imports' not in data:
+		data = data['config']
+
+	return data
+
+
+def deck_imports(collection: Collection, config: Dict[str, Any],
+                 args: argparse.Namespace) -> List[DeckImport]:
+	if args.deck is None:
+		return configured_imports(config)
+
+	deck_id = collection.decks.id_for_name(args.deck)
+	if deck_id is None:
+		raise KeyError(_('Selected deck does not exist!'))
+
+	# Missing options are taken from the last import into the deck.
+	record = config['imports'].get(str(deck_id), {})
+	colour = args.colour or record.get('colour', 'white')
+	files = args.files or record.get('files', [])
+	merge_transpositions = args.merge_transpositions or record.get(
+	    'merge_transpositions', False)
+
+	# Without files, all notes of the deck would be deleted.
+	if not files:
+		raise ValueError(_('No input files specified!'))
+
+	return [DeckImport(deck_id, colour, files, merge_transpositions)]
+
+
+def notetype_id(collection: Collection, config: Dict[str, Any],
+                name: Optional[str]) -> NotetypeId:
+	if name is not None:
+		notetype = collection.models.id_for_name(name)
+		if notetype is None:
+			raise KeyError(_('Selected note type does not exist!'))
+		return notetype
+
+	if config.get('notetype') is not None:
+		return NotetypeId(config['notetype'])
+
+	basic = collection.models.id_for_name('Basic')
+	if basic is None:
+		raise KeyError(_('Selected note type does not exist!'))
+
+	return basic
+
+
+def report(importer: Importer, counts: Tuple[int, int, int, int, int],
+           out: TextIO) -> None:
+	print(f'{importer.deck["name"]}: {counts[0]} inserted, {counts[1]} updated,'
+	      f' {counts[2]} deleted, {counts[3]} images created,'
+	      f' {counts[4]} images deleted', file=out)
+	for phase, times in importer.stats.phases.items():
+		print(f'  {phase}: {times.wall:.2f} s ({times.cpu:.2f} s CPU)', file=out)
+	for counter, value in importer.stats.counters.items():
+		print(f'  {counter}: {value}', file=out)
+
+
+def parse_args(argv: Optional[List[str]]) -> argparse.Namespace:
+	parser = argparse.ArgumentParser(
+	    description='Import PGN files into an Anki collection without Anki.'
+	    '  Without --deck, all imports of the add-on configuration are'
+	    ' repeated.  Anki must not have the collection open.')
+	parser.add_argument('collection', help='the collection file (.anki2)')
+	parser.add_argument('files', nargs='*', help='the PGN files for --deck')
+	parser.add_argument('--deck', help='the name of the deck to import into')
+	parser.add_argument('--colour', choices=['white', 'black'])
+	parser.add_argument('--notetype', help='the name of the note type')
+	parser.add_argument('--merge-transpositions', action='store_true')
+	parser.add_argument('--workers', type=int, help='0 for one per CPU')
+	parser.add_argument('--config',
+	                    help='the configuration, by default the one of the add-on')
+	parser.add_argument('--user-files',
+	                    default=user_files_dir(),
+	                    help='the directory for the caches and the log')
+	parser.add_argument('--lang',
+	                    help='the language of Anki, by default the one of the'
+	                    ' last import, and "en" for decks never imported')
+
+	# The files may come after the options.
+	return parser.parse_intermixed_args(argv)
+
+
+def main(argv: Optional[List[str]] = None, out: TextIO = sys.stdout) -> int:
+	args = parse_args(argv)
+	install_translations(args.lang or 'en')
+
+	config = read_config(args.config)
+	workers = args.workers if args.workers is not None else config.get('workers', 1)
+
+	collection = Collection(args.collection)
+	try:
+		cache = ParseCache(os.path.join(args.user_files, 'cache'))
+		imports = deck_imports(collection, config, args)
+		install_translations(import_language(cache, collection, imports, args.lang))
+		sync = Sync(
+		    collection=collection,
+		    imports=imports,
+		    notetype_id=notetype_id(collection, config, args.notetype),
+		    workers=workers,
+		    cache=cache,
+		    media_index=MediaIndex(os.path.join(args.user_files, MEDIA_INDEX),
+		                           collection.media.dir()),
+		)
+		results = sync.run()
+		sync.write_log(os.path.join(args.user_files, IMPORT_LOG), results)
+		for importer, counts in zip(sync.importers, results):
+			report(importer, counts, out)
+		for phase, times in sync.stats.phases.items():
+			print(f'{phase}: {times.wall:.2f} s ({times.cpu:.2f} s CPU)', file=out)
+	except (KeyError, ValueError, OSError) as e:
+		# The message of a KeyError would be quoted.
+		message = e.args[0] if isinstance(e, KeyError) else e
+		print(f'{sys.argv[0]}: {message}', file=sys.stderr)
+		return 1
+	finally:
+		collection.close()
+
+	return 0
@@ -7,37 +7,62 @@
 # to Public License, Version 2, as published by Sam Hocevar. See
 # http://www.wtfpl.net/ for more details.
 
-from typing import Any, cast
-from jsonschema import ValidationError, validate
+import hashlib
+import json
+from typing import Any, Optional, cast
 
 from aqt import mw
 from aqt.utils import showCritical
 
 from .config import Config
+from .media_migration import migration_journal, schedule_migration
 from .version import __version__
-from .schema import schema
 from .updater import Updater
+from .validator import ValidationError, validate
+
+
+def config_digest(config: Any) -> str:
+	return hashlib.sha1(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()
 
 
 class ConfigReader:
 	# pylint: disable=too-few-public-methods
+
+	# The digest of the configuration that was last validated and written
+	# in this session.  The configuration is still read every time because
+	# the dialog and the user can change it.
+	validated: Optional[str] = None
+
 	def __init__(self) -> None:
 		if mw is None:
 			raise RuntimeError(_('Cannot run without main window!'))
 
 		raw_config = mw.addonManager.getConfig(__name__)
+		digest = config_digest(raw_config)
+		if (raw_config and raw_config.get('version') == __version__
+		    and digest == ConfigReader.validated):
+			self.config: Config = cast(Config, raw_config)
+			return
 
 		updater = Updater(__version__)
 		raw_config = updater.update_config(raw_config)
 
 		try:
-			validate(raw_config, schema=schema)
-			mw.addonManager.writeConfig(__name__, cast(dict[Any, Any], raw_config))
+			validate(raw_config)
 		except ValidationError:
 			showCritical(_('Your add-on configuration is invalid, restoring defaults.'))
 			raw_config = updater.update_config(None)
+		else:
+			updated = config_digest(raw_config)
+			if updated != digest:
+				mw.addonManager.writeConfig(__name__, cast(dict[Any, Any], raw_config))
+			ConfigReader.validated = updated
+
+		if updater.migrate_media:
+			# The images are renamed in the background.
+			schedule_migration(migration_journal())
 
-		self.config:Config = cast(Config, raw_config)
+		self.config = cast(Config, raw_config)
 
 
 	def get_config(self):
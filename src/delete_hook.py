@@ -1,22 +1,48 @@
-from typing import List, Sequence
+from typing import TYPE_CHECKING, Callable, Optional, Sequence
 
 from anki import hooks
 from anki.collection import Collection
 from anki.notes import NoteId
+from anki.utils import ids2str
 
-from .utils import find_media_files
+if TYPE_CHECKING:
+	from .media_index import MediaIndex
 
 class DeleteHook:
 
 
 	# pylint: disable=too-few-public-methods
+	def __init__(self,
+	             media_index: Optional[Callable[[str], 'MediaIndex']] = None):
+		self.media_index = media_index
+
 	def installHook(self): # pylint: disable=invalid-name
 		def on_notes_delete(collection: Collection, int_note_ids: Sequence[NoteId]):
-			mm = collection.media
-			media_path = mm.dir()
-			note_ids: List[str] = [str(note_id) for note_id in int_note_ids]
-			orphans = find_media_files(media_path, note_ids)
+			# Only the fields of the deleted notes are read.  Images with the
+			# note id in the name are also referenced there.  Nothing else
+			# is done, if none of the notes has images of the add-on.
+			ids = ids2str(int_note_ids)
+			rows = collection.db.list(
+			    f'SELECT flds FROM notes WHERE id IN {ids}'
+			    " AND flds LIKE '%chess-opening-trainer-%'")
+			if not rows:
+				return
+
+			# pylint: disable=import-outside-toplevel
+			from .media_index import user_media_index
+			from .utils import media_references, referenced_media
 
-			mm.trash_files(orphans)
+			# The notes are still there.  Images can be shared with other
+			# notes, and are only deleted when nobody else uses them.
+			candidates = media_references(rows)
+			orphans = candidates - referenced_media(collection, int_note_ids)
+			if not orphans:
+				return
+
+			mm = collection.media
+			media_index = (self.media_index or user_media_index)(mm.dir())
+			mtime_ns = media_index.mtime_ns()
+			mm.trash_files(list(orphans))
+			media_index.update(removed=orphans, mtime_ns=mtime_ns)
 
 		hooks.notes_will_be_deleted.append(on_notes_delete)
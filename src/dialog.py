@@ -9,14 +9,16 @@
 
 import os
 import html
+import time
 from pathlib import Path
 import traceback
-from typing import List, Literal, Union
+from typing import Dict, List, Literal, Optional, Tuple, Union
 
 from aqt import mw, AnkiQt
 from aqt.operations import QueryOp
 # pylint: disable=no-name-in-module
-from aqt.qt import (QComboBox, QDialog, # type: ignore[attr-defined]
+from aqt.qt import (QCheckBox, QComboBox, # type: ignore[attr-defined]
+                    QDialog, # type: ignore[attr-defined]
                     QDialogButtonBox, QFileDialog, # type: ignore[attr-defined]
                     QGridLayout, QLabel, # type: ignore[attr-defined]
                     QListWidget, QListWidgetItem, # type: ignore[attr-defined]
@@ -24,11 +26,147 @@ from aqt.qt import (QComboBox, QDialog, # type: ignore[attr-defined]
                     QDesktopServices, QUrl, # type: ignore[attr-defined]
                     QApplication, # type: ignore[attr-defined]
 ) # type: ignore[attr-defined]
-from aqt.utils import show_critical, show_info, show_warning
+from aqt.utils import ask_user, show_critical, show_info, show_warning
 from anki.utils import no_bundled_libs
 
-from .importer import Importer
+from .importer import Importer, ImportPlan
+from .import_stats import ImportStats, import_log_path, profiled
 from .config_reader import ConfigReader
+from .media_index import user_media_index
+from .media_migration import MediaMigration, migration_journal
+from .parse_cache import ParseCache
+from .progress import ImportCancelled, Progress
+from .sync import Sync, SyncResult, configured_imports
+from .utils import user_files_dir
+
+
+ImportResult = Tuple[Tuple[int, int, int, int, int], ImportStats]
+
+
+def _format_size(size: int) -> str:
+	return f'{size / (1 << 20):.1f} MB'
+
+
+def _phase_names() -> Dict[str, str]:
+	return {
+	    'fingerprints': _('checking files'),
+	    'parse': _('reading files'),
+	    'read notes': _('reading notes'),
+	    'diff': _('comparing notes'),
+	    'write notes': _('writing notes'),
+	    'render images': _('creating images'),
+	    'trash images': _('deleting images'),
+	    'save cache': _('saving cache'),
+	    'migrate images': _('migrating images'),
+	}
+
+
+class DialogProgress(Progress):
+	# Shows the progress in Anki's progress window.  Closing it cancels the
+	# import.
+	def __init__(self, main_window: AnkiQt) -> None:
+		self.mw = main_window
+		self.names = _phase_names()
+		self.last_update = 0.0
+
+	def update(self, phase: str, done: int, total: int) -> None:
+		# Updating the window from the background costs more than most
+		# steps of the import.
+		now = time.monotonic()
+		if now - self.last_update < 0.1 and done < total:
+			return
+		self.last_update = now
+
+		# TRANSLATORS: The placeholders are a step of the import, and
+		# the number of items done, and to do, in that step.
+		label = _('{phase}: {done} of {total}').format(
+		    phase=self.names.get(phase, phase), done=done, total=total)
+		self.mw.taskman.run_on_main(
+		    lambda: self.mw.progress.update(label=label, value=done, max=total))
+
+	def cancelled(self) -> bool:
+		return self.mw.progress.want_cancel()
+
+
+def _describe_counts(counts: Tuple[int, int, int, int, int]) -> str:
+	if sum(counts) == 0:
+		return _('No changes since last import into this deck.')
+
+	msgs = (
+		ngettext('%d note inserted.', '%d notes inserted.',
+				counts[0]) % (counts[0]),
+		ngettext('%d note updated.', '%d notes updated.', counts[1]) %
+		(counts[1]),
+		ngettext('%d note deleted.', '%d notes deleted.', counts[2]) %
+		(counts[2]),
+		ngettext('%d image created.', '%d images created.',
+				counts[3]) % (counts[3]),
+		ngettext('%d image deleted.', '%d images deleted.',
+				counts[4]) % (counts[4]),
+	)
+
+	return ' '.join(msgs)
+
+
+def _describe_stats(stats: ImportStats) -> str:
+	names = _phase_names()
+	phases = ', '.join(
+	    # TRANSLATORS: A step of the import and the seconds that it took.
+	    _('{phase} {seconds:.1f} s').format(phase=names.get(name, name),
+	                                        seconds=phase.wall)
+	    for name, phase in stats.phases.items())
+	counters = stats.counters
+	msgs = (
+	    _('The import took {seconds:.1f} s ({phases}).').format(
+	        seconds=stats.wall_time(), phases=phases),
+	    ngettext('%d game read.', '%d games read.', counters['games']) %
+	    (counters['games']),
+	    ngettext('%d move read.', '%d moves read.', counters['plies']) %
+	    (counters['plies']),
+	    # TRANSLATORS: The placeholder is a size like "12.3 MB".
+	    _('{written} written.').format(
+	        written=_format_size(counters['bytes written'])),
+	)
+
+	return ' '.join(msgs)
+
+
+# Only one migration of the images runs at a time.
+_migrating = False
+
+
+def start_media_migration(main_window: AnkiQt) -> None:
+	# Migrates the images of old versions in the background, continuing
+	# where an interrupted migration has stopped.
+	global _migrating # pylint: disable=global-statement
+	if _migrating or not os.path.exists(migration_journal()):
+		return
+	_migrating = True
+
+	def _do_migrate(col) -> Union[Exception, int]:
+		try:
+			return MediaMigration(col, migration_journal(),
+			                      DialogProgress(main_window)).run()
+		except Exception as e: # pylint: disable=broad-except
+			return e
+
+	def _on_success(result: Union[Exception, int]) -> None:
+		global _migrating # pylint: disable=global-statement
+		_migrating = False
+		if isinstance(result, ImportCancelled):
+			show_info(_('The migration of the images was cancelled.'
+			            '  It continues, when Anki is started again.'))
+		elif isinstance(result, Exception):
+			show_warning(_('The migration of the images failed: {error}').format(
+			    error=result))
+		elif result:
+			main_window.reset()
+
+	QueryOp(
+		parent=main_window,
+		op=_do_migrate,
+		success=_on_success,
+	).with_progress(_('Migrating images')).run_in_background()
 
 
 class ImportDialog(QDialog):
@@ -43,6 +181,8 @@ class ImportDialog(QDialog):
 
 		self.mw = mw
 		self.config = ConfigReader().get_config()
+		# The update of the configuration may have scheduled it.
+		start_media_migration(mw)
 
 		self.setWindowTitle(_('Import PGN File'))
 
@@ -96,15 +236,25 @@ class ImportDialog(QDialog):
 		if current_index >= 0:
 			self.model_combo.setCurrentIndex(current_index)
 
+		self.transpositions_checkbox = QCheckBox(
+		    _('Merge positions reached by different move orders'))
+		layout.addWidget(self.transpositions_checkbox, 4, 1)
+
 		btn = QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel
 		self.button_box = QDialogButtonBox(btn)
 		layout.addWidget(self.button_box,
-		                 4,
+		                 5,
 		                 0,
 		                 1,
 		                 3,
 		                 alignment=Qt.AlignmentFlag.AlignRight)
 		self.button_box.accepted.connect(self.accept)
+		self.dry_run_button = self.button_box.addButton(
+		    _('Dry Run'), QDialogButtonBox.ButtonRole.ActionRole)
+		self.dry_run_button.clicked.connect(self._dry_run)
+		self.sync_all_button = self.button_box.addButton(
+		    _('Sync All Decks'), QDialogButtonBox.ButtonRole.ActionRole)
+		self.sync_all_button.clicked.connect(self._sync_all)
 		self.button_box.rejected.connect(self.reject)
 		self._fill_dialog()
 		self.colour_combo.currentIndexChanged.connect(self._colour_changed)
@@ -137,11 +287,14 @@ class ImportDialog(QDialog):
 					break
 
 			self.file_list.clear()
+			self.transpositions_checkbox.setChecked(False)
 
 			if str(deck_id) in config['imports']:
 				record = config['imports'][str(deck_id)]
 				for filename in record['files']:
 					self.file_list.addItem(filename)
+				self.transpositions_checkbox.setChecked(
+				    record.get('merge_transpositions', False))
 
 		self.updating = False
 
@@ -151,6 +304,7 @@ class ImportDialog(QDialog):
 		self.updating = True
 
 		self.file_list.clear()
+		self.transpositions_checkbox.setChecked(False)
 
 		deck_name = self.deck_combo.currentText()
 		deck_id = self.mw.col.decks.id_for_name(deck_name)
@@ -161,6 +315,8 @@ class ImportDialog(QDialog):
 
 			for filename in record['files']:
 				self.file_list.addItem(filename)
+			self.transpositions_checkbox.setChecked(
+			    record.get('merge_transpositions', False))
 
 		self.updating = False
 
@@ -196,6 +352,8 @@ class ImportDialog(QDialog):
 				record = config['imports'][str(deck_id)]
 				for filename in record['files']:
 					self.file_list.addItem(filename)
+				self.transpositions_checkbox.setChecked(
+				    record.get('merge_transpositions', False))
 
 		if config['notetype'] is not None:
 			notetype_id = config['notetype']
@@ -207,66 +365,190 @@ class ImportDialog(QDialog):
 						break
 
 	def accept(self) -> None:
+		self._run_import(dry_run=False)
+
+	def _dry_run(self) -> None:
+		self._run_import(dry_run=True)
+
+	def _sync_all(self) -> None:
+		# Every deck that has been imported before is imported again.
 		assert isinstance(mw, AnkiQt)
 
-		def _on_success(counts: Union[Exception, tuple[int, int, int, int, int]]):
-			if isinstance(counts, Exception):
-				x = counts
-				if isinstance(x, OSError):
-					# pylint: disable=consider-using-f-string
-					show_critical(_('There was an error importing a file: {error}'.format(error=x)))
-				else:
-					self._show_exception(counts)
+		def _do_sync(_) -> Union[Exception, SyncResult]:
+			try:
+				return self._sync(self._create_sync())
+			except Exception as e: # pylint: disable=broad-except
+				return e
+
+		def _on_success(result: Union[Exception, SyncResult]):
+			if isinstance(result, ImportCancelled):
+				self._on_cancelled()
 				return
 
-			if sum(counts) == 0:
-				msg = _('No changes since last import into this deck.')
-			else:
-				msgs = (
-					ngettext('%d note inserted.', '%d notes inserted.',
-							counts[0]) % (counts[0]),
-					ngettext('%d note updated.', '%d notes updated.', counts[1]) %
-					(counts[1]),
-					ngettext('%d note deleted.', '%d notes deleted.', counts[2]) %
-					(counts[2]),
-					ngettext('%d image created.', '%d images created.',
-							counts[3]) % (counts[3]),
-					ngettext('%d image deleted.', '%d images deleted.',
-							counts[4]) % (counts[4]),
-				)
-				msg = ' '.join(msgs)
+			if isinstance(result, Exception):
+				self._show_error(result)
+				return
+
+			sync, results = result
+			stats = ImportStats()
+			stats.add(sync.stats)
+			msgs: List[str] = []
+			for importer, counts in zip(sync.importers, results):
+				stats.add(importer.stats)
+				msgs.append('<b>' + html.escape(importer.deck['name']) + '</b>: ' +
+				            _describe_counts(counts))
 
 			mw.reset()
 			mw.addonManager.writeConfig(__name__, self.config)
 
-			show_info(msg)
+			show_info('<br>'.join(msgs) + '<br><br>' + _describe_stats(stats))
+
+		if not self._save_config():
+			return
+
+		if not configured_imports(self.config):
+			show_critical(_('No input files specified!'))
+			return
+
+		QueryOp(
+			parent=mw,
+			op=_do_sync,
+			success=_on_success,
+		).with_progress().run_in_background()
+		super().accept()
+
+	def _create_sync(self) -> Sync:
+		assert isinstance(mw, AnkiQt)
+
+		return Sync(
+			collection=mw.col,
+			imports=configured_imports(self.config),
+			notetype_id=self.config['notetype'],
+			workers=self.config['workers'],
+			cache=ParseCache(os.path.join(user_files_dir(), 'cache')),
+			media_index=user_media_index(mw.col.media.dir()),
+			progress=DialogProgress(mw),
+		)
+
+	def _sync(self, sync: Sync) -> SyncResult:
+		profile_dir = os.path.join(user_files_dir(), 'profiles')
+		with profiled(self.config['profile'], profile_dir):
+			results = sync.run()
+		sync.write_log(import_log_path(), results)
+
+		return sync, results
+
+	def _on_cancelled(self) -> None:
+		# The notes written so far are kept.  The next import continues
+		# from there.
+		assert isinstance(mw, AnkiQt)
+		mw.reset()
+		mw.addonManager.writeConfig(__name__, self.config)
+		show_info(_('The import was cancelled.  Import again to complete it.'))
+
+	def _create_importer(self) -> Importer:
+		assert isinstance(mw, AnkiQt)
+		colour = self.config['colour']
+		deck_id = self.config['decks'][colour]
+		record = self.config['imports'][str(deck_id)]
+		filenames = record['files']
+		notetype_id = self.config['notetype']
+
+		return Importer(
+			collection=mw.col,
+			deck_id=deck_id,
+			notetype_id=notetype_id,
+			filenames=filenames,
+			colour=('white' == colour),
+			merge_transpositions=record.get('merge_transpositions', False),
+			workers=self.config['workers'],
+			cache=ParseCache(os.path.join(user_files_dir(), 'cache')),
+			media_index=user_media_index(mw.col.media.dir()),
+			progress=DialogProgress(mw),
+		)
+
+	def _show_error(self, x: Exception) -> None:
+		if isinstance(x, OSError):
+			# pylint: disable=consider-using-f-string
+			show_critical(_('There was an error importing a file: {error}'.format(error=x)))
+		else:
+			self._show_exception(x)
 
-		def _do_import(_) -> Union[Exception, tuple[int, int, int, int, int]]:
+	def _run_import(self, dry_run: bool) -> None:
+		assert isinstance(mw, AnkiQt)
+
+		def _on_success(result: Union[Exception, ImportResult]):
+			if isinstance(result, ImportCancelled):
+				self._on_cancelled()
+				return
+
+			if isinstance(result, Exception):
+				self._show_error(result)
+				return
+
+			counts, stats = result
+
+			mw.reset()
+			mw.addonManager.writeConfig(__name__, self.config)
+
+			show_info(_describe_counts(counts) + '<br><br>' + _describe_stats(stats))
+
+		def _do_import(_) -> Union[Exception, ImportResult]:
+			try:
+				return self._import(self._create_importer())
+			except Exception as e: # pylint: disable=broad-except
+				return e
+
+		def _do_plan(_) -> Union[Exception, Tuple[Importer, ImportPlan]]:
 			try:
-				colour = self.config['colour']
-				deck_id = self.config['decks'][colour]
-				record = self.config['imports'][str(deck_id)]
-				filenames = record['files']
-				notetype_id = self.config['notetype']
-
-				importer = Importer(
-					collection=mw.col,
-					deck_id=deck_id,
-					notetype_id=notetype_id,
-					filenames=filenames,
-					colour=('white' == colour),
-				)
-
-				return importer.run()
+				importer = self._create_importer()
+				return importer, importer.plan()
 			except Exception as e: # pylint: disable=broad-except
 				return e
 
+		def _on_planned(result: Union[Exception, Tuple[Importer, ImportPlan]]):
+			# Nothing has been written yet, and the dialog is still open.
+			if isinstance(result, ImportCancelled):
+				return
+
+			if isinstance(result, Exception):
+				self._show_error(result)
+				return
+
+			importer, plan = result
+
+			def _do_apply(_) -> Union[Exception, ImportResult]:
+				try:
+					return self._import(importer, plan)
+				except Exception as e: # pylint: disable=broad-except
+					return e
+
+			def _on_answer(apply: bool) -> None:
+				if apply:
+					QueryOp(
+						parent=mw,
+						op=_do_apply,
+						success=_on_success,
+					).with_progress().run_in_background()
+					super(ImportDialog, self).accept()
+
+			if sum(plan.counts()) == 0:
+				show_info(_('No changes since last import into this deck.'))
+			else:
+				ask_user(self._describe_plan(plan), _on_answer, parent=self)
+
 		if not self.file_list.count():
 			show_critical(_('No input files specified!'))
 			self.reject()
 
 		if not self._save_config():
 			self.reject()
+		elif dry_run:
+			QueryOp(
+				parent=self,
+				op=_do_plan,
+				success=_on_planned,
+			).with_progress().run_in_background()
 		else:
 			assert isinstance(mw, AnkiQt)
 			op = QueryOp(
@@ -277,6 +559,46 @@ class ImportDialog(QDialog):
 			op.with_progress().run_in_background()
 			super().accept()
 
+	def _import(self,
+	            importer: Importer,
+	            plan: Optional[ImportPlan] = None) -> ImportResult:
+		profile_dir = os.path.join(user_files_dir(), 'profiles')
+		with profiled(self.config['profile'], profile_dir):
+			if plan is None:
+				counts = importer.run()
+			else:
+				counts = importer.apply(plan)
+
+		importer.stats.write_log(import_log_path(),
+		                         deck=importer.deck['id'],
+		                         files=importer.filenames,
+		                         counts=list(counts))
+
+		return counts, importer.stats
+
+	def _describe_plan(self, plan: ImportPlan) -> str:
+		assert isinstance(mw, AnkiQt)
+		counts = plan.counts()
+		written, trashed = plan.estimated_bytes(mw.col.media.dir())
+		msgs = (
+			ngettext('%d note will be inserted.', '%d notes will be inserted.',
+					counts[0]) % (counts[0]),
+			ngettext('%d note will be updated.', '%d notes will be updated.',
+					counts[1]) % (counts[1]),
+			ngettext('%d note will be deleted.', '%d notes will be deleted.',
+					counts[2]) % (counts[2]),
+			ngettext('%d image will be created.', '%d images will be created.',
+					counts[3]) % (counts[3]),
+			ngettext('%d image will be deleted.', '%d images will be deleted.',
+					counts[4]) % (counts[4]),
+			# TRANSLATORS: The placeholders are sizes like "12.3 MB".
+			_('About {written} will be written, and {trashed} moved to the trash.').format(
+				written=_format_size(written), trashed=_format_size(trashed)),
+			'<br><br>' + _('Import now?'),
+		)
+
+		return ' '.join(msgs)
+
 	def _show_exception(self, e: Exception):
 		ftb = list(traceback.format_tb(e.__traceback__))
 
@@ -370,6 +692,7 @@ class ImportDialog(QDialog):
 		self.config['imports'][str(deck_id)] = {
 			'colour': colour,
 			'files': files,
+			'merge_transpositions': self.transpositions_checkbox.isChecked(),
 		}
 
 		self.config['notetype'] = notetype_id
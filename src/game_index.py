@@ -0,0 +1,135 @@
+# Copyright (C) 2023-2024 Guido Flohr <guido.flohr@cantanea.com>,
+# all rights reserved.
+
+# This program is free software. It comes without any warranty, to
+# the extent permitted by applicable law. You can redistribute it
+# and/or modify it under the terms of the Do What the Fuck You Want
+# to Public License, Version 2, as published by Sam Hocevar. See
+# http://www.wtfpl.net/ for more details.
+
+
+import hashlib
+import json
+import mmap
+import os
+import re
+from typing import List, Tuple, Union
+
+# Everything that matters for finding the start of the games: comments
+# (which may contain empty lines) and an empty line followed by a header.
+# Escaped lines and rest-of-line comments may contain braces.
+SCAN_REGEX = re.compile(
+    rb"""
+	(?P<comment>\{)
+	|;[^\n]*
+	|\n(?:
+		[ \t\r\f\v]*\n(?P<header>\[)
+		|%[^\n]*
+	)
+	""", re.VERBOSE)
+
+BOM = '\ufeff'.encode('utf-8')
+
+INDEX_VERSION = 1
+
+
+def scan_game_offsets(data: Union[bytes, mmap.mmap]) -> List[int]:
+	# Returns the offsets of all header blocks that follow an empty line.
+	# These are the positions where chess.pgn.read_game() starts reading a
+	# new game.  Games without headers are not found and are just read
+	# together with the game before.
+	offsets = [0]
+	pos = 0
+	if data[:1] == b'%':
+		pos = data.find(b'\n')
+	while True:
+		match = SCAN_REGEX.search(data, pos)
+		if match is None:
+			break
+
+		if match.group('comment') is not None:
+			end = data.find(b'}', match.end())
+			if end < 0:
+				break
+			pos = end + 1
+			continue
+
+		pos = match.end()
+		if match.group('header') is None:
+			continue
+
+		# Up to one empty line between the headers is allowed.  So the
+		# header is only the start of a game, if the empty line follows
+		# the movetext of the previous game.
+		start = match.start('header')
+		line_end = match.start()
+		line_start = data.rfind(b'\n', 0, line_end) + 1
+		line = data[line_start:line_end].lstrip(BOM)
+		if not line.startswith(b'['):
+			offsets.append(start)
+
+	return offsets
+
+
+def _index_path(filename: str) -> str:
+	directory, basename = os.path.split(filename)
+
+	return os.path.join(directory, f'.{basename}.offsets')
+
+
+def game_offsets(filename: str) -> List[int]:
+	stat = os.stat(filename)
+	index_path = _index_path(filename)
+
+	try:
+		with open(index_path, encoding='utf-8') as index_file:
+			index = json.load(index_file)
+		if (index['version'] == INDEX_VERSION and index['size'] == stat.st_size
+		    and index['mtime_ns'] == stat.st_mtime_ns):
+			return index['offsets']
+	except (OSError, ValueError, KeyError, TypeError):
+		pass
+
+	if stat.st_size == 0:
+		return [0]
+
+	with open(filename, 'rb') as pgn_file:
+		with mmap.mmap(pgn_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+			offsets = scan_game_offsets(data)
+
+	index = {
+	    'version': INDEX_VERSION,
+	    'size': stat.st_size,
+	    'mtime_ns': stat.st_mtime_ns,
+	    'offsets': offsets,
+	}
+	try:
+		with open(index_path, 'w', encoding='utf-8') as index_file:
+			json.dump(index, index_file)
+	except OSError:
+		# The directory may be read-only.  The index is just a cache.
+		pass
+
+	return offsets
+
+
+def chunks(data: bytes, offsets: List[int], games: int,
+           max_size: int) -> List[Tuple[int, int]]:
+	# Splits the games into byte ranges of about "games" games, but not
+	# much more than "max_size" bytes.  Where a range ends only depends on
+	# the games in it.  Changing, adding, or removing a game only changes
+	# the range that it is in.
+	ranges: List[Tuple[int, int]] = []
+	if not data:
+		return ranges
+
+	start = 0
+	for offset, end in zip(offsets, offsets[1:] + [len(data)]):
+		digest = hashlib.sha1(data[offset:end]).digest()
+		if end - start >= max_size or int.from_bytes(digest[:4], 'big') % games == 0:
+			ranges.append((start, end))
+			start = end
+	if start < len(data):
+		ranges.append((start, len(data)))
+
+	return ranges
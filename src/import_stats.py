@@ -0,0 +1,102 @@
+# Copyright (C) 2023-2024 Guido Flohr <guido.flohr@cantanea.com>,
+# all rights reserved.
+
+# This program is free software. It comes without any warranty, to
+# the extent permitted by applicable law. You can redistribute it
+# and/or modify it under the terms of the Do What the Fuck You Want
+# to Public License, Version 2, as published by Sam Hocevar. See
+# http://www.wtfpl.net/ for more details.
+
+import cProfile
+import json
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, NamedTuple
+
+from .utils import user_files_dir
+
+IMPORT_LOG = 'import-log.jsonl'
+
+
+class PhaseTime(NamedTuple):
+	wall: float
+	# Only the time of Anki's own process.  The workers are not included.
+	cpu: float
+
+
+class ImportStats:
+	# Where the time of an import goes, and how much work was done.
+	def __init__(self) -> None:
+		self.phases: Dict[str, PhaseTime] = {}
+		self.counters: Counter = Counter()
+
+	@contextmanager
+	def phase(self, name: str) -> Iterator[None]:
+		wall = time.perf_counter()
+		cpu = time.process_time()
+		try:
+			yield
+		finally:
+			before = self.phases.get(name, PhaseTime(0.0, 0.0))
+			self.phases[name] = PhaseTime(
+			    before.wall + time.perf_counter() - wall,
+			    before.cpu + time.process_time() - cpu,
+			)
+
+	def count(self, name: str, amount: int = 1) -> None:
+		self.counters[name] += amount
+
+	def add(self, other: 'ImportStats') -> None:
+		for name, phase in other.phases.items():
+			before = self.phases.get(name, PhaseTime(0.0, 0.0))
+			self.phases[name] = PhaseTime(before.wall + phase.wall,
+			                              before.cpu + phase.cpu)
+		self.counters.update(other.counters)
+
+	def wall_time(self) -> float:
+		return sum(phase.wall for phase in self.phases.values())
+
+	def record(self, **context: Any) -> Dict[str, Any]:
+		return {
+		    'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+		    **context,
+		    'phases': {
+		        name: {
+		            'wall': round(phase.wall, 6),
+		            'cpu': round(phase.cpu, 6)
+		        } for name, phase in self.phases.items()
+		    },
+		    'counters': dict(self.counters),
+		}
+
+	def write_log(self, filename: str, **context: Any) -> None:
+		# One JSON object per line, so that the log can simply be appended
+		# to.
+		os.makedirs(os.path.dirname(filename), exist_ok=True)
+		with open(filename, 'a', encoding='utf-8') as file:
+			file.write(json.dumps(self.record(**context), sort_keys=True) + '\n')
+
+
+def import_log_path() -> str:
+	return os.path.join(user_files_dir(), IMPORT_LOG)
+
+
+@contextmanager
+def profiled(enabled: bool, directory: str) -> Iterator[None]:
+	# Writes the profile to a file that can be read with pstats or
+	# snakeviz.
+	if not enabled:
+		yield
+		return
+
+	profile = cProfile.Profile()
+	profile.enable()
+	try:
+		yield
+	finally:
+		profile.disable()
+		os.makedirs(directory, exist_ok=True)
+		name = time.strftime('import-%Y%m%d-%H%M%S.prof')
+		profile.dump_stats(os.path.join(directory, name))
@@ -7,20 +7,93 @@
 # to Public License, Version 2, as published by Sam Hocevar. See
 # http://www.wtfpl.net/ for more details.
 
+import hashlib
 import os
 import re
-from typing import Any, Dict, List, Optional, Sequence, Tuple, cast
+from collections import Counter
+from itertools import repeat
+from typing import (Any, Dict, List, NamedTuple, Optional, Sequence, Set,
+                    Tuple, cast)
 
 import chess
-from anki.collection import Collection
+from anki.collection import AddNoteRequest, Collection
 from anki.notes import Note, NoteId, NotetypeId
 from anki.decks import DeckId
+from anki.utils import split_fields
 
 from .answer import Answer
-from .question import Question
-from .page import Page
-from .visitor import PositionVisitor
-from .utils import find_media_files
+from .cardset import CardSet
+from .game_index import chunks, game_offsets
+from .import_stats import ImportStats
+from .question import FINGERPRINT_PREFIX, FINGERPRINT_SUFFIX, Question
+from .media_index import MediaIndex
+from .page import Page, SvgArgs, render_board_svg, write_svg
+from .parse_cache import Fingerprint, ParseCache, import_key
+from .progress import Progress
+from .study import (UNPICKLE_ERRORS, parse_pickled, parse_study, pickle_cards,
+                    unpickle_cards)
+from .visitor import localisation
+from .utils import (find_media_files, list_media_files, media_references,
+                    process_pool, referenced_media, worker_count)
+
+# The key of a note is everything before the first tag in the question.
+KEY_REGEX = re.compile('[ \t\r\n]*<')
+
+FINGERPRINT_REGEX = re.compile(
+    re.escape(FINGERPRINT_PREFIX) + '([0-9a-f]{40})' +
+    re.escape(FINGERPRINT_SUFFIX) + '$')
+
+# The games of a file are read and cached in chunks of about that many
+# games, but of not much more than MAX_CHUNK_SIZE bytes.
+GAMES_PER_CHUNK = 32
+MAX_CHUNK_SIZE = 256 << 10
+
+# Reading is only shared by workers that get at least that many bytes.
+MIN_BYTES_PER_WORKER = 1 << 20
+
+# The images are all about that size, no matter how many pieces are on the
+# board.
+ESTIMATED_IMAGE_SIZE = 31000
+
+# Rendering is only shared by workers that get at least that many images.
+MIN_IMAGES_PER_WORKER = 50
+
+# Notes are written in batches of that size.  An import can only be
+# cancelled between two batches.
+NOTE_BATCH_SIZE = 500
+
+
+class DeckNote(NamedTuple):
+	id: NoteId
+	fields: List[str]
+
+
+class ImportPlan(NamedTuple):
+	fingerprints: List[Fingerprint]
+	inserts: List[Note]
+	updates: List[Note]
+	deletes: List[NoteId]
+	image_inserts: Dict[str, Page]
+	image_deletes: Set[str]
+
+	def counts(self) -> Tuple[int, int, int, int, int]:
+		return (len(self.inserts), len(self.updates), len(self.deletes),
+		        len(self.image_inserts), len(self.image_deletes))
+
+	def estimated_bytes(self, media_path: str) -> Tuple[int, int]:
+		# Bytes written and bytes moved to the trash.
+		written = ESTIMATED_IMAGE_SIZE * len(self.image_inserts)
+		for note in self.inserts + self.updates:
+			written += sum(len(field.encode('utf-8')) for field in note.fields)
+
+		trashed = 0
+		for path in self.image_deletes:
+			try:
+				trashed += os.path.getsize(os.path.join(media_path, path))
+			except OSError:
+				pass
+
+		return written, trashed
 
 
 class Importer:
@@ -33,7 +106,12 @@ class Importer:
 	    collection: Collection,
 	    colour: chess.Color,
 	    notetype_id: NotetypeId,
-	    deck_id: DeckId
+	    deck_id: DeckId,
+	    merge_transpositions: bool = False,
+	    workers: int = 1,
+	    cache: Optional[ParseCache] = None,
+	    media_index: Optional[MediaIndex] = None,
+	    progress: Optional[Progress] = None,
 	) -> None:
 		self.collection = collection
 		self.colour = colour
@@ -48,134 +126,414 @@ class Importer:
 			raise KeyError(_('Selected deck does not exist!'))
 		self.deck = deck_data
 
-		self.visitor = PositionVisitor(colour=colour)
+		self.merge_transpositions = merge_transpositions
+		self.cards = CardSet(merge_transpositions=merge_transpositions)
 		self.filenames = filenames
+		self.workers = workers
+		self.cache = cache
+		self.media_index = media_index
+		self.strings = localisation()
+		self.stats = ImportStats()
+		self.progress = progress if progress is not None else Progress()
 
 
 	def run(self) -> Tuple[int, int, int, int, int]:
-		for filename in self.filenames:
-			self._read_study(filename)
-		current_notes = self._read_notes()
-
-		return self._patch_deck(current_notes)
-
-	def _read_study(self, filename: str) -> None:
-		with open(filename, encoding='utf-8') as study_pgn:
-
-			def get_visitor() -> chess.pgn.BaseVisitor:
-				return self.visitor
-
-			while chess.pgn.read_game(study_pgn, Visitor=get_visitor):
-				pass
-
-	def _read_notes(self) -> dict[str, Note]:
-		col = self.collection
+		return self.apply(self.plan())
+
+	def plan(self) -> ImportPlan:
+		# Find out what has to be changed, without changing anything.
+		stats = self.stats
+		fingerprints: List[Fingerprint] = []
+		if self.cache is not None:
+			with stats.phase('fingerprints'):
+				fingerprints = [
+				    self.cache.fingerprint(filename) for filename in self.filenames
+				]
+				up_to_date = self._up_to_date(fingerprints)
+			if up_to_date:
+				return ImportPlan(fingerprints, [], [], [], {}, set())
+
+		with stats.phase('parse'):
+			self._read_studies(fingerprints)
+		stats.count('positions', len(self.cards.cards))
+
+		with stats.phase('read notes'):
+			current_notes = self._read_notes()
+		stats.count('notes read', len(current_notes))
+
+		with stats.phase('diff'):
+			return self._plan_deck(fingerprints, current_notes)
+
+	def apply(self, plan: ImportPlan) -> Tuple[int, int, int, int, int]:
+		self.write(plan)
+		self.trash_images(plan.image_deletes)
+		self.save(plan)
+
+		return plan.counts()
+
+	def write(self, plan: ImportPlan) -> None:
+		# The images are created before the notes that use them.  If the
+		# import is cancelled, all notes written so far are complete, and
+		# the next import does not have to do that work again.
+		stats = self.stats
+		written: List[str] = []
+		mtime_ns = self.media_index.mtime_ns() if self.media_index is not None else None
+		try:
+			with stats.phase('render images'):
+				self._insert_images(plan.image_inserts, written)
+		finally:
+			if self.media_index is not None:
+				self.media_index.update(added=written, mtime_ns=mtime_ns)
+
+		with stats.phase('write notes'):
+			self._write_notes(plan.deletes, plan.updates, plan.inserts)
+
+	def trash_images(self, image_deletes: Set[str]) -> None:
+		# Deleting the notes may already have trashed some of the images.
+		stats = self.stats
+		with stats.phase('trash images'):
+			media_path = self.collection.media.dir()
+			mtime_ns = self.media_index.mtime_ns() if self.media_index is not None else None
+			trashed = [
+			    path for path in image_deletes
+			    if os.path.exists(os.path.join(media_path, path))
+			]
+			self.collection.media.trash_files(trashed)
+			if self.media_index is not None:
+				self.media_index.update(removed=image_deletes, mtime_ns=mtime_ns)
+		stats.count('images trashed', len(trashed))
+
+	def save(self, plan: ImportPlan) -> None:
+		# Remember the state of the deck after the import.
+		if self.cache is not None:
+			with self.stats.phase('save cache'):
+				self.cache.store_import(self._import_key(),
+				                        self._import_record(plan.fingerprints))
+
+	def _options(self) -> Tuple:
+		# Everything besides the file itself that the cards depend on.
+		return (self.colour, self.merge_transpositions, self.strings)
+
+	def _import_key(self) -> str:
+		return import_key(self.collection.path, self.deck['id'])
+
+	def _import_record(self, fingerprints: List[Fingerprint]) -> Dict[str, Any]:
 		deck_id = self.deck['id']
+		deck = self.collection.decks.get(did=deck_id)
+		return {
+		    'options': repr(self._options()),
+		    'notetype': self.model['id'],
+		    'files': [list(fingerprint) for fingerprint in fingerprints],
+		    'deck_mod': deck['mod'] if deck is not None else None,
+		    'card_count': self.collection.decks.card_count(deck_id, False),
+		}
+
+	def _up_to_date(self, fingerprints: List[Fingerprint]) -> bool:
+		# Nothing can have changed, if the files are the same as in the
+		# last import, and nobody has modified the deck since.
+		assert self.cache is not None
+		last_import = self.cache.last_import(self._import_key())
+
+		return last_import == self._import_record(fingerprints)
+
+	def _read_studies(self, fingerprints: List[Fingerprint]) -> None:
+		# pylint: disable=too-many-locals
+		# The files are split into chunks of games that are read on their
+		# own.  Only the chunks that have changed since the last import are
+		# read again.
+		results: List[Optional[Dict[str, Question]]] = [None] * len(self.filenames)
+		parts: Dict[int, List[Optional[Dict[str, Question]]]] = {}
+		keys: Dict[int, List[str]] = {}
+		new_chunks: Dict[int, Dict[str, bytes]] = {}
+		tasks: List[Tuple[int, int, int, int]] = []
+		for i, filename in enumerate(self.filenames):
+			known: Dict[str, bytes] = {}
+			if self.cache is not None:
+				known = self.cache.load_chunks(fingerprints[i], self._options())
+			parts[i], keys[i], new_chunks[i] = [], [], {}
+			for k, (start, end, key) in enumerate(self._chunks(filename)):
+				keys[i].append(key)
+				cached: Optional[Dict[str, Question]] = None
+				if key in known:
+					# The cache only saves time.  Stale or broken chunks are
+					# read again, and replaced.
+					try:
+						cached = unpickle_cards(known[key])
+						self.stats.count('chunks from cache')
+					except UNPICKLE_ERRORS:
+						self.stats.count('broken chunks in cache')
+				parts[i].append(cached)
+				if cached is None:
+					tasks.append((i, k, start, end))
+
+		def finish(i: int) -> None:
+			# The parts are merged in order, so that the cards are the same,
+			# no matter how the files are split.  A file is cached as soon as
+			# it is complete, so that it need not be read again after a
+			# cancelled import.
+			cards = CardSet(merge_transpositions=self.merge_transpositions)
+			for part in parts[i]:
+				cards.merge(cast(Dict[str, Question], part))
+			results[i] = cards.cards
+			if self.cache is not None:
+				self.cache.store_chunks(fingerprints[i], self._options(), keys[i],
+				                        new_chunks[i])
+
+		remaining = Counter(task[0] for task in tasks)
+		for i in range(len(self.filenames)):
+			if not remaining[i]:
+				if self.cache is not None:
+					self.stats.count('files from cache')
+				finish(i)
+
+		args = (
+		    [self.filenames[task[0]] for task in tasks],
+		    repeat(self.colour),
+		    repeat(self.merge_transpositions),
+		    repeat(self.strings),
+		    [task[2] for task in tasks],
+		    [task[3] for task in tasks],
+		)
+		size = sum(task[3] - task[2] for task in tasks)
+		workers = min(worker_count(self.workers), len(tasks), size // MIN_BYTES_PER_WORKER)
+		executor = process_pool(workers) if workers > 1 else None
+		try:
+			# The workers send the cards back pickled, the way that they are
+			# cached.
+			if executor is not None:
+				chunksize = max(1, len(tasks) // (4 * workers))
+				parsed = executor.map(parse_pickled, *args, chunksize=chunksize)
+			else:
+				parsed = map(parse_study, *args)
+			for done, (task, result) in enumerate(zip(tasks, parsed), 1):
+				i, k = task[0], task[1]
+				data: Optional[bytes] = None
+				if executor is not None:
+					data, games, plies = result
+					cards = unpickle_cards(data)
+				else:
+					cards, games, plies = result
+					if self.cache is not None:
+						# Before merging, which modifies the cards.
+						data = pickle_cards(cards)
+				if data is not None:
+					new_chunks[i][keys[i][k]] = data
+				parts[i][k] = cards
+				self.stats.count('games', games)
+				self.stats.count('plies', plies)
+				remaining[i] -= 1
+				if not remaining[i]:
+					finish(i)
+				self.progress.report('parse', done, len(tasks))
+		finally:
+			if executor is not None:
+				executor.shutdown(cancel_futures=True)
+
+		for cards in results:
+			self.cards.merge(cast(Dict[str, Question], cards))
+
+	def _chunks(self, filename: str) -> List[Tuple[int, int, str]]:
+		# The byte range and the checksum of every chunk of the file.
+		offsets = game_offsets(filename)
+		with open(filename, 'rb') as file:
+			data = file.read()
+
+		return [(start, end, hashlib.sha1(data[start:end]).hexdigest())
+		        for start, end in chunks(data, offsets, GAMES_PER_CHUNK, MAX_CHUNK_SIZE)]
+
+	def _read_notes(self) -> dict[str, DeckNote]:
+		# Read the fields of all notes in one query.  Full Note objects are
+		# only created for the notes that have to be updated.
+		rows = self.collection.db.all(
+		    'SELECT id, flds FROM notes'
+		    ' WHERE id IN (SELECT nid FROM cards WHERE did = ?)'
+		    ' ORDER BY id', self.deck['id'])
 
 		notes = {}
-		for cid in col.decks.cids(deck_id):
-			card = col.get_card(cid)
-			note = card.note()
+		for note_id, flds in rows:
+			fields = split_fields(flds)
 			# Remove all the markup from the end.  It is actually a br followed
 			# by an img.  Questions do not have comments.
-			name = re.sub('[ \t\r\n]*<.*', '', note.fields[0])
-			notes[name] = note
+			name = KEY_REGEX.split(fields[0], 1)[0]
+			notes[name] = DeckNote(NoteId(note_id), fields)
 
 		return notes
 
-	def _delete_unused(self,  wanted: Dict[str, Question], got: dict[str, Note]) -> int:
+	def _unused_notes(self, wanted: Dict[str, Question],
+	                  got: dict[str, DeckNote]) -> List[NoteId]:
 		deletes: List[NoteId] = []
 		for moves in got:
 			if moves not in wanted:
 				note = got[moves]
 				deletes.append(note.id)
-		deletes_sequence: Sequence = cast(Sequence, deletes)
-		self.collection.remove_notes(deletes_sequence)
 
-		return len(deletes_sequence)
+		return deletes
 
-	def _images_in_deck(self, got: dict[str, Note]) -> List[str]:
-		# Initialize image_deletes with all images we find for this deck.
-		media_path = self.collection.media.dir()
-		note_ids = [str(got[moves].id) for moves in got]
+	def _media_files(self) -> Set[str]:
+		if self.media_index is not None:
+			return self.media_index.files()
+
+		return list_media_files(self.collection.media.dir())
+
+	def _images_in_deck(self, got: dict[str, DeckNote]) -> Set[str]:
+		# All images that the notes of this deck use, and the ones named
+		# after their ids by older versions.
+		images = media_references(field for note in got.values()
+		                          for field in note.fields)
+		if self.media_index is not None:
+			images.update(self.media_index.note_files(note.id for note in got.values()))
+		else:
+			media_path = self.collection.media.dir()
+			note_ids = [str(note.id) for note in got.values()]
+			images.update(find_media_files(media_path, note_ids))
 
-		return find_media_files(media_path, note_ids)
+		return images
 
-	def _update_note(self, note: Note, question: Question) -> bool:
-		rendered_question = question.render(note.id)
-		answer: Answer = cast(Answer, question.render_answers(note.id))
-		if not note.fields[0] == rendered_question or not note.fields[1] == answer:
+	def _unchanged(self, deck_note: DeckNote, question: Question) -> bool:
+		match = FINGERPRINT_REGEX.search(deck_note.fields[0])
+
+		return match is not None and match.group(1) == question.fingerprint()
+
+	def _update_note(self, deck_note: DeckNote, question: Question) -> Optional[Note]:
+		rendered_question = question.render()
+		answer: Answer = cast(Answer, question.render_answers())
+		fields = deck_note.fields
+		if not fields[0] == rendered_question or not fields[1] == answer:
+			note = self.collection.get_note(deck_note.id)
 			note.fields[0] = rendered_question
 			note.fields[1] = answer
-			self.collection.update_note(note)
-			return True
+			return note
 
-		return False
+		return None
 
 	def _create_note(self, question: Question) -> Note:
-		note = Note(self.collection, self.model)
-
-		# We have to add the note first without content so that we have a
-		# note id to work with.
-		self.collection.add_note(note, deck_id=self.deck['id'])
-		note.fields[0] = question.render(note.id)
-		answer: Answer = cast(Answer, question.render_answers(note.id))
+		note = self.collection.new_note(self.model)
+		note.fields[0] = question.render()
+		answer: Answer = cast(Answer, question.render_answers())
 		note.fields[1] = answer
-		self.collection.update_note(note)
 
 		return note
 
-	def _insert_images(self, image_inserts: Dict[str, Page]):
+	def _write_notes(self, deletes: List[NoteId], updates: List[Note],
+	                 inserts: List[Note]) -> None:
+		# All changes are written in bulk and can be undone in one step.
+		if not deletes and not updates and not inserts:
+			return
+
+		col = self.collection
+		undo_entry = col.add_custom_undo_entry(_('Import PGN File'))
+
+		total = len(inserts) + len(updates) + len(deletes)
+		done = 0
+		try:
+			deck_id = self.deck['id']
+			for start in range(0, len(inserts), NOTE_BATCH_SIZE):
+				self.progress.report('write notes', done, total)
+				batch = inserts[start:start + NOTE_BATCH_SIZE]
+				col.add_notes([AddNoteRequest(note, deck_id) for note in batch])
+				done += len(batch)
+				self.stats.count('notes written', len(batch))
+
+			for start in range(0, len(updates), NOTE_BATCH_SIZE):
+				self.progress.report('write notes', done, total)
+				batch = updates[start:start + NOTE_BATCH_SIZE]
+				col.update_notes(batch)
+				done += len(batch)
+				self.stats.count('notes written', len(batch))
+
+			# Notes are deleted last, so that the images that they share with
+			# the other notes are still referenced.  They are deleted in one
+			# go because the delete hook looks at all notes every time.
+			if deletes:
+				self.progress.report('write notes', done, total)
+				col.remove_notes(cast(Sequence, deletes))
+				self.stats.count('notes deleted', len(deletes))
+		finally:
+			col.merge_undo_entries(undo_entry)
+
+	def _insert_images(self, image_inserts: Dict[str, Page], written: List[str]):
+		# The names of the images are added to written as soon as they
+		# exist.
 		media_path = self.collection.media.dir()
+		names: List[str] = []
+		args: List[SvgArgs] = []
 		for image_path, page in image_inserts.items():
-			path = os.path.join(media_path, image_path)
-			page.render_svg(path)
-
-	def _patch_deck(self, got: dict[str, Note]) -> Tuple[int, int, int, int, int]:
+			page_args = page.svg_args()
+			if page_args is not None:
+				names.append(image_path)
+				args.append(page_args)
+
+		workers = min(worker_count(self.workers), len(args) // MIN_IMAGES_PER_WORKER)
+		executor = process_pool(workers) if workers > 1 else None
+		try:
+			if executor is not None:
+				# The images are written, while the workers render the next ones.
+				chunksize = max(1, len(args) // (4 * workers))
+				svgs = executor.map(render_board_svg, args, chunksize=chunksize)
+			else:
+				svgs = map(render_board_svg, args)
+			for name, svg in zip(names, svgs):
+				write_svg(os.path.join(media_path, name), svg)
+				written.append(name)
+				self.stats.count('images rendered')
+				# The encoding has one byte per character.
+				self.stats.count('bytes written', len(svg))
+				self.progress.report('render images', len(written), len(names))
+		finally:
+			if executor is not None:
+				executor.shutdown(cancel_futures=True)
+
+	def _plan_deck(self, fingerprints: List[Fingerprint],
+	               got: dict[str, DeckNote]) -> ImportPlan:
+		# pylint: disable=too-many-locals
 		# These are the cards that we want to have from the current studies
 		# that were read.
-		wanted = self.visitor.cards
+		wanted = self.cards.cards
 
-		# Initialize the images to delete with a list of all images for the
-		# current notes.
-		image_deletes = self._images_in_deck(got)
+		existing_images = self._media_files()
+		old_images = self._images_in_deck(got)
 
-		num_deletes = self._delete_unused(wanted, got)
+		deletes = self._unused_notes(wanted, got)
 
-		image_inserts: Dict[str, Page] = {}
+		updates: List[Note] = []
+		inserts: List[Note] = []
+		images: Dict[str, Page] = {}
+		kept_images: Set[str] = set()
+		for done, (moves, question) in enumerate(wanted.items()):
+			self.progress.report('diff', done, len(wanted))
 
-		num_updates = 0
-		num_inserts = 0
-		for moves, question in wanted.items():
+			if moves in got and self._unchanged(got[moves], question):
+				# Nothing to render, as long as the images are still there.
+				note_images = media_references(got[moves].fields)
+				if note_images <= existing_images:
+					kept_images |= note_images
+					continue
 
 			if moves in got:
 				# There is a note for it but maybe it has changed.
-				note = got[moves]
-				if self._update_note(note, question):
-					num_updates = num_updates + 1
+				note = self._update_note(got[moves], question)
+				if note is not None:
+					updates.append(note)
 			else:
 				# The note must be created.
-				note = self._create_note(question)
-				num_inserts = num_inserts + 1
+				inserts.append(self._create_note(question))
 
 			# Questions always get a board image.
-			image_path = question.image_path(note.id)
-			if image_path in image_deletes:
-				image_deletes.remove(image_path)
-			else:
-				image_inserts[image_path] = question
-
+			images.setdefault(question.image_path(), question)
 			for answer in question.answers:
-				image_path = answer.image_path(note.id)
-				if image_path in image_deletes:
-					image_deletes.remove(image_path)
-				elif image_path:
-					image_inserts[image_path] = answer
-
-		self._insert_images(image_inserts)
-		self.collection.media.trash_files(image_deletes)
-
-		num_image_deletes = len(image_deletes)
-		num_image_inserts = len(image_inserts)
-
-		return num_inserts, num_updates, num_deletes, num_image_inserts, num_image_deletes
+				images.setdefault(answer.image_path(), answer)
+
+		image_inserts = {
+		    path: page
+		    for path, page in images.items() if path not in existing_images
+		}
+
+		# Images that the deck no longer uses may still be used by notes in
+		# other decks.
+		image_deletes = (old_images & existing_images) - images.keys() - kept_images
+		if image_deletes:
+			deck_note_ids = [note.id for note in got.values()]
+			image_deletes -= referenced_media(self.collection, deck_note_ids)
+
+		return ImportPlan(fingerprints, inserts, updates, deletes, image_inserts,
+		                  image_deletes)
@@ -0,0 +1,123 @@
+# Copyright (C) 2023-2024 Guido Flohr <guido.flohr@cantanea.com>,
+# all rights reserved.
+
+# This program is free software. It comes without any warranty, to
+# the extent permitted by applicable law. You can redistribute it
+# and/or modify it under the terms of the Do What the Fuck You Want
+# to Public License, Version 2, as published by Sam Hocevar. See
+# http://www.wtfpl.net/ for more details.
+
+import os
+import sqlite3
+from contextlib import closing
+from typing import Iterable, List, Optional, Set
+
+from .utils import MEDIA_REGEX, user_files_dir
+
+MEDIA_INDEX = 'media-index.sqlite'
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS directories ('
+    ' path TEXT PRIMARY KEY,'
+    ' mtime_ns INTEGER NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS files ('
+    ' path TEXT NOT NULL,'
+    ' name TEXT NOT NULL,'
+    ' note_id INTEGER,'
+    ' PRIMARY KEY (path, name))',
+    'CREATE INDEX IF NOT EXISTS files_note_id ON files (path, note_id)',
+]
+
+
+class MediaIndex:
+	# Remembers the images of the add-on in a media directory, so that the
+	# directory, which can hold a lot of other files, is only read again,
+	# when it has been modified by somebody else.
+	def __init__(self, filename: str, media_dir: str) -> None:
+		self.filename = filename
+		self.media_dir = media_dir
+
+	def _connect(self) -> sqlite3.Connection:
+		os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+		db = sqlite3.connect(self.filename)
+		for statement in SCHEMA:
+			db.execute(statement)
+
+		return db
+
+	def _refresh(self, db: sqlite3.Connection) -> None:
+		# Adding or removing a file changes the modification time of the
+		# directory.
+		mtime_ns = os.stat(self.media_dir).st_mtime_ns
+		row = db.execute('SELECT mtime_ns FROM directories WHERE path = ?',
+		                 (self.media_dir, )).fetchone()
+		if row is not None and row[0] == mtime_ns:
+			return
+
+		rows = []
+		for entry in os.scandir(self.media_dir):
+			match = MEDIA_REGEX.match(entry.name)
+			if match and not entry.is_dir():
+				note_id = int(match.group(1)) if match.group(1) else None
+				rows.append((self.media_dir, entry.name, note_id))
+
+		with db:
+			db.execute('DELETE FROM files WHERE path = ?', (self.media_dir, ))
+			db.executemany('INSERT INTO files VALUES (?, ?, ?)', rows)
+			db.execute('INSERT OR REPLACE INTO directories VALUES (?, ?)',
+			           (self.media_dir, mtime_ns))
+
+	def files(self) -> Set[str]:
+		with closing(self._connect()) as db:
+			self._refresh(db)
+			rows = db.execute('SELECT name FROM files WHERE path = ?',
+			                  (self.media_dir, ))
+			return {row[0] for row in rows}
+
+	def note_files(self, note_ids: Iterable[int]) -> List[str]:
+		# Files of older versions with one of the note ids in the name.
+		ids = ','.join(str(int(note_id)) for note_id in note_ids)
+		if not ids:
+			return []
+
+		with closing(self._connect()) as db:
+			self._refresh(db)
+			rows = db.execute(
+			    'SELECT name FROM files'
+			    f' WHERE path = ? AND note_id IN ({ids})', (self.media_dir, ))
+			return [row[0] for row in rows]
+
+	def mtime_ns(self) -> int:
+		return os.stat(self.media_dir).st_mtime_ns
+
+	def update(self,
+	           added: Iterable[str] = (),
+	           removed: Iterable[str] = (),
+	           mtime_ns: Optional[int] = None) -> None:
+		# Record the changes made by the add-on itself.  "mtime_ns" is the
+		# modification time of the directory before these changes.  Only
+		# if the index was up to date then, it is still up to date
+		# afterwards.  Otherwise, somebody else has changed the directory,
+		# and it is read again next time.
+		with closing(self._connect()) as db:
+			rows = []
+			for name in added:
+				match = MEDIA_REGEX.match(name)
+				if match:
+					note_id = int(match.group(1)) if match.group(1) else None
+					rows.append((self.media_dir, name, note_id))
+			with db:
+				db.executemany('INSERT OR REPLACE INTO files VALUES (?, ?, ?)',
+				               rows)
+				db.executemany('DELETE FROM files WHERE path = ? AND name = ?',
+				               [(self.media_dir, name) for name in removed])
+				if mtime_ns is not None:
+					db.execute(
+					    'UPDATE directories SET mtime_ns = ?'
+					    ' WHERE path = ? AND mtime_ns = ?',
+					    (self.mtime_ns(), self.media_dir, mtime_ns))
+
+
+def user_media_index(media_dir: str) -> MediaIndex:
+	return MediaIndex(os.path.join(user_files_dir(), MEDIA_INDEX),
+	                  media_dir)
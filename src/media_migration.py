@@ -0,0 +1,194 @@
+# Copyright (C) 2023-2024 Guido Flohr <guido.flohr@cantanea.com>,
+# all rights reserved.
+
+# This program is free software. It comes without any warranty, to
+# the extent permitted by applicable law. You can redistribute it
+# and/or modify it under the terms of the Do What the Fuck You Want
+# to Public License, Version 2, as published by Sam Hocevar. See
+# http://www.wtfpl.net/ for more details.
+
+import hashlib
+import os
+import re
+import sqlite3
+from contextlib import closing
+from typing import Dict, List, Optional, Set, Tuple
+
+from anki.collection import Collection
+from anki.notes import Note, NoteId
+
+from .progress import Progress
+from .utils import user_files_dir
+
+# Before version 1.0.0, notes with the same board shared one image.  Up to
+# version 1.1.0, the note id was part of the name.
+LEGACY_REGEX = re.compile(
+    r'<img src="(chess-opening-trainer-(?:[wb]|[1-9][0-9]*)-[0-9a-f]{40}\.svg)">')
+LEGACY_FILE_REGEX = re.compile(
+    r'^chess-opening-trainer-(?:[wb]|[1-9][0-9]*)-[0-9a-f]{40}\.svg$')
+
+MIGRATION_JOURNAL = 'media-migration.sqlite'
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS renames ('
+    ' name TEXT PRIMARY KEY,'
+    ' new_name TEXT NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS progress ('
+    ' done INTEGER NOT NULL)',
+]
+
+# The notes are updated and the journal is written after that many notes.
+MIGRATION_BATCH_SIZE = 500
+
+
+def migration_journal() -> str:
+	return os.path.join(user_files_dir(), MIGRATION_JOURNAL)
+
+
+def _connect(journal: str) -> sqlite3.Connection:
+	os.makedirs(os.path.dirname(journal), exist_ok=True)
+	db = sqlite3.connect(journal)
+	for statement in SCHEMA:
+		db.execute(statement)
+
+	return db
+
+
+def schedule_migration(journal: str) -> None:
+	# A migration that is already scheduled starts again with the first
+	# note.  The files that it has renamed are remembered.
+	with closing(_connect(journal)) as db, db:
+		db.execute('DELETE FROM progress')
+		db.execute('INSERT INTO progress VALUES (0)')
+
+
+def _content_name(path: str) -> str:
+	with open(path, 'rb') as file:
+		digest = hashlib.sha1(file.read()).hexdigest()
+
+	return f'chess-opening-trainer-{digest}.svg'
+
+
+class MediaMigration:
+	# Renames the images of old versions after their content, like the
+	# images that the importer creates now.  Every file is renamed once,
+	# and notes with the same board share it.  The new names are written
+	# to the journal before the files are renamed, and after every batch
+	# of notes, the journal remembers the last note done.  An interrupted
+	# migration continues from there.  The journal is deleted, when all
+	# is done.
+	def __init__(self,
+	             collection: Collection,
+	             journal: str,
+	             progress: Optional[Progress] = None) -> None:
+		self.collection = collection
+		self.journal = journal
+		self.progress = progress or Progress()
+		self.media_dir = collection.media.dir()
+
+	def run(self) -> int:
+		if not os.path.exists(self.journal):
+			return 0
+
+		migrated = 0
+		with closing(_connect(self.journal)) as db:
+			row = db.execute('SELECT done FROM progress').fetchone()
+			notes = self._legacy_notes(row[0] if row else 0)
+			for start in range(0, len(notes), MIGRATION_BATCH_SIZE):
+				batch = notes[start:start + MIGRATION_BATCH_SIZE]
+				renames = self._rename(db, batch)
+				migrated += self._update_notes(batch, renames)
+				with db:
+					db.execute('DELETE FROM progress')
+					db.execute('INSERT INTO progress VALUES (?)', (batch[-1][0], ))
+				self.progress.report('migrate images', start + len(batch), len(notes))
+
+		self._trash_unused()
+		os.unlink(self.journal)
+
+		return migrated
+
+	def _legacy_notes(self, done: int) -> List[Tuple[NoteId, Set[str]]]:
+		# Only the front and the back have images.
+		rows = self.collection.db.all(
+		    'SELECT id, flds FROM notes WHERE id > ?'
+		    " AND flds LIKE '%chess-opening-trainer-%' ORDER BY id", done)
+		notes: List[Tuple[NoteId, Set[str]]] = []
+		for note_id, flds in rows:
+			names = set(LEGACY_REGEX.findall(' '.join(flds.split('\x1f')[:2])))
+			if names:
+				notes.append((NoteId(note_id), names))
+
+		return notes
+
+	def _rename(self, db: sqlite3.Connection,
+	            batch: List[Tuple[NoteId, Set[str]]]) -> Dict[str, str]:
+		# Notes keep images that are gone.
+		renames: Dict[str, str] = {}
+		rows: List[Tuple[str, str]] = []
+		for name in sorted(set().union(*(names for _, names in batch))):
+			row = db.execute('SELECT new_name FROM renames WHERE name = ?',
+			                 (name, )).fetchone()
+			if row is not None:
+				renames[name] = row[0]
+			elif os.path.exists(os.path.join(self.media_dir, name)):
+				renames[name] = _content_name(os.path.join(self.media_dir, name))
+				rows.append((name, renames[name]))
+		with db:
+			db.executemany('INSERT INTO renames VALUES (?, ?)', rows)
+
+		# A file that is not there any more has been renamed before an
+		# interruption.  Files with the same content as one that has
+		# already been renamed are not needed any more.
+		duplicates: List[str] = []
+		for name, new_name in renames.items():
+			path = os.path.join(self.media_dir, name)
+			new_path = os.path.join(self.media_dir, new_name)
+			if not os.path.exists(path):
+				continue
+			if os.path.exists(new_path):
+				duplicates.append(name)
+			else:
+				os.replace(path, new_path)
+		if duplicates:
+			self.collection.media.trash_files(duplicates)
+
+		return renames
+
+	def _update_notes(self, batch: List[Tuple[NoteId, Set[str]]],
+	                  renames: Dict[str, str]) -> int:
+		col = self.collection
+		notes: List[Note] = []
+		for note_id, names in batch:
+			renamed = [name for name in names if name in renames]
+			if not renamed:
+				continue
+			note = col.get_note(note_id)
+			for name in renamed:
+				search = f'<img src="{name}">'
+				replace = f'<img src="{renames[name]}">'
+				note.fields[0] = note.fields[0].replace(search, replace)
+				note.fields[1] = note.fields[1].replace(search, replace)
+			notes.append(note)
+		if notes:
+			col.update_notes(notes, skip_undo_entry=True)
+
+		return len(notes)
+
+	def _trash_unused(self) -> None:
+		# Importing the files again before the migration leaves the old
+		# images behind.  Nothing creates images with these names any
+		# more.
+		rows = self.collection.db.list(
+		    "SELECT flds FROM notes WHERE flds LIKE '%chess-opening-trainer-%'")
+		used: Set[str] = set()
+		for flds in rows:
+			used.update(LEGACY_REGEX.findall(flds))
+		unused = [
+		    entry.name
+		    for entry in os.scandir(self.media_dir)
+		    if LEGACY_FILE_REGEX.match(entry.name) and entry.name not in used
+		    and not entry.is_dir()
+		]
+		if unused:
+			self.collection.media.trash_files(unused)
@@ -9,12 +9,14 @@
 
 import hashlib
 import re
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 
 import chess
 from chess import Board
 from chess.svg import Arrow
 
+from . import board_svg
+
 ARROWS_REGEX = re.compile(
     r"""
 	(?P<prefix>[ \t\n\v\f\r]*?)
@@ -28,6 +30,58 @@ ARROWS_REGEX = re.compile(
 WS_REGEX = re.compile('[ \t\n\v\\f]')
 
 
+class SvgArgs(NamedTuple):
+	fen: str
+	lastmove: Optional[str]
+	check: Optional[chess.Square]
+	arrows: Tuple[Tuple[chess.Square, chess.Square, str], ...]
+	orientation: chess.Color
+
+
+class BoardState(NamedTuple):
+	# What a page needs to know about its board, when it has been read from
+	# the parse cache.  "key" is the part of the content key that depends
+	# on the board.  It has all that is needed to set up the board again,
+	# which is a lot faster than parsing a FEN.
+	lastmove: Optional[str]
+	check: Optional[chess.Square]
+	key: Tuple
+
+
+def board_from_key(key: Tuple) -> Board:
+	((pawns, knights, bishops, rooks, queens, kings, white, black, turn,
+	  castling_rights, ep_square), halfmove_clock, fullmove_number) = key
+	board = Board(None)
+	board.pawns = pawns
+	board.knights = knights
+	board.bishops = bishops
+	board.rooks = rooks
+	board.queens = queens
+	board.kings = kings
+	board.occupied_co[chess.WHITE] = white
+	board.occupied_co[chess.BLACK] = black
+	board.occupied = white | black
+	board.turn = turn
+	board.castling_rights = castling_rights
+	board.ep_square = ep_square
+	board.halfmove_clock = halfmove_clock
+	board.fullmove_number = fullmove_number
+
+	return board
+
+
+def render_board_svg(args: SvgArgs) -> str:
+	lastmove = chess.Move.from_uci(args.lastmove) if args.lastmove else None
+
+	return board_svg.render(args.fen, lastmove, args.check, args.arrows,
+	                        args.orientation)
+
+
+def write_svg(path: str, svg: str) -> None:
+	with open(path, 'w', encoding='cp1252') as file:
+		file.write(svg)
+
+
 class Page:
 	def __init__(self, colour: chess.Color, turn: chess.Color) -> None:
 		self.colour = colour
@@ -35,10 +89,46 @@ class Page:
 		self.comments: List[str] = []
 		self.arrows: List[Arrow] = []
 		self.fills: Dict[int, str] = {}
-		self.board: Optional[Board] = None
+		self._board: Optional[Board] = None
+		self._board_state: Optional[BoardState] = None
+		self._image_path: Optional[str] = None
+
+	@property
+	def board(self) -> Optional[Board]:
+		# Setting up the board again is only done when it is really needed.
+		if self._board is None and self._board_state is not None:
+			self._board = board_from_key(self._board_state.key)
+
+		return self._board
+
+	@board.setter
+	def board(self, board: Optional[Board]) -> None:
+		self._board = board
+		self._board_state = None
 
 	def set_board(self, board: Board) -> None:
 		self.board = board
+		self._image_path = None
+
+	def board_state(self) -> Optional[BoardState]:
+		if self._board_state is None and self._board is not None:
+			lastmove = self._lastmove()
+			self._board_state = BoardState(
+			    lastmove=lastmove.uci() if lastmove else None,
+			    check=self._check(),
+			    key=self._board_key(),
+			)
+
+		return self._board_state
+
+	def __getstate__(self) -> Dict[str, Any]:
+		# Pickling the board takes a lot of time and space.  Only what is
+		# needed to set it up again is stored.
+		attributes = self.__dict__.copy()
+		attributes['_board_state'] = self.board_state()
+		attributes['_board'] = None
+
+		return attributes
 
 	def process_arrows(self, comment: str) -> str:
 		def purge_arrows(match):
@@ -78,63 +168,117 @@ class Page:
 		return re.sub(ARROWS_REGEX, purge_arrows, comment)
 
 	def add_comment(self, comment: str) -> None:
+		self._image_path = None
 		comment = self.process_arrows(comment)
 		if not re.match('^[ \t\n\v\\f]*$', comment):
 			self.comments.append(comment)
 
-	def image_path(self, note_id: int) -> str:
-		path = ''
+	def image_path(self) -> str:
+		# The name only depends on what the image shows, so that notes and
+		# decks with the same board share one file.
+		if self._image_path is not None:
+			return self._image_path
 
-		if not self.board:
-			self.board = Board()
-		name = self.board.fen() + '-' + self.object_id()
+		board = self.board
+		if board is None:
+			board = self.board = Board()
+		lastmove = self._lastmove()
+		name = '-'.join([
+		    board.fen(),
+		    lastmove.uci() if lastmove else '',
+		    str(self._check()),
+		    'w' if self.colour else 'b',
+		])
 
 		for arrow in self.arrows:
 			name += '-' + arrow.pgn()
 		for square in sorted(self.fills.keys()):
 			name += '-' + str(square) + '-' + self.fills[square]
 
-		name = hashlib.sha1(name.encode('ascii')).hexdigest() + '.svg'
-		path = f'chess-opening-trainer-{note_id}-{name}'
+		digest = hashlib.sha1(name.encode('ascii')).hexdigest()
+		self._image_path = f'chess-opening-trainer-{digest}.svg'
+
+		return self._image_path
 
-		return path
+	def content_key(self) -> Tuple:
+		# Everything that the rendered page depends on, but much cheaper to
+		# compute than the page itself.
+		if self._board_state is not None:
+			key = self._board_state.key
+		else:
+			key = self._board_key()
+		return key + (
+		    self._lastmove(),
+		    self.turn,
+		    self.colour,
+		    tuple(self.comments),
+		    tuple((arrow.tail, arrow.head, arrow.color) for arrow in self.arrows),
+		    tuple(sorted(self.fills.items())),
+		)
 
-	def extra_html(self, note_id: int) -> str:
+	def extra_html(self) -> str:
 		rendered = ''
 		for comment in self.comments:
 			rendered += ' <em>' + comment + '</em>'
 
-		image_path = self.image_path(note_id)
+		image_path = self.image_path()
 		rendered += f'<br><img src="{image_path}">'
 
 		return rendered
 
-	def render_svg(self, path: str) -> None:
-		if self.board is None:
-			return
+	def _board_key(self) -> Tuple:
+		# pylint: disable=protected-access
+		board = self._board if self._board is not None else Board()
+		return (
+		    board._transposition_key(),
+		    board.halfmove_clock,
+		    board.fullmove_number,
+		)
 
-		if len(self.board.move_stack):
-			lastmove = self.board.peek()
-		else:
-			lastmove = None
+	# A board that has been set up again does not know the last move.
+	def _lastmove(self) -> Optional[chess.Move]:
+		if self._board_state is not None:
+			lastmove = self._board_state.lastmove
+			return chess.Move.from_uci(lastmove) if lastmove else None
+		if self._board is not None and len(self._board.move_stack):
+			return self._board.peek()
 
-		if self.board.is_check():
-			check = self.board.king(not self.turn)
-		else:
-			check = None
+		return None
+
+	def _check(self) -> Optional[chess.Square]:
+		if self._board_state is not None:
+			return self._board_state.check
+		if self._board is not None and self._board.is_check():
+			return self._board.king(not self.turn)
 
-		arrows = self.arrows.copy()
+		return None
 
+	def svg_args(self) -> Optional[SvgArgs]:
+		# Everything needed for rendering the image, as plain values that
+		# can be sent to another process.
+		board = self.board
+		if board is None:
+			return None
+
+		lastmove = self._lastmove()
+		arrows = [(arrow.tail, arrow.head, arrow.color) for arrow in self.arrows]
 		for square, side in self.fills.items():
-			arrows.append(Arrow(tail=square, head=square, color=side))
-		svg = chess.svg.board(self.board,
-		                      lastmove=lastmove,
-		                      orientation=self.colour,
-		                      arrows=arrows,
-		                      check=check)
-
-		with open(path, 'w', encoding='cp1252') as file:
-			file.write(svg)
+			arrows.append((square, square, side))
+
+		return SvgArgs(
+		    fen=board.fen(),
+		    lastmove=lastmove.uci() if lastmove else None,
+		    check=self._check(),
+		    arrows=tuple(arrows),
+		    orientation=self.colour,
+		)
+
+	def render_svg(self, path: str) -> None:
+		args = self.svg_args()
+		if args is None:
+			return
+
+		write_svg(path, render_board_svg(args))
 
 	def object_id(self):
 		raise NotImplementedError('method object_id() not implemented')
@@ -0,0 +1,141 @@
+# Copyright (C) 2023-2024 Guido Flohr <guido.flohr@cantanea.com>,
+# all rights reserved.
+
+# This program is free software. It comes without any warranty, to
+# the extent permitted by applicable law. You can redistribute it
+# and/or modify it under the terms of the Do What the Fuck You Want
+# to Public License, Version 2, as published by Sam Hocevar. See
+# http://www.wtfpl.net/ for more details.
+
+
+import hashlib
+import json
+import os
+import sqlite3
+from contextlib import closing
+from typing import Any, Dict, List, NamedTuple, Optional
+
+# Increment this, whenever the pickled classes change in an incompatible
+# way, or the files are read differently.
+CACHE_VERSION = 3
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS chunks ('
+    ' file TEXT NOT NULL,'
+    ' key TEXT NOT NULL,'
+    ' cards BLOB NOT NULL,'
+    ' PRIMARY KEY (file, key))',
+]
+
+
+class Fingerprint(NamedTuple):
+	path: str
+	size: int
+	mtime_ns: int
+	digest: str
+
+
+def import_key(collection_path: str, deck_id: int) -> str:
+	# Key of the last import into the deck.
+	return f'{collection_path}:{deck_id}'
+
+
+class ParseCache:
+
+
+	def __init__(self, directory: str) -> None:
+		self.directory = directory
+		self.chunks_path = os.path.join(directory, 'chunks.sqlite')
+		self.fingerprints_path = os.path.join(directory, 'fingerprints.json')
+		self.imports_path = os.path.join(directory, 'imports.json')
+		self.fingerprints: Dict[str, list] = self._read_json(
+		    self.fingerprints_path)
+
+	def fingerprint(self, filename: str) -> Fingerprint:
+		path = os.path.abspath(filename)
+		stat = os.stat(path)
+
+		# Like git, only compute the digest again, when the file has been
+		# touched.
+		known = self.fingerprints.get(path)
+		if known is not None and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+			digest = known[2]
+		else:
+			sha1 = hashlib.sha1()
+			with open(path, 'rb') as file:
+				for chunk in iter(lambda: file.read(1 << 20), b''):
+					sha1.update(chunk)
+			digest = sha1.hexdigest()
+			self.fingerprints[path] = [stat.st_size, stat.st_mtime_ns, digest]
+			self._write_json(self.fingerprints_path, self.fingerprints)
+
+		return Fingerprint(path, stat.st_size, stat.st_mtime_ns, digest)
+
+	def _file_key(self, fingerprint: Fingerprint, options: Any) -> str:
+		key = repr((CACHE_VERSION, fingerprint.path, options))
+
+		return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+	def _connect(self) -> sqlite3.Connection:
+		os.makedirs(self.directory, exist_ok=True)
+		db = sqlite3.connect(self.chunks_path)
+		for statement in SCHEMA:
+			db.execute(statement)
+
+		return db
+
+	def load_chunks(self, fingerprint: Fingerprint, options: Any) -> Dict[str, bytes]:
+		# The pickled cards of every chunk of games of the last version of
+		# the file, by the checksum of the chunk.
+		try:
+			with closing(self._connect()) as db:
+				rows = db.execute('SELECT key, cards FROM chunks WHERE file = ?',
+				                  (self._file_key(fingerprint, options), ))
+				return dict(rows.fetchall())
+		except sqlite3.DatabaseError:
+			return {}
+
+	def store_chunks(self, fingerprint: Fingerprint, options: Any, keys: List[str],
+	                 new: Dict[str, bytes]) -> None:
+		# "keys" are all the chunks of the file now.  Only the new ones are
+		# written, and the ones that are gone are removed.
+		file = self._file_key(fingerprint, options)
+		with closing(self._connect()) as db, db:
+			stored = {
+			    row[0]
+			    for row in db.execute('SELECT key FROM chunks WHERE file = ?', (file, ))
+			}
+			db.executemany('DELETE FROM chunks WHERE file = ? AND key = ?',
+			               [(file, key) for key in stored - set(keys)])
+			db.executemany('INSERT OR REPLACE INTO chunks VALUES (?, ?, ?)',
+			               [(file, key, data) for key, data in new.items()])
+
+	def last_import(self, key: str) -> Optional[Any]:
+		return self._read_json(self.imports_path).get(key)
+
+	def store_import(self, key: str, record: Any) -> None:
+		imports = self._read_json(self.imports_path)
+		imports[key] = record
+		self._write_json(self.imports_path, imports)
+
+	def _read_json(self, path: str) -> Dict[str, Any]:
+		try:
+			with open(path, encoding='utf-8') as file:
+				data = json.load(file)
+		except (OSError, ValueError):
+			return {}
+
+		if not isinstance(data, dict):
+			return {}
+
+		return data
+
+	def _write_json(self, path: str, data: Any) -> None:
+		self._write_atomic(path, json.dumps(data).encode('utf-8'))
+
+	def _write_atomic(self, path: str, data: bytes) -> None:
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		tmp_path = path + '.tmp'
+		with open(tmp_path, 'wb') as file:
+			file.write(data)
+		os.replace(tmp_path, path)
@@ -0,0 +1,29 @@
+# Copyright (C) 2023-2024 Guido Flohr <guido.flohr@cantanea.com>,
+# all rights reserved.
+
+# This program is free software. It comes without any warranty, to
+# the extent permitted by applicable law. You can redistribute it
+# and/or modify it under the terms of the Do What the Fuck You Want
+# to Public License, Version 2, as published by Sam Hocevar. See
+# http://www.wtfpl.net/ for more details.
+
+
+class ImportCancelled(Exception):
+	pass
+
+
+class Progress:
+	# Receives the progress of an import, and decides whether it should
+	# stop.  This one does neither, the dialog has its own.
+	def update(self, phase: str, done: int, total: int) -> None:
+		pass
+
+	def cancelled(self) -> bool:
+		return False
+
+	def report(self, phase: str, done: int, total: int) -> None:
+		# The importer only calls this, where it can stop without leaving
+		# anything half done.
+		self.update(phase, done, total)
+		if self.cancelled():
+			raise ImportCancelled()
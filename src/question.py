@@ -7,12 +7,19 @@
 # to Public License, Version 2, as published by Sam Hocevar. See
 # http://www.wtfpl.net/ for more details.
 
-from typing import List
+import hashlib
+from typing import List, Optional
 from chess import Color
 
 from .answer import Answer
 from .page import Page
 
+# Must be changed, whenever the notes are rendered differently.
+RENDER_VERSION = 1
+
+# The fingerprint is stored in an HTML comment at the end of the question.
+FINGERPRINT_PREFIX = '<!--chess-opening-trainer:'
+FINGERPRINT_SUFFIX = '-->'
 
 class Question(Page):
 
@@ -22,25 +29,42 @@ class Question(Page):
 	    moves: str,
 	    turn: Color,
 	    colour: Color,
+	    position: int = 0,
 	) -> None:
 		self.moves = moves
+		# Zobrist hash of the position on the board.
+		self.position = position
 		self.answers: List[Answer] = []
+		self._fingerprint: Optional[str] = None
 		Page.__init__(self, colour=colour, turn=turn)
 
 	def add_answer(self, answer: Answer) -> None:
 		self.answers.append(answer)
+		self._fingerprint = None
+
+	def fingerprint(self) -> str:
+		# Computed once, when the question is complete.
+		if self._fingerprint is None:
+			content = [RENDER_VERSION, self.moves, self.content_key()]
+			for answer in self.answers:
+				content.append((answer.move, answer.content_key()))
+			self._fingerprint = hashlib.sha1(
+			    repr(content).encode('utf-8')).hexdigest()
+
+		return self._fingerprint
 
-	def render(self, note_id: int) -> str:
+	def render(self) -> str:
 		rendered = self.moves
-		rendered += self.extra_html(note_id)
+		rendered += self.extra_html()
+		rendered += FINGERPRINT_PREFIX + self.fingerprint() + FINGERPRINT_SUFFIX
 
 		return rendered
 
-	def render_answers(self, note_id: int) -> str:
+	def render_answers(self) -> str:
 		lines: List[str] = []
 
 		for answer in self.answers:
-			lines.append(answer.render(note_id))
+			lines.append(answer.render())
 
 		return '<br>'.join(lines)
 
@@ -0,0 +1,26 @@
+# Copyright (C) 2023-2024 Guido Flohr <guido.flohr@cantanea.com>,
+# all rights reserved.
+
+# This program is free software. It comes without any warranty, to
+# the extent permitted by applicable law. You can redistribute it
+# and/or modify it under the terms of the Do What the Fuck You Want
+# to Public License, Version 2, as published by Sam Hocevar. See
+# http://www.wtfpl.net/ for more details.
+
+from anki.collection import Collection
+
+from .media_index import MediaIndex
+from .utils import list_media_files, referenced_media
+
+
+def remove_unused_images(collection: Collection, media_index: MediaIndex) -> int:
+	# Reads the whole media directory.  Images can be left behind, when
+	# notes were deleted while the add-on was not installed.
+	media_dir = collection.media.dir()
+	mtime_ns = media_index.mtime_ns()
+	unused = list_media_files(media_dir) - referenced_media(collection)
+	if unused:
+		collection.media.trash_files(list(unused))
+		media_index.update(removed=unused, mtime_ns=mtime_ns)
+
+	return len(unused)
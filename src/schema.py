@@ -65,6 +65,12 @@ schema = {
 							'items': {
 								'type': 'string'
 							}
+						},
+						'merge_transpositions': {
+							'type': 'boolean',
+							'description':
+							'Whether positions reached by different move orders share one card',
+							'default': False
 						}
 					},
 					'required': ['colour', 'files']
@@ -76,6 +82,25 @@ schema = {
 			'type': ['integer', 'null'],
 			'default': None,
 			'minimum': 1
+		},
+		'workers': {
+			'description':
+			'The number of worker processes for an import, 0 for one per CPU.',
+			'type': 'integer',
+			'default': 1,
+			'minimum': 0
+		},
+		'profile': {
+			'description':
+			'Whether to write a profile of every import for analysis with pstats.',
+			'type': 'boolean',
+			'default': False
+		},
+		'watch': {
+			'description':
+			'Whether to import the files again, whenever they change.',
+			'type': 'boolean',
+			'default': False
 		}
 	}
 }
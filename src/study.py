@@ -0,0 +1,119 @@
+# Copyright (C) 2023-2024 Guido Flohr <guido.flohr@cantanea.com>,
+# all rights reserved.
+
+# This program is free software. It comes without any warranty, to
+# the extent permitted by applicable law. You can redistribute it
+# and/or modify it under the terms of the Do What the Fuck You Want
+# to Public License, Version 2, as published by Sam Hocevar. See
+# http://www.wtfpl.net/ for more details.
+
+
+import io
+import pickle
+from typing import Any, Dict, NamedTuple, Optional, TextIO, Tuple
+
+import chess
+import chess.pgn
+
+from .question import Question
+from .visitor import Localisation, PositionVisitor
+
+
+# The modules of the classes in the pickled cards.
+PICKLED_MODULES = {'answer', 'page', 'question'}
+
+
+class _CardUnpickler(pickle.Unpickler):
+	# The classes are pickled with the name of the package that wrote them.
+	# That is the folder of the add-on in Anki, but "chess_opening_trainer"
+	# for the command-line script, and both share the cache.
+	def find_class(self, module: str, name: str) -> Any:
+		package, _, submodule = module.rpartition('.')
+		if package and submodule in PICKLED_MODULES:
+			module = f'{__package__}.{submodule}'
+
+		return super().find_class(module, name)
+
+
+# What unpickling a stale or damaged entry of the cache can raise.
+UNPICKLE_ERRORS = (pickle.UnpicklingError, ImportError, AttributeError, EOFError,
+                   IndexError, KeyError, TypeError, ValueError)
+
+
+def pickle_cards(cards: Dict[str, Question]) -> bytes:
+	return pickle.dumps(cards, pickle.HIGHEST_PROTOCOL)
+
+
+def unpickle_cards(data: bytes) -> Dict[str, Question]:
+	return _CardUnpickler(io.BytesIO(data)).load()
+
+
+class StudyResult(NamedTuple):
+	cards: Dict[str, Question]
+	games: int
+	plies: int
+
+
+# This runs in worker processes and must therefore only get picklable
+# arguments.
+def parse_study(
+    filename: str,
+    colour: chess.Color,
+    merge_transpositions: bool = False,
+    strings: Optional[Localisation] = None,
+    start: int = 0,
+    end: Optional[int] = None,
+) -> StudyResult:
+	visitor = PositionVisitor(
+	    colour=colour,
+	    merge_transpositions=merge_transpositions,
+	    strings=strings,
+	)
+
+	def get_visitor() -> chess.pgn.BaseVisitor:
+		return visitor
+
+	study_pgn: TextIO
+	if end is None:
+		study_pgn = open(filename, encoding='utf-8') # pylint: disable=consider-using-with
+	else:
+		# Only read the shard.  The boundaries are always at the start of a
+		# line, so that decoding the shard on its own is safe.
+		with open(filename, 'rb') as study_file:
+			study_file.seek(start)
+			data = study_file.read(end - start)
+		study_pgn = io.TextIOWrapper(io.BytesIO(data), encoding='utf-8')
+
+	with study_pgn:
+		while chess.pgn.read_game(study_pgn, Visitor=get_visitor):
+			pass
+
+	return StudyResult(visitor.cards, visitor.games, visitor.plies)
+
+
+def parse_pickled(
+    filename: str,
+    colour: chess.Color,
+    merge_transpositions: bool = False,
+    strings: Optional[Localisation] = None,
+    start: int = 0,
+    end: Optional[int] = None,
+) -> Tuple[bytes, int, int]:
+	# For the workers of the importer.  The cards are cached pickled, and
+	# they are sent back pickled anyway.
+	result = parse_study(filename, colour, merge_transpositions, strings, start,
+	                     end)
+
+	return pickle_cards(result.cards), result.games, result.plies
+
+
+def read_study(
+    filename: str,
+    colour: chess.Color,
+    merge_transpositions: bool = False,
+    strings: Optional[Localisation] = None,
+    start: int = 0,
+    end: Optional[int] = None,
+) -> Dict[str, Question]:
+	return parse_study(filename, colour, merge_transpositions, strings, start,
+	                   end).cards
@@ -0,0 +1,140 @@
+# Copyright (C) 2023-2024 Guido Flohr <guido.flohr@cantanea.com>,
+# all rights reserved.
+
+# This program is free software. It comes without any warranty, to
+# the extent permitted by applicable law. You can redistribute it
+# and/or modify it under the terms of the Do What the Fuck You Want
+# to Public License, Version 2, as published by Sam Hocevar. See
+# http://www.wtfpl.net/ for more details.
+
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple, cast
+
+from anki.collection import Collection
+from anki.decks import DeckId
+from anki.notes import NoteId, NotetypeId
+
+from .import_stats import ImportStats
+from .importer import Importer, ImportPlan
+from .media_index import MediaIndex
+from .parse_cache import ParseCache
+from .progress import Progress
+from .utils import referenced_media
+
+
+class DeckImport(NamedTuple):
+	deck_id: DeckId
+	colour: str
+	files: List[str]
+	merge_transpositions: bool
+
+
+def configured_imports(config: Dict[str, Any]) -> List[DeckImport]:
+	# Importing no files would delete all notes of the deck.
+	return [
+	    DeckImport(DeckId(int(deck_id)), record['colour'], record['files'],
+	               record.get('merge_transpositions', False))
+	    for deck_id, record in config['imports'].items() if record['files']
+	]
+
+
+class Sync:
+	# Imports into several decks in one go.  The decks share the parse
+	# cache, so that a file used by several decks is only read once for
+	# every colour.  All changes are one step for undo.
+
+
+	# pylint: disable=too-many-arguments
+	def __init__(
+	    self,
+	    collection: Collection,
+	    imports: List[DeckImport],
+	    notetype_id: NotetypeId,
+	    workers: int = 1,
+	    cache: Optional[ParseCache] = None,
+	    media_index: Optional[MediaIndex] = None,
+	    progress: Optional[Progress] = None,
+	) -> None:
+		self.collection = collection
+		self.media_index = media_index
+		self.importers = [
+		    Importer(
+		        filenames=deck_import.files,
+		        collection=collection,
+		        colour=deck_import.colour == 'white',
+		        notetype_id=notetype_id,
+		        deck_id=deck_import.deck_id,
+		        merge_transpositions=deck_import.merge_transpositions,
+		        workers=workers,
+		        cache=cache,
+		        media_index=media_index,
+		        progress=progress,
+		    ) for deck_import in imports
+		    # Decks deleted since their last import are skipped.
+		    if collection.decks.get(deck_import.deck_id, default=False)
+		]
+		self.stats = ImportStats()
+
+	def run(self) -> List[Tuple[int, int, int, int, int]]:
+		return self.apply(self.plan())
+
+	def plan(self) -> List[ImportPlan]:
+		return [importer.plan() for importer in self.importers]
+
+	def apply(self, plans: List[ImportPlan]) -> List[Tuple[int, int, int, int, int]]:
+		# The decks can share images.  An image that one deck no longer
+		# needs may be needed by another one.  All notes are therefore
+		# written first, then the notes are deleted, and only then the
+		# images that nobody uses any more are trashed.
+		col = self.collection
+		undo_entry = col.add_custom_undo_entry(_('Import PGN Files'))
+		try:
+			written: Set[str] = set()
+			for importer, plan in zip(self.importers, plans):
+				image_inserts = {
+				    path: page
+				    for path, page in plan.image_inserts.items()
+				    if path not in written
+				}
+				written.update(image_inserts)
+				importer.write(plan._replace(image_inserts=image_inserts, deletes=[]))
+
+			deletes = [note_id for plan in plans for note_id in plan.deletes]
+			if deletes:
+				with self.stats.phase('delete notes'):
+					col.remove_notes(cast(Sequence[NoteId], deletes))
+				self.stats.count('notes deleted', len(deletes))
+
+			image_deletes = self._image_deletes(plans)
+			if image_deletes:
+				self.importers[0].trash_images(image_deletes)
+
+			for importer, plan in zip(self.importers, plans):
+				importer.save(plan)
+		finally:
+			col.merge_undo_entries(undo_entry)
+
+		return [
+		    plan.counts()[:4] + (len(plan.image_deletes & image_deletes), )
+		    for plan in plans
+		]
+
+	def write_log(self, filename: str,
+	              results: List[Tuple[int, int, int, int, int]]) -> None:
+		for importer, counts in zip(self.importers, results):
+			importer.stats.write_log(filename,
+			                         deck=importer.deck['id'],
+			                         files=importer.filenames,
+			                         counts=list(counts))
+
+	def _image_deletes(self, plans: List[ImportPlan]) -> Set[str]:
+		candidates: Set[str] = set()
+		for plan in plans:
+			candidates |= plan.image_deletes
+		if not candidates:
+			return candidates
+
+		with self.stats.phase('find unused images'):
+			return candidates - referenced_media(self.collection)
+
+
+SyncResult = Tuple[Sync, List[Tuple[int, int, int, int, int]]]
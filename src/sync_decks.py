@@ -0,0 +1,37 @@
+# Copyright (C) 2023-2024 Guido Flohr <guido.flohr@cantanea.com>,
+# all rights reserved.
+
+# This program is free software. It comes without any warranty, to
+# the extent permitted by applicable law. You can redistribute it
+# and/or modify it under the terms of the Do What the Fuck You Want
+# to Public License, Version 2, as published by Sam Hocevar. See
+# http://www.wtfpl.net/ for more details.
+
+# Runs the imports of the add-on without Anki, for example:
+#
+#     python sync_decks.py ~/.local/share/Anki2/User\ 1/collection.anki2
+#
+# See "python sync_decks.py --help" for the options.  Anki's Python
+# package "anki" must be installed.
+
+import importlib
+import os
+import sys
+import types
+
+
+def load_cli() -> types.ModuleType:
+	# The __init__.py of the add-on needs Anki's user interface.  The
+	# directory is registered as a package without executing it.
+	directory = os.path.dirname(os.path.abspath(__file__))
+	sys.path.append(os.path.join(directory, 'vendor'))
+
+	package = types.ModuleType('chess_opening_trainer')
+	package.__path__ = [directory] # type: ignore[attr-defined]
+	sys.modules[package.__name__] = package
+
+	return importlib.import_module('chess_opening_trainer.cli')
+
+
+if __name__ == '__main__':
+	sys.exit(load_cli().main())
@@ -7,9 +7,6 @@
 # to Public License, Version 2, as published by Sam Hocevar. See
 # http://www.wtfpl.net/ for more details.
 
-import os
-import re
-from pathlib import Path
 from typing import Any, Union
 import semantic_version as sv
 import anki
@@ -27,6 +24,9 @@ class Updater:
 			raise RuntimeError(_('Cannot run without main window!'))
 		self.mw = mw
 		self.version = version
+		# Whether the images of an older version must be migrated, see
+		# MediaMigration.  The caller schedules that.
+		self.migrate_media = False
 
 
 	def update_config(self, old: Any) -> Any:
@@ -39,6 +39,9 @@ class Updater:
 		if not raw:
 			raw = {}
 
+		# A new installation has the version of config.json, 0.0.0, and no
+		# images to migrate.
+		stored = raw.get('version') not in (None, '', '0.0.0')
 		if 'version' not in raw or not raw['version']:
 			raw['version'] = '0.0.0'
 
@@ -48,6 +51,12 @@ class Updater:
 		if sv.Version(raw['version']) < sv.Version('1.0.0'):
 			raw = self._update_v1_0_0(raw)
 
+		if sv.Version(raw['version']) < sv.Version('1.1.0'):
+			raw = self._update_v1_1_0(raw)
+			# Images are now named after their content instead of the note
+			# id.
+			self.migrate_media = stored or bool(raw['imports'])
+
 		raw['version'] = self.version
 
 		return raw
@@ -80,49 +89,12 @@ class Updater:
 
 		raw['version'] = '1.0.0'
 
-		self._patch_notes_v1_0_0(raw)
-
 		return raw
 
-	def _patch_notes_v1_0_0(self, config:Any):
-		# pylint: disable=too-many-locals
-		col = self.mw.col
-		mm  = col.media
-		media_dir = mm.dir()
-
-		for _, deck_id in config['decks'].items():
-			if deck_id is not None:
-				for cid in col.decks.cids(deck_id):
-					card = col.get_card(cid)
-					note = card.note()
-
-					pattern = r'<img src="(chess-opening-trainer-[wb]-([0-9a-f]{40})\.svg)">'
-					text = note.fields[0] + note.fields[1]
-					for match in re.finditer(pattern, text):
-						old_name = match.group(1)
-						digest = match.group(2)
-						new_name = f'chess-opening-trainer-{note.id}-{digest}.svg'
-
-						old_path = os.path.join(media_dir, old_name)
-						if not Path(old_path).exists():
-							continue
-
-						with open(old_path, 'r', encoding='cp1252') as old_file:
-							data = old_file.read()
-							new_path = os.path.join(media_dir, new_name)
-							with open(new_path, 'w', encoding='cp1252') as new_file:
-								new_file.write(data)
-
-						Path.unlink(Path(old_path), missing_ok=True)
-
-						# We avoid col.find_and_replace() here because it goes
-						# over all fields which is too unspecific for our needs.
-						search = f'<img src="{old_name}">'
-						replace = f'<img src="{new_name}">'
-						note.fields[0] = note.fields[0].replace(search, replace)
-						note.fields[1] = note.fields[1].replace(search, replace)
-
-					col.update_note(note, skip_undo_entry=True)
+	def _update_v1_1_0(self, raw: Any):
+		raw['version'] = '1.1.0'
+
+		return raw
 
 	def _fill_config(self, raw: Any) -> Any:
 		if raw is None:
@@ -149,6 +121,15 @@ class Updater:
 		if 'notetype' not in raw or raw['notetype'] is None or isinstance(raw['notetype'], str):
 			raw['notetype'] = self._get_basic_notetype()
 
+		if 'workers' not in raw:
+			raw['workers'] = 1
+
+		if 'profile' not in raw:
+			raw['profile'] = False
+
+		if 'watch' not in raw:
+			raw['watch'] = False
+
 		return raw
 
 	def _get_basic_notetype(self) -> Union[NotetypeId, None]:
@@ -1,20 +1,94 @@
+import multiprocessing
 import os
 import re
-from typing import List
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Sequence, Set
 
+from anki.collection import Collection
+from anki.notes import NoteId
+from anki.utils import ids2str
 
-def find_media_files(media_path: str, note_ids: list[str]):
+
+# Older versions of the add-on had the note id in the name.
+MEDIA_REGEX = re.compile(
+    r'^chess-opening-trainer-(?:([1-9][0-9]*)-)?[0-9a-f]{40}\.svg$')
+
+IMAGE_REGEX = re.compile(r'<img src="(chess-opening-trainer-[-0-9a-f]+\.svg)">')
+
+
+def find_media_files(media_path: str, note_ids: Iterable[str]) -> List[str]:
+	# Files with one of the note ids in the name.
+	wanted = set(note_ids)
 	filenames: List[str] = []
 
-	for path in os.scandir(media_path):
-		if not os.path.isdir(path.path):
-			filename = os.path.basename(path)
-			regex = r'^chess-opening-trainer-([1-9][0-9]*)-[0-9a-f]{40}\.svg$'
-			match = re.match(regex, filename)
-			if not match:
-				continue
-			note_id = match.group(1)
-			if note_id in note_ids:
-				filenames.append(filename)
+	for entry in os.scandir(media_path):
+		match = MEDIA_REGEX.match(entry.name)
+		if match and match.group(1) in wanted and not entry.is_dir():
+			filenames.append(entry.name)
 
 	return filenames
+
+
+def list_media_files(media_path: str) -> Set[str]:
+	return {
+	    entry.name
+	    for entry in os.scandir(media_path)
+	    if MEDIA_REGEX.match(entry.name) and not entry.is_dir()
+	}
+
+
+def media_references(fields: Iterable[str]) -> Set[str]:
+	references: Set[str] = set()
+	for field in fields:
+		references.update(IMAGE_REGEX.findall(field))
+
+	return references
+
+
+def referenced_media(collection: Collection,
+                     exclude: Sequence[NoteId] = ()) -> Set[str]:
+	# All images that are used by notes of the collection, ignoring the
+	# notes excluded.
+	rows = collection.db.list(
+	    "SELECT flds FROM notes WHERE flds LIKE '%chess-opening-trainer-%'"
+	    f' AND id NOT IN {ids2str(exclude)}')
+
+	return media_references(rows)
+
+
+def user_files_dir() -> str:
+	# Anki keeps this directory, when the add-on is updated.
+	return os.path.join(os.path.dirname(__file__), 'user_files')
+
+
+def can_fork() -> bool:
+	# The interpreter bundled with Anki cannot be started again as a
+	# spawned worker, it would start another Anki.  Workers are therefore
+	# only forked.  That is not possible on Windows.  On macOS, the system
+	# libraries that Qt uses are not safe in a forked child of a process
+	# with threads, which is why Python does not fork there by default.
+	# The command-line script does not load Qt.  On Linux, the forked
+	# workers only parse and render, and never touch Qt.
+	if 'fork' not in multiprocessing.get_all_start_methods():
+		return False
+
+	return sys.platform != 'darwin' or 'aqt' not in sys.modules
+
+
+def worker_count(workers: int) -> int:
+	# Zero means one worker per CPU.  Where workers cannot be forked,
+	# everything is done in the calling process.
+	if not can_fork():
+		return 1
+	if workers <= 0:
+		return os.cpu_count() or 1
+
+	return workers
+
+
+def process_pool(workers: int) -> ProcessPoolExecutor:
+	# Only used when can_fork() is true.  Forked workers also inherit the
+	# add-on's modules.
+	return ProcessPoolExecutor(max_workers=workers,
+	                           mp_context=multiprocessing.get_context('fork'))
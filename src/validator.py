@@ -0,0 +1,172 @@
+# Generated from config.schema.json by tools/json2validator.py.  Do not
+# edit, but run "make src/validator.py" after changing the schema.
+
+import re
+from typing import Any
+
+
+class ValidationError(ValueError):
+	def __init__(self, path: str, message: str) -> None:
+		super().__init__(f'{path or "/"}: {message}')
+		self.path = path
+
+
+def validate(data: Any) -> None:
+	_validate_0(data, '')
+
+
+_PATTERN_0 = re.compile('^(?:0|[1-9][0-9]*)\\.(?:0|[1-9][0-9]*)\\.(?:0|[1-9][0-9]*)$')
+_PATTERN_1 = re.compile('[1-9][0-9]*')
+
+
+def _validate_0(data: Any, path: str) -> None:
+	if not isinstance(data, dict):
+		raise ValidationError(path, 'must be object')
+	if isinstance(data, dict):
+		if 'version' not in data:
+			raise ValidationError(path, 'needs version')
+		if 'colour' not in data:
+			raise ValidationError(path, 'needs colour')
+		if 'decks' not in data:
+			raise ValidationError(path, 'needs decks')
+		if 'imports' not in data:
+			raise ValidationError(path, 'needs imports')
+		if 'notetype' not in data:
+			raise ValidationError(path, 'needs notetype')
+		for key, value in data.items():
+			known = False
+			if key == 'version':
+				known = True
+				_validate_1(value, f'{path}/{key}')
+			elif key == 'colour':
+				known = True
+				_validate_2(value, f'{path}/{key}')
+			elif key == 'decks':
+				known = True
+				_validate_3(value, f'{path}/{key}')
+			elif key == 'imports':
+				known = True
+				_validate_5(value, f'{path}/{key}')
+			elif key == 'notetype':
+				known = True
+				_validate_4(value, f'{path}/{key}')
+			elif key == 'workers':
+				known = True
+				_validate_11(value, f'{path}/{key}')
+			elif key == 'profile':
+				known = True
+				_validate_10(value, f'{path}/{key}')
+			elif key == 'watch':
+				known = True
+				_validate_10(value, f'{path}/{key}')
+			if not known:
+				raise ValidationError(path, f'unexpected property {key}')
+
+
+def _validate_1(data: Any, path: str) -> None:
+	if not isinstance(data, str):
+		raise ValidationError(path, 'must be string')
+	if isinstance(data, str) and not _PATTERN_0.search(data):
+		raise ValidationError(path, 'must match ^(?:0|[1-9][0-9]*)\\.(?:0|[1-9][0-9]*)\\.(?:0|[1-9][0-9]*)$')
+
+
+def _validate_2(data: Any, path: str) -> None:
+	if not isinstance(data, str):
+		raise ValidationError(path, 'must be string')
+	if data not in ('white', 'black'):
+		raise ValidationError(path, 'must be one of "white", "black"')
+
+
+def _validate_3(data: Any, path: str) -> None:
+	if not isinstance(data, dict):
+		raise ValidationError(path, 'must be object')
+	if isinstance(data, dict):
+		if 'white' not in data:
+			raise ValidationError(path, 'needs white')
+		if 'black' not in data:
+			raise ValidationError(path, 'needs black')
+		for key, value in data.items():
+			known = False
+			if key == 'white':
+				known = True
+				_validate_4(value, f'{path}/{key}')
+			elif key == 'black':
+				known = True
+				_validate_4(value, f'{path}/{key}')
+			if not known:
+				raise ValidationError(path, f'unexpected property {key}')
+
+
+def _validate_4(data: Any, path: str) -> None:
+	if not ((isinstance(data, int) and not isinstance(data, bool)) or data is None):
+		raise ValidationError(path, 'must be integer or null')
+	if (isinstance(data, (int, float)) and not isinstance(data, bool)) and data < 1:
+		raise ValidationError(path, 'must be at least 1')
+
+
+def _validate_5(data: Any, path: str) -> None:
+	if not isinstance(data, dict):
+		raise ValidationError(path, 'must be object')
+	if isinstance(data, dict):
+		for key, value in data.items():
+			known = False
+			if _PATTERN_1.search(key):
+				known = True
+				_validate_6(value, f'{path}/{key}')
+			if not known:
+				raise ValidationError(path, f'unexpected property {key}')
+
+
+def _validate_6(data: Any, path: str) -> None:
+	if not isinstance(data, dict):
+		raise ValidationError(path, 'must be object')
+	if isinstance(data, dict):
+		if 'colour' not in data:
+			raise ValidationError(path, 'needs colour')
+		if 'files' not in data:
+			raise ValidationError(path, 'needs files')
+		for key, value in data.items():
+			known = False
+			if key == 'colour':
+				known = True
+				_validate_7(value, f'{path}/{key}')
+			elif key == 'files':
+				known = True
+				_validate_8(value, f'{path}/{key}')
+			elif key == 'merge_transpositions':
+				known = True
+				_validate_10(value, f'{path}/{key}')
+			if not known:
+				raise ValidationError(path, f'unexpected property {key}')
+
+
+def _validate_7(data: Any, path: str) -> None:
+	if not isinstance(data, str):
+		raise ValidationError(path, 'must be string')
+	if data not in ('black', 'white'):
+		raise ValidationError(path, 'must be one of "black", "white"')
+
+
+def _validate_8(data: Any, path: str) -> None:
+	if not isinstance(data, list):
+		raise ValidationError(path, 'must be array')
+	if isinstance(data, list):
+		for i, item in enumerate(data):
+			_validate_9(item, f'{path}/{i}')
+
+
+def _validate_9(data: Any, path: str) -> None:
+	if not isinstance(data, str):
+		raise ValidationError(path, 'must be string')
+
+
+def _validate_10(data: Any, path: str) -> None:
+	if not isinstance(data, bool):
+		raise ValidationError(path, 'must be boolean')
+
+
+def _validate_11(data: Any, path: str) -> None:
+	if not (isinstance(data, int) and not isinstance(data, bool)):
+		raise ValidationError(path, 'must be integer')
+	if (isinstance(data, (int, float)) and not isinstance(data, bool)) and data < 0:
+		raise ValidationError(path, 'must be at least 0')
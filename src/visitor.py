@@ -7,10 +7,10 @@
 # to Public License, Version 2, as published by Sam Hocevar. See
 # http://www.wtfpl.net/ for more details.
 
-import typing
-from typing import Dict, Literal, cast
+from typing import Dict, List, Literal, NamedTuple, Optional, cast
 
 import chess
+import chess.polyglot
 from chess import Color, Board
 from chess.pgn import BaseVisitor
 
@@ -18,67 +18,129 @@ from .answer import Answer
 from .question import Question
 
 
-# Monkey-patch the piece_symbol() method.
-def i18n_piece_symbol(piece_type: chess.PieceType) -> str:
-	piece_symbols = [
-	    None,
+class Localisation(NamedTuple):
+	# Table for str.translate() that replaces the piece letters in SAN.
+	san_table: Dict[int, str]
+	# Key for the card asking for the first move of the standard position.
+	start_text: str
+
+
+def localisation() -> Localisation:
+	# SAN always uses upper case letters for the pieces.  The localisation
+	# is done in one pass over the rendered move instead of patching
+	# chess.piece_symbol() for every single move.  It is computed once, so
+	# that worker processes do not need the gettext catalogs.
+	piece_symbols = {
 	    # TRANSLATORS: This is the letter to use for a pawn.
-	    _('p'),
+	    'P': _('p'),
 	    # TRANSLATORS: This is the letter to use for a knight.
-	    _('n'),
+	    'N': _('n'),
 	    # TRANSLATORS: This is the letter to use for a bishop.
-	    _('b'),
+	    'B': _('b'),
 	    # TRANSLATORS: This is the letter to use for a rook.
-	    _('r'),
+	    'R': _('r'),
 	    # TRANSLATORS: This is the letter to use for a queen.
-	    _('q'),
+	    'Q': _('q'),
 	    # TRANSLATORS: This is the letter to use for a king.
-	    _('k'),
-	]
-	return typing.cast(str, piece_symbols[piece_type])
+	    'K': _('k'),
+	}
+	san_table = str.maketrans(
+	    {letter: symbol.upper()
+	     for letter, symbol in piece_symbols.items()})
+
+	return Localisation(
+	    san_table=san_table,
+	    start_text=_('Moves from starting position?'),
+	)
 
 
 class PositionVisitor(BaseVisitor):
 
 
 	# pylint: disable=too-many-instance-attributes
-	def __init__(self, colour):
+	def __init__(
+	    self,
+	    colour,
+	    merge_transpositions: bool = False,
+	    strings: Optional[Localisation] = None,
+	):
 		self.colour: Color = colour
-		self.initial: Board
-		self.has_board = False
-		self.seen: Dict[str, str] = {}
+		self.merge_transpositions = merge_transpositions
+		# Maps the Zobrist hash of every position that we have a question
+		# for to the key of the first card that asked for it.
+		self.positions: Dict[int, str] = {}
 		self.cards: Dict[str, Question] = {}
 		self.last_text = None
 		self.accumulated_comments = []
 		self.my_move = True
+		if strings is None:
+			strings = localisation()
+		self.strings = strings
+
+		# The rendered move text after each ply of the current line.  The
+		# last element is the text leading to the current position.
+		self.line: List[str] = []
+		# Saved lines of the enclosing variations.
+		self.variations: List[List[str]] = []
+
+		# Only for the statistics.
+		self.games = 0
+		self.plies = 0
 
 	def begin_game(self) -> None:
-		self.has_board = False
+		# Nothing may leak from one game into the next.  Otherwise, the
+		# result would depend on how the games are split into files.
+		self.games += 1
+		self.last_text = None
+		self.accumulated_comments = []
+		self.my_move = True
+		self.line = []
+		self.variations = []
 
-	def visit_board(self, board) -> None:
-		if not self.has_board:
-			self.initial = board.copy()
-			self.has_board = True
+	def begin_variation(self) -> None:
+		# A variation replaces the last move of the current line.
+		self.variations.append(self.line)
+		self.line = self.line[:-1]
+
+	def end_variation(self) -> None:
+		self.line = self.variations.pop()
+
+	def _push_san(self, board: Board, san: str) -> None:
+		if self.line:
+			prefix = self.line[-1] + ' '
+		else:
+			prefix = ''
+
+		if board.turn == chess.WHITE:
+			text = f'{prefix}{board.fullmove_number}. {san}'
+		elif not self.line:
+			text = f'{board.fullmove_number}...{san}'
+		else:
+			text = prefix + san
+		self.line.append(text)
 
 	def visit_move(self, board, move) -> None:
+		self.plies += 1
+		if self.line:
+			text = self.line[-1]
+		else:
+			text = ''
+		san = board.san(move).translate(self.strings.san_table)
+		self._push_san(board, san)
+
 		if board.turn == self.colour:
-			if board.ply():
-				saved_piece_symbol = chess.piece_symbol
-				chess.piece_symbol = i18n_piece_symbol
-				text = self.initial.variation_san(board.move_stack)
-				chess.piece_symbol = saved_piece_symbol
-			else:
-				text = _('Moves from starting position?')
-			answer_board = board.copy()
-			saved_piece_symbol = chess.piece_symbol
-			chess.piece_symbol = i18n_piece_symbol
-			san = answer_board.san(move)
-			chess.piece_symbol = saved_piece_symbol
+			if not board.ply():
+				text = self.strings.start_text
+			position = chess.polyglot.zobrist_hash(board)
+			if (self.merge_transpositions and text not in self.cards
+			    and position in self.positions):
+				# Transposition into a position that already has a card.
+				text = self.positions[position]
+
+			# The boards only need the last move for rendering.  Copying the
+			# entire move stack would make every move cost O(depth) again.
+			answer_board = board.copy(stack=False)
 			answer_board.push(move)
-			fen = answer_board.fen
-			if fen in self.seen:
-				# Already seen.
-				return
 
 			answer = Answer(
 			    san,
@@ -92,13 +154,19 @@ class PositionVisitor(BaseVisitor):
 				    text,
 				    turn=turn,
 				    colour=self.colour,
+				    position=position,
 				)
+				self.positions.setdefault(position, text)
 				if hasattr(self, 'accumulated_comments'):
 					for comment in self.accumulated_comments:
 						question.add_comment(comment)
 						self.accumulated_comments = []
-				question.set_board(board.copy())
+				question.set_board(board.copy(stack=1))
 			elif answer.find(self.cards[text].answers):
+				# Comments on a known answer are ignored.  They would
+				# otherwise end up on the answer before, and only when the
+				# answer was read with the same visitor.
+				self.last_text = None
 				return
 
 			self.cards[text].add_answer(answer)
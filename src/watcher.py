@@ -0,0 +1,133 @@
+# Copyright (C) 2023-2024 Guido Flohr <guido.flohr@cantanea.com>,
+# all rights reserved.
+
+# This program is free software. It comes without any warranty, to
+# the extent permitted by applicable law. You can redistribute it
+# and/or modify it under the terms of the Do What the Fuck You Want
+# to Public License, Version 2, as published by Sam Hocevar. See
+# http://www.wtfpl.net/ for more details.
+
+import os
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+	from .parse_cache import ParseCache
+	from .sync import DeckImport
+
+# A modified file is only imported, when it has not changed for that many
+# seconds.  Editors and chess programs often write a file in several
+# steps.
+SETTLE_TIME = 2.0
+
+# Seconds until the files of a failed import are reported again.
+RETRY_TIME = 60.0
+
+FileState = Optional[Tuple[int, int]]
+
+# The state of a file that was imported into several decks in different
+# states.  It never matches a file on disk.
+UNKNOWN_STATE: FileState = (-1, -1)
+
+
+def file_state(path: str) -> FileState:
+	try:
+		stat = os.stat(path)
+	except OSError:
+		return None
+
+	return stat.st_size, stat.st_mtime_ns
+
+
+def imported_states(cache: 'ParseCache', collection_path: str,
+                    imports: List['DeckImport']) -> Dict[str, FileState]:
+	# The state of the files in the last successful imports, as remembered
+	# by the importer.  Files that have changed since, for example while
+	# Anki was not running, are then reported by the first polls.
+	# pylint: disable=import-outside-toplevel
+	from .parse_cache import import_key
+
+	states: Dict[str, FileState] = {}
+	for deck_import in imports:
+		record = cache.last_import(import_key(collection_path, deck_import.deck_id))
+		if record is None:
+			continue
+
+		files = {path: (size, mtime_ns) for path, size, mtime_ns, _ in record['files']}
+		for path in deck_import.files:
+			state = files.get(os.path.abspath(path))
+			if state is None:
+				continue
+			states[path] = state if states.get(path, state) == state else UNKNOWN_STATE
+
+	return states
+
+
+class FileWatcher:
+	# Tells which imports have files that were modified since they were
+	# last imported successfully.  Files without a known state are
+	# remembered, when they are first seen.  Modified files are reported
+	# until imported() or import_failed() is called for them.
+	def __init__(self,
+	             known: Optional[Dict[str, FileState]] = None,
+	             settle_time: float = SETTLE_TIME,
+	             retry_time: float = RETRY_TIME,
+	             clock: Callable[[], float] = time.monotonic) -> None:
+		self.settle_time = settle_time
+		self.retry_time = retry_time
+		self.clock = clock
+		self.known: Dict[str, FileState] = dict(known or {})
+		# The new state of a modified file, and when it was seen first.
+		self.pending: Dict[str, Tuple[FileState, float]] = {}
+		# The state of the files that have been reported.
+		self.reported: Dict[str, FileState] = {}
+		# When the files of a failed import may be reported again.
+		self.retry_at: Dict[str, float] = {}
+
+	def poll(self, imports: List['DeckImport']) -> List['DeckImport']:
+		now = self.clock()
+		modified = set()
+		for path in {path for deck_import in imports for path in deck_import.files}:
+			state = file_state(path)
+			if path not in self.known:
+				self.known[path] = state
+				continue
+
+			if state == self.known[path] and path not in self.pending:
+				continue
+
+			pending = self.pending.get(path)
+			if pending is None or pending[0] != state:
+				self.pending[path] = (state, now)
+				continue
+
+			if now - pending[1] < self.settle_time or now < self.retry_at.get(path, now):
+				continue
+
+			del self.pending[path]
+			# Files that are gone are imported, when they are back.
+			if state is None or state == self.known[path]:
+				self.known[path] = state
+			else:
+				modified.add(path)
+				self.reported[path] = state
+
+		return [
+		    deck_import for deck_import in imports
+		    if modified.intersection(deck_import.files)
+		]
+
+	def imported(self, imports: List['DeckImport']) -> None:
+		# A file that has changed again since it was reported is reported
+		# again.
+		for path in {path for deck_import in imports for path in deck_import.files}:
+			if path in self.reported:
+				self.known[path] = self.reported.pop(path)
+			self.retry_at.pop(path, None)
+
+	def import_failed(self, imports: List['DeckImport']) -> None:
+		retry_at = self.clock() + self.retry_time
+		for path in {path for deck_import in imports for path in deck_import.files}:
+			if path in self.reported:
+				del self.reported[path]
+				self.retry_at[path] = retry_at
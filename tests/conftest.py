@@ -0,0 +1,43 @@
+import gettext
+import os
+import sys
+import types
+
+import pytest
+
+# The add-on's __init__.py needs a running Anki.  Register the package
+# without executing it, so that the modules can be tested headless.
+if 'src' not in sys.modules:
+	package = types.ModuleType('src')
+	package.__path__ = [ # type: ignore[attr-defined]
+		os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src')
+	]
+	sys.modules['src'] = package
+
+# Anki installs these for the add-on.
+gettext.NullTranslations().install(names=['ngettext'])
+
+
+def pytest_configure(config):
+	config.addinivalue_line(
+	    'markers',
+	    'benchmark: micro-benchmarks, only run with --benchmark or --benchmark-save')
+
+
+def pytest_addoption(parser):
+	parser.addoption('--benchmark',
+	                 action='store_true',
+	                 help='run the benchmarks marked with "benchmark"')
+	parser.addoption('--benchmark-save',
+	                 action='store_true',
+	                 help='run the benchmarks and store the results as baseline')
+
+
+def pytest_collection_modifyitems(config, items):
+	if config.getoption('--benchmark') or config.getoption('--benchmark-save'):
+		return
+
+	skip = pytest.mark.skip(reason='benchmarks only run with --benchmark')
+	for item in items:
+		if 'benchmark' in item.keywords:
+			item.add_marker(skip)
@@ -0,0 +1,140 @@
+import os
+import sqlite3
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence
+
+from anki.collection import AddNoteRequest
+from anki.utils import ids2str, join_fields
+
+
+class FakeNote:
+	def __init__(self, notetype: Dict[str, Any]):
+		self.id = 0
+		self.mid = notetype['id']
+		self.fields = [''] * len(notetype['flds'])
+
+
+class FakeDB:
+	def __init__(self, calls: Counter):
+		self.calls = calls
+		self.sqlite = sqlite3.connect(':memory:')
+		self.sqlite.execute(
+		    'CREATE TABLE notes (id INTEGER PRIMARY KEY, mid INTEGER, flds TEXT)')
+		self.sqlite.execute(
+		    'CREATE TABLE cards (id INTEGER PRIMARY KEY, nid INTEGER, did INTEGER)')
+		self.sqlite.execute('CREATE INDEX cards_did ON cards (did)')
+
+	def all(self, sql: str, *args) -> List[List[Any]]:
+		self.calls['db.all'] += 1
+		return [list(row) for row in self.sqlite.execute(sql, args)]
+
+	def list(self, sql: str, *args) -> List[Any]:
+		self.calls['db.list'] += 1
+		return [row[0] for row in self.sqlite.execute(sql, args)]
+
+
+class FakeModels:
+	def __init__(self, calls: Counter):
+		self.calls = calls
+		self.notetype = {'id': 1, 'name': 'Basic', 'flds': [{}, {}]}
+
+	def get(self, notetype_id) -> Optional[Dict[str, Any]]:
+		self.calls['models.get'] += 1
+		return self.notetype if notetype_id == self.notetype['id'] else None
+
+
+class FakeDecks:
+	def __init__(self, calls: Counter, db: FakeDB):
+		self.calls = calls
+		self.db = db
+		self.decks: Dict[str, Dict[str, Any]] = {}
+
+	def id(self, name: str) -> int:
+		if name not in self.decks:
+			self.decks[name] = {'id': len(self.decks) + 1, 'name': name, 'mod': 0}
+		return self.decks[name]['id']
+
+	def get(self, did, default: bool = True) -> Optional[Dict[str, Any]]:
+		# pylint: disable=unused-argument
+		self.calls['decks.get'] += 1
+		for deck in self.decks.values():
+			if deck['id'] == did:
+				return deck
+		return None
+
+	def card_count(self, did, include_subdecks: bool) -> int:
+		# pylint: disable=unused-argument
+		self.calls['decks.card_count'] += 1
+		return self.db.sqlite.execute('SELECT COUNT(*) FROM cards WHERE did = ?',
+		                              (did, )).fetchone()[0]
+
+
+class FakeMedia:
+	def __init__(self, calls: Counter, media_dir: str):
+		self.calls = calls
+		self.media_dir = media_dir
+		os.makedirs(media_dir, exist_ok=True)
+
+	def dir(self) -> str:
+		return self.media_dir
+
+	def trash_files(self, fnames: Sequence[str]) -> None:
+		self.calls['media.trash_files'] += 1
+		for fname in fnames:
+			os.unlink(os.path.join(self.media_dir, fname))
+
+
+class FakeCollection:
+	# Just what the importer uses of an anki.collection.Collection, with a
+	# count of the calls into the backend.
+	def __init__(self, directory: str):
+		self.path = os.path.join(directory, 'collection.anki2')
+		self.calls: Counter = Counter()
+		self.db = FakeDB(self.calls)
+		self.models = FakeModels(self.calls)
+		self.decks = FakeDecks(self.calls, self.db)
+		self.media = FakeMedia(self.calls, os.path.join(directory, 'collection.media'))
+		self.next_id = 1
+
+	def new_note(self, notetype: Dict[str, Any]) -> FakeNote:
+		return FakeNote(notetype)
+
+	def get_note(self, note_id) -> FakeNote:
+		self.calls['get_note'] += 1
+		mid, flds = self.db.sqlite.execute('SELECT mid, flds FROM notes WHERE id = ?',
+		                                   (note_id, )).fetchone()
+		note = FakeNote(self.models.notetype)
+		note.id, note.mid, note.fields = note_id, mid, flds.split('\x1f')
+		return note
+
+	def add_notes(self, requests: Sequence[AddNoteRequest]) -> None:
+		self.calls['add_notes'] += 1
+		for request in requests:
+			note = request.note
+			note.id = self.next_id
+			self.next_id += 1
+			self.db.sqlite.execute('INSERT INTO notes VALUES (?, ?, ?)',
+			                       (note.id, note.mid, join_fields(note.fields)))
+			self.db.sqlite.execute('INSERT INTO cards (nid, did) VALUES (?, ?)',
+			                       (note.id, request.deck_id))
+
+	def update_notes(self, notes: Sequence[FakeNote]) -> None:
+		self.calls['update_notes'] += 1
+		self.db.sqlite.executemany('UPDATE notes SET flds = ? WHERE id = ?',
+		                           [(join_fields(note.fields), note.id)
+		                            for note in notes])
+
+	def remove_notes(self, note_ids: Sequence[int]) -> None:
+		self.calls['remove_notes'] += 1
+		ids = ids2str(note_ids)
+		self.db.sqlite.execute(f'DELETE FROM cards WHERE nid IN {ids}')
+		self.db.sqlite.execute(f'DELETE FROM notes WHERE id IN {ids}')
+
+	def add_custom_undo_entry(self, name: str) -> int:
+		# pylint: disable=unused-argument
+		self.calls['add_custom_undo_entry'] += 1
+		return 1
+
+	def merge_undo_entries(self, target: int) -> None:
+		# pylint: disable=unused-argument
+		self.calls['merge_undo_entries'] += 1
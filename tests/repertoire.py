@@ -0,0 +1,52 @@
+import random
+
+import chess
+import chess.pgn
+
+COLOURS = 'RGYB'
+
+
+def _arrows(rng: random.Random, move: chess.Move) -> str:
+	tail = chess.square_name(move.from_square)
+	head = chess.square_name(move.to_square)
+	other = chess.square_name(rng.choice(chess.SQUARES))
+
+	return (f'[%cal {rng.choice(COLOURS)}{tail}{head},{rng.choice(COLOURS)}{head}{other}]'
+	        f' [%csl {rng.choice(COLOURS)}{other}]')
+
+
+def repertoire(seed: int,
+               branching: int = 3,
+               depth: int = 12,
+               comment_density: float = 0.2,
+               arrow_density: float = 0.1,
+               colour: chess.Color = chess.WHITE) -> str:
+	# A deterministic repertoire for the given side.  There is one move for
+	# every position of the side, and up to the branching factor replies
+	# by the opponent.  A full tree has branching ** (depth / 2) lines.
+	rng = random.Random(seed)
+	game = chess.pgn.Game()
+	game.headers['Event'] = f'Repertoire {seed}'
+
+	def grow(node: chess.pgn.GameNode, board: chess.Board, plies: int) -> None:
+		if not plies:
+			return
+
+		legal = sorted(board.legal_moves, key=lambda move: move.uci())
+		count = 1 if board.turn == colour else branching
+		for move in rng.sample(legal, min(count, len(legal))):
+			child = node.add_variation(move)
+			comments = []
+			if rng.random() < comment_density:
+				comments.append(f'Comment on {board.san(move)}.')
+			if rng.random() < arrow_density:
+				comments.append(_arrows(rng, move))
+			child.comment = ' '.join(comments)
+
+			board.push(move)
+			grow(child, board, plies - 1)
+			board.pop()
+
+	grow(game, chess.Board(), depth)
+
+	return str(game) + '\n'
@@ -0,0 +1,57 @@
+import io
+import random
+from typing import List, Tuple
+
+import chess
+import chess.pgn
+
+from src.question import Question
+
+
+def read(pgn: str, visitor: chess.pgn.BaseVisitor) -> None:
+	handle = io.StringIO(pgn)
+	while chess.pgn.read_game(handle, Visitor=lambda: visitor):
+		pass
+
+
+def random_line(rng: random.Random, depth: int) -> str:
+	board = chess.Board()
+	while len(board.move_stack) < depth:
+		moves = list(board.legal_moves)
+		if not moves:
+			break
+		board.push(rng.choice(moves))
+
+	return chess.Board().variation_san(board.move_stack)
+
+
+def random_pgn(seed: int, lines: int, depth: int) -> str:
+	rng = random.Random(seed)
+	games: List[str] = []
+	for _ in range(lines):
+		games.append(f'[Event "?"]\n\n{random_line(rng, depth)} *\n')
+
+	return '\n'.join(games)
+
+
+def dump_cards(cards: dict[str, Question]) -> List[Tuple]:
+	# Everything that ends up in a note, in a form that can be compared.
+	dump: List[Tuple] = []
+	for text, question in cards.items():
+		answers = [(
+		    answer.move,
+		    answer.fullmove_number,
+		    answer.comments,
+		    [arrow.pgn() for arrow in answer.arrows],
+		    answer.fills,
+		    answer.board.fen() if answer.board else None,
+		) for answer in question.answers]
+		dump.append((
+		    text,
+		    question.moves,
+		    question.comments,
+		    question.board.fen() if question.board else None,
+		    answers,
+		))
+
+	return dump
@@ -0,0 +1,154 @@
+import json
+import os
+import re
+import tempfile
+import time
+import unittest
+from typing import Callable, Dict, List
+
+import chess
+import pytest
+
+from src.page import Page
+from src.question import Question
+from src.visitor import PositionVisitor
+
+from .repertoire import repertoire
+from .synthetic import read
+
+# Results are in units per second, and of course depend on the machine.
+# Store your own baseline with --benchmark-save before changing the code.
+BASELINE = os.path.join(os.path.dirname(__file__), 'benchmarks.json')
+
+# Slower than the baseline by more than that fails.
+TOLERANCE = 0.3
+
+REPEAT = 5
+
+
+def measure(func: Callable[[], int]) -> float:
+	# Best of several runs, in units per second.
+	rates: List[float] = []
+	for _ in range(REPEAT):
+		start = time.perf_counter()
+		units = func()
+		rates.append(units / (time.perf_counter() - start))
+
+	return max(rates)
+
+
+def pages(cards: Dict[str, Question]) -> List[Page]:
+	result: List[Page] = []
+	for question in cards.values():
+		result.append(question)
+		result.extend(question.answers)
+
+	return result
+
+
+@pytest.mark.benchmark
+class TestBenchmarks(unittest.TestCase):
+	results: Dict[str, float] = {}
+
+	@pytest.fixture(autouse=True)
+	def _options(self, request):
+		self.save = request.config.getoption('--benchmark-save')
+
+	@classmethod
+	def setUpClass(cls):
+		cls.pgn = repertoire(1,
+		                     branching=3,
+		                     depth=14,
+		                     comment_density=0.3,
+		                     arrow_density=0.2)
+		visitor = PositionVisitor(chess.WHITE)
+		read(cls.pgn, visitor)
+		cls.plies = visitor.plies
+		cls.cards = visitor.cards
+
+	@classmethod
+	def tearDownClass(cls):
+		baseline: Dict[str, float] = {}
+		if os.path.exists(BASELINE):
+			with open(BASELINE, encoding='utf-8') as file:
+				baseline = json.load(file)
+
+		for name, rate in sorted(cls.results.items()):
+			if name in baseline:
+				change = rate / baseline[name] - 1
+				print(f'{name}: {rate:.0f}/s ({change:+.0%} against baseline)')
+			else:
+				print(f'{name}: {rate:.0f}/s')
+
+	def _record(self, name: str, rate: float) -> None:
+		self.results[name] = rate
+		baseline: Dict[str, float] = {}
+		if os.path.exists(BASELINE):
+			with open(BASELINE, encoding='utf-8') as file:
+				baseline = json.load(file)
+
+		if self.save:
+			baseline[name] = round(rate, 1)
+			with open(BASELINE, 'w', encoding='utf-8') as file:
+				json.dump(baseline, file, indent='\t', sort_keys=True)
+				file.write('\n')
+		elif name in baseline:
+			self.assertGreater(rate, baseline[name] * (1 - TOLERANCE),
+			                   f'{name} is slower than the baseline')
+
+	def test_visitor_plies(self):
+		def parse() -> int:
+			read(self.pgn, PositionVisitor(chess.WHITE))
+			return self.plies
+
+		self._record('visitor plies', measure(parse))
+
+	def test_image_path(self):
+		all_pages = pages(self.cards)
+
+		def image_paths() -> int:
+			for page in all_pages:
+				# pylint: disable=protected-access
+				page._image_path = None
+				page.image_path()
+			return len(all_pages)
+
+		self._record('image_path pages', measure(image_paths))
+
+	def test_render_notes(self):
+		def render() -> int:
+			for question in self.cards.values():
+				# Without the memoized values of earlier runs.
+				for page in [question, *question.answers]:
+					# pylint: disable=protected-access
+					page._image_path = None
+				question._fingerprint = None # pylint: disable=protected-access
+				question.render()
+				question.render_answers()
+			return len(self.cards)
+
+		self._record('render notes', measure(render))
+
+	def test_process_arrows(self):
+		comments = re.findall(r'\{([^}]*\[%[^}]*)\}', self.pgn)
+		self.assertTrue(comments)
+
+		def process_arrows() -> int:
+			page = Page(chess.WHITE, chess.WHITE)
+			for comment in comments:
+				page.process_arrows(comment)
+			return len(comments)
+
+		self._record('process_arrows comments', measure(process_arrows))
+
+	def test_render_svg(self):
+		all_pages = pages(self.cards)[:300]
+		with tempfile.TemporaryDirectory() as tmpdir:
+			path = os.path.join(tmpdir, 'board.svg')
+
+			def render_svg() -> int:
+				for page in all_pages:
+					page.render_svg(path)
+				return len(all_pages)
+
+			self._record('render_svg images', measure(render_svg))
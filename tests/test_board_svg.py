@@ -0,0 +1,87 @@
+import random
+import time
+import unittest
+from typing import List, Optional, Tuple
+
+import chess
+import chess.svg
+
+from src import board_svg
+
+COLOURS = ['green', 'red', 'yellow', 'blue']
+
+Sample = Tuple[chess.Board, Optional[chess.Move], Optional[chess.Square],
+               List[Tuple[chess.Square, chess.Square, str]]]
+
+
+def samples(seed: int, count: int) -> List[Sample]:
+	rng = random.Random(seed)
+	result: List[Sample] = []
+	for _ in range(count):
+		board = chess.Board()
+		for _ in range(rng.randint(0, 80)):
+			moves = list(board.legal_moves)
+			if not moves:
+				break
+			board.push(rng.choice(moves))
+
+		lastmove = board.peek() if board.move_stack else None
+		check = board.king(board.turn) if board.is_check() else None
+		arrows = []
+		for _ in range(rng.choice([0, 0, 1, 2, 4])):
+			tail = rng.choice(chess.SQUARES)
+			head = tail if rng.random() < 0.3 else rng.choice(chess.SQUARES)
+			arrows.append((tail, head, rng.choice(COLOURS)))
+		result.append((board, lastmove, check, arrows))
+
+	return result
+
+
+def reference(sample: Sample, orientation: chess.Color) -> str:
+	board, lastmove, check, arrows = sample
+	return chess.svg.board(
+	    board,
+	    lastmove=lastmove,
+	    check=check,
+	    orientation=orientation,
+	    arrows=[chess.svg.Arrow(tail, head, color=color) for tail, head, color in arrows])
+
+
+def render(sample: Sample, orientation: chess.Color) -> str:
+	board, lastmove, check, arrows = sample
+	return board_svg.render(board.fen(), lastmove, check, arrows, orientation)
+
+
+class TestBoardSvg(unittest.TestCase):
+	def test_render(self):
+		for sample in samples(1, 300):
+			for orientation in chess.COLORS:
+				self.assertEqual(reference(sample, orientation),
+				                 render(sample, orientation))
+
+	def test_special_positions(self):
+		special = [
+		    # No pieces of one kind.
+		    chess.Board('8/8/8/4k3/8/8/8/4K3 w - - 0 1'),
+		    # Check with promoted pieces.
+		    chess.Board('4k2Q/8/8/8/8/8/8/4K3 b - - 0 1'),
+		]
+		for board in special:
+			check = board.king(board.turn) if board.is_check() else None
+			sample: Sample = (board, None, check, [(chess.E1, chess.E1, 'red')])
+			for orientation in chess.COLORS:
+				self.assertEqual(reference(sample, orientation),
+				                 render(sample, orientation))
+
+	def test_speed(self):
+		boards = samples(2, 300)
+		timings = {}
+		for name, renderer in (('chess.svg', reference), ('template', render)):
+			start = time.perf_counter()
+			for sample in boards:
+				renderer(sample, chess.WHITE)
+			timings[name] = len(boards) / (time.perf_counter() - start)
+
+		print(', '.join(f'{name}: {rate:.0f} images/s'
+		                for name, rate in timings.items()))
+		self.assertGreater(timings['template'], timings['chess.svg'])
@@ -0,0 +1,136 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from typing import List
+
+from anki.collection import Collection
+
+SYNC_DECKS = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src',
+                          'sync_decks.py')
+
+# Runs the script and fails, if it has loaded Anki's user interface.
+RUNNER = '''
+import runpy, sys
+sys.argv = sys.argv[1:]
+try:
+	runpy.run_path(sys.argv[0], run_name='__main__')
+except SystemExit as e:
+	status = e.code
+assert 'aqt' not in sys.modules
+sys.exit(status)
+'''
+
+STUDY = '''[Event "Ruy Lopez"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bb5 {The Spanish.} a6 (3... Nf6 4. O-O) 4. Ba4 Nf6
+5. O-O *
+
+[Event "Sicilian"]
+
+1. e4 c5 2. Nf3 {[%cal Gd2d4]} d6 3. d4 *
+'''
+
+
+class TestCli(unittest.TestCase):
+	def setUp(self):
+		# pylint: disable=consider-using-with
+		self.tmpdir = tempfile.TemporaryDirectory()
+		self.collection_path = os.path.join(self.tmpdir.name, 'collection.anki2')
+		collection = Collection(self.collection_path)
+		self.deck_id = collection.decks.id('Chess::White')
+		collection.close()
+
+		self.filename = os.path.join(self.tmpdir.name, 'study.pgn')
+		with open(self.filename, 'w', encoding='utf-8') as file:
+			file.write(STUDY)
+
+	def tearDown(self):
+		self.tmpdir.cleanup()
+
+	def _run(self, *args: str) -> subprocess.CompletedProcess:
+		command: List[str] = [
+		    sys.executable, '-c', RUNNER, SYNC_DECKS, self.collection_path,
+		    '--user-files',
+		    os.path.join(self.tmpdir.name, 'user_files'), *args
+		]
+		return subprocess.run(command,
+		                      capture_output=True,
+		                      encoding='utf-8',
+		                      check=False)
+
+	def _note_count(self) -> int:
+		collection = Collection(self.collection_path)
+		try:
+			return len(collection.find_notes(f'did:{self.deck_id}'))
+		finally:
+			collection.close()
+
+	def test_deck(self):
+		result = self._run('--deck', 'Chess::White', '--colour', 'white',
+		                   self.filename)
+		self.assertEqual(0, result.returncode, result.stderr)
+		self.assertIn('Chess::White: 8 inserted, 0 updated, 0 deleted', result.stdout)
+		self.assertIn('  parse: ', result.stdout)
+		self.assertIn('  games: 2', result.stdout)
+		self.assertEqual(8, self._note_count())
+
+		log = os.path.join(self.tmpdir.name, 'user_files', 'import-log.jsonl')
+		with open(log, encoding='utf-8') as file:
+			record = json.loads(file.readline())
+		self.assertEqual(self.deck_id, record['deck'])
+		self.assertEqual([8, 0, 0], record['counts'][:3])
+
+	def test_config(self):
+		config = os.path.join(self.tmpdir.name, 'meta.json')
+		with open(config, 'w', encoding='utf-8') as file:
+			json.dump({
+			    'config': {
+			        'notetype': None,
+			        'imports': {
+			            str(self.deck_id): {
+			                'colour': 'white',
+			                'files': [self.filename],
+			            },
+			        },
+			    }
+			}, file)
+
+		result = self._run('--config', config)
+		self.assertEqual(0, result.returncode, result.stderr)
+		self.assertIn('8 inserted', result.stdout)
+
+		result = self._run('--config', config)
+		self.assertEqual(0, result.returncode, result.stderr)
+		self.assertIn('0 inserted, 0 updated, 0 deleted', result.stdout)
+		self.assertEqual(8, self._note_count())
+
+	def test_errors(self):
+		result = self._run('--deck', 'Chess::White')
+		self.assertEqual(1, result.returncode)
+		self.assertIn('No input files specified!', result.stderr)
+
+		result = self._run('--deck', 'Nonexistent', self.filename)
+		self.assertEqual(1, result.returncode)
+		self.assertIn('Selected deck does not exist!', result.stderr)
+
+	def test_language(self):
+		# The card keys contain the translated piece letters.
+		result = self._run('--deck', 'Chess::White', '--lang', 'de', self.filename)
+		self.assertEqual(0, result.returncode, result.stderr)
+		self.assertIn('8 inserted', result.stdout)
+
+		with open(self.filename, 'a', encoding='utf-8') as file:
+			file.write('\n[Event "French"]\n\n1. e4 e6 2. d4 *\n')
+
+		# Another language would replace all notes.
+		result = self._run('--deck', 'Chess::White', '--lang', 'en', self.filename)
+		self.assertEqual(1, result.returncode)
+		self.assertIn('another language', result.stderr)
+
+		# By default, the language of the last import is used.
+		result = self._run('--deck', 'Chess::White', self.filename)
+		self.assertEqual(0, result.returncode, result.stderr)
+		self.assertIn('1 inserted, 0 updated, 0 deleted', result.stdout)
@@ -0,0 +1,131 @@
+import io
+import os
+import tempfile
+import unittest
+from typing import List
+from unittest.mock import patch
+
+import chess
+import chess.pgn
+
+from src.cardset import CardSet
+from src.game_index import chunks, game_offsets, scan_game_offsets
+from src.study import read_study
+
+from .synthetic import dump_cards, random_pgn
+
+TRICKY = '''﻿[Event "First"]
+
+[Site "Empty line between headers"]
+
+1. e4 {A comment with an empty line
+
+[and a line that looks like a header]} e5 *
+
+% [Event "Escaped"] {
+[Event "Second"]
+[Site "No empty line before, so still the first game"]
+
+1. d4 ; { not a comment
+d5 *
+
+
+[Event "Third"]
+
+1. c4 e5 *
+'''
+
+
+def read_games(pgn: str) -> List[str]:
+	handle = io.StringIO(pgn)
+	events: List[str] = []
+	while True:
+		game = chess.pgn.read_game(handle)
+		if game is None:
+			break
+		events.append(game.headers['Event'])
+
+	return events
+
+
+class TestGameIndex(unittest.TestCase):
+	def setUp(self):
+		# pylint: disable=consider-using-with
+		self.tmpdir = tempfile.TemporaryDirectory()
+
+	def tearDown(self):
+		self.tmpdir.cleanup()
+
+	def _write(self, name: str, pgn: str, newline: str = '\n') -> str:
+		filename = os.path.join(self.tmpdir.name, name)
+		with open(filename, 'w', encoding='utf-8', newline=newline) as file:
+			file.write(pgn)
+
+		return filename
+
+	def test_scan(self):
+		data = TRICKY.encode('utf-8')
+		offsets = scan_game_offsets(data)
+
+		# The second game does not follow an empty line.
+		self.assertEqual(2, len(offsets))
+		self.assertTrue(data[offsets[1]:].startswith(b'[Event "Third"]'))
+
+		# Every offset must be where python-chess starts a game.
+		self.assertEqual(['First', 'Second', 'Third'], read_games(TRICKY))
+		self.assertEqual(['Third'], read_games(data[offsets[1]:].decode('utf-8')))
+
+	def test_scan_crlf(self):
+		filename = self._write('crlf.pgn', random_pgn(1, 10, 20), '\r\n')
+		self.assertEqual(10, len(game_offsets(filename)))
+
+	def test_cache(self):
+		filename = self._write('study.pgn', random_pgn(1, 10, 20))
+		offsets = game_offsets(filename)
+		index_path = os.path.join(self.tmpdir.name, '.study.pgn.offsets')
+		self.assertTrue(os.path.exists(index_path))
+
+		with patch('src.game_index.scan_game_offsets') as scan:
+			self.assertEqual(offsets, game_offsets(filename))
+			scan.assert_not_called()
+
+		# Changing the file invalidates the index.
+		self._write('study.pgn', random_pgn(2, 5, 20))
+		os.utime(filename, ns=(1, 1))
+		self.assertEqual(5, len(game_offsets(filename)))
+
+	def test_chunks(self):
+		data = b''.join(f'[Event "{i}"]\n\n1. e4 *\n\n'.encode('ascii') for i in range(100))
+		offsets = scan_game_offsets(data)
+		self.assertEqual([(0, len(data))], chunks(data, offsets, 1000, len(data)))
+		self.assertEqual([], chunks(b'', [0], 8, 100))
+		self.assertEqual(list(zip(offsets, offsets[1:] + [len(data)])),
+		                 chunks(data, offsets, 1, len(data)))
+		self.assertEqual(list(zip(offsets[::2], offsets[2::2] + [len(data)])),
+		                 chunks(data, offsets, 1000, offsets[2]))
+
+		# Changing a game only changes the chunk that it is in.
+		ranges = chunks(data, offsets, 8, len(data))
+		self.assertLess(5, len(ranges))
+		changed = data[:offsets[50]] + b'[Event "Changed"]\n\n1. d4 *\n\n' + data[offsets[51]:]
+		new_ranges = chunks(changed, scan_game_offsets(changed), 8, len(changed))
+		old = {data[start:end] for start, end in ranges}
+		new = {changed[start:end] for start, end in new_ranges}
+		self.assertEqual(1, len(old - new))
+		self.assertEqual(1, len(new - old))
+
+	def test_read_chunks(self):
+		pgn = TRICKY + '\n' + random_pgn(1, 40, 30)
+		filename = self._write('study.pgn', pgn)
+		with open(filename, 'rb') as file:
+			data = file.read()
+
+		whole = CardSet()
+		whole.merge(read_study(filename, chess.WHITE))
+
+		for games in (1, 3, 7):
+			chunked = CardSet()
+			for start, end in chunks(data, game_offsets(filename), games, len(data)):
+				chunked.merge(read_study(filename, chess.WHITE, start=start, end=end))
+
+			self.assertEqual(dump_cards(whole.cards), dump_cards(chunked.cards))
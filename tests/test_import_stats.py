@@ -0,0 +1,75 @@
+import json
+import os
+import pstats
+import tempfile
+import unittest
+
+from src.import_stats import ImportStats, profiled
+
+
+class TestImportStats(unittest.TestCase):
+	def test_phases(self):
+		stats = ImportStats()
+		with stats.phase('parse'):
+			sum(range(10000))
+		first = stats.phases['parse']
+		with stats.phase('parse'):
+			sum(range(10000))
+
+		# Phases entered more than once accumulate.
+		self.assertEqual(['parse'], list(stats.phases))
+		self.assertGreater(stats.phases['parse'].wall, first.wall)
+		self.assertGreaterEqual(stats.phases['parse'].cpu, first.cpu)
+		self.assertAlmostEqual(stats.phases['parse'].wall, stats.wall_time())
+
+	def test_add(self):
+		first = ImportStats()
+		first.count('games', 2)
+		with first.phase('parse'):
+			pass
+		second = ImportStats()
+		second.count('games', 3)
+		second.count('plies', 7)
+		with second.phase('parse'):
+			pass
+		with second.phase('diff'):
+			pass
+
+		total = ImportStats()
+		total.add(first)
+		total.add(second)
+		self.assertEqual({'games': 5, 'plies': 7}, dict(total.counters))
+		self.assertEqual(['parse', 'diff'], list(total.phases))
+		self.assertAlmostEqual(first.wall_time() + second.wall_time(),
+		                       total.wall_time())
+
+	def test_write_log(self):
+		stats = ImportStats()
+		stats.count('games', 3)
+		stats.count('games')
+		with stats.phase('parse'):
+			pass
+
+		with tempfile.TemporaryDirectory() as tmpdir:
+			filename = os.path.join(tmpdir, 'logs', 'import-log.jsonl')
+			stats.write_log(filename, deck=1)
+			stats.write_log(filename, deck=2)
+			with open(filename, encoding='utf-8') as file:
+				records = [json.loads(line) for line in file]
+
+		self.assertEqual([1, 2], [record['deck'] for record in records])
+		self.assertEqual({'games': 4}, records[0]['counters'])
+		self.assertEqual(['cpu', 'wall'], sorted(records[0]['phases']['parse']))
+
+	def test_profiled(self):
+		with tempfile.TemporaryDirectory() as tmpdir:
+			directory = os.path.join(tmpdir, 'profiles')
+			with profiled(False, directory):
+				pass
+			self.assertFalse(os.path.exists(directory))
+
+			with profiled(True, directory):
+				sum(range(10000))
+			names = os.listdir(directory)
+			self.assertEqual(1, len(names))
+			pstats.Stats(os.path.join(directory, names[0]))
@@ -0,0 +1,343 @@
+import os
+import tempfile
+import unittest
+from typing import List, Optional, Tuple
+from unittest.mock import patch
+
+import chess
+from anki.collection import Collection
+# Importing anki.hooks first leads to a circular import.
+from anki import hooks # pylint: disable=wrong-import-order
+from anki.decks import DeckId
+
+from src import importer as importer_module, utils
+from src.delete_hook import DeleteHook
+from src.importer import Importer
+from src.media_index import MediaIndex
+from src.page import Page
+from src.progress import ImportCancelled, Progress
+from src.question import Question
+from src.repair import remove_unused_images
+from src.utils import media_references
+
+STUDY = '''[Event "Ruy Lopez"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bb5 {The Spanish.} a6 (3... Nf6 4. O-O) 4. Ba4 Nf6
+5. O-O *
+
+[Event "Sicilian"]
+
+1. e4 c5 2. Nf3 {[%cal Gd2d4]} d6 3. d4 *
+'''
+
+
+class RecordingProgress(Progress):
+	def __init__(self, cancel_at: Optional[Tuple[str, int]] = None) -> None:
+		self.reports: List[Tuple[str, int, int]] = []
+		self.cancel_at = cancel_at
+
+	def update(self, phase: str, done: int, total: int) -> None:
+		self.reports.append((phase, done, total))
+
+	def cancelled(self) -> bool:
+		return self.reports[-1][:2] == self.cancel_at
+
+
+class TestImporter(unittest.TestCase):
+	def setUp(self):
+		# pylint: disable=consider-using-with
+		self.tmpdir = tempfile.TemporaryDirectory()
+		self.collection = Collection(os.path.join(self.tmpdir.name, 'collection.anki2'))
+		self.deck_id = self.collection.decks.id('Chess::White')
+		notetype = self.collection.models.by_name('Basic')
+		assert notetype is not None
+		self.notetype_id = notetype['id']
+		self.filename = os.path.join(self.tmpdir.name, 'study.pgn')
+		self.media_dir = self.collection.media.dir()
+		self.index_filename = os.path.join(self.tmpdir.name, 'media-index.sqlite')
+
+	def tearDown(self):
+		self.collection.close()
+		self.tmpdir.cleanup()
+
+	def _import(self,
+	            pgn: str,
+	            deck_id: Optional[DeckId] = None,
+	            colour: chess.Color = chess.WHITE,
+	            progress: Optional[Progress] = None) -> Tuple[int, int, int, int, int]:
+		with open(self.filename, 'w', encoding='utf-8') as file:
+			file.write(pgn)
+
+		importer = Importer(
+		    filenames=[self.filename],
+		    collection=self.collection,
+		    colour=colour,
+		    notetype_id=self.notetype_id,
+		    deck_id=self.deck_id if deck_id is None else deck_id,
+		    media_index=MediaIndex(self.index_filename, self.media_dir),
+		    progress=progress,
+		)
+
+		return importer.run()
+
+	def _media_files(self):
+		return sorted(name for name in os.listdir(self.media_dir)
+		              if name.startswith('chess-opening-trainer-'))
+
+	def _questions(self):
+		questions = []
+		for note_id in self.collection.find_notes(f'did:{self.deck_id}'):
+			note = self.collection.get_note(note_id)
+			questions.append(note.fields[0].split('<')[0])
+
+		return sorted(questions)
+
+	def test_import(self):
+		inserts, updates, deletes, image_inserts, image_deletes = self._import(STUDY)
+
+		self.assertEqual(8, inserts)
+		self.assertEqual((0, 0, 0), (updates, deletes, image_deletes))
+		self.assertEqual([
+		    '1. e4 c5',
+		    '1. e4 c5 2. Nf3 d6',
+		    '1. e4 e5',
+		    '1. e4 e5 2. Nf3 Nc6',
+		    '1. e4 e5 2. Nf3 Nc6 3. Bb5 Nf6',
+		    '1. e4 e5 2. Nf3 Nc6 3. Bb5 a6',
+		    '1. e4 e5 2. Nf3 Nc6 3. Bb5 a6 4. Ba4 Nf6',
+		    'Moves from starting position?',
+		], self._questions())
+		self.assertEqual(image_inserts, len(self._media_files()))
+
+		note_ids = self.collection.find_notes('"Moves from starting position?*"')
+		self.assertEqual(1, len(note_ids))
+		answer = self.collection.get_note(note_ids[0]).fields[1]
+		self.assertIn('1. e4', answer)
+
+	def test_reimport(self):
+		self._import(STUDY)
+		media_files = self._media_files()
+
+		self.assertEqual((0, 0, 0, 0, 0), self._import(STUDY))
+		self.assertEqual(media_files, self._media_files())
+
+	def test_stats(self):
+		with open(self.filename, 'w', encoding='utf-8') as file:
+			file.write(STUDY)
+		importer = Importer(
+		    filenames=[self.filename],
+		    collection=self.collection,
+		    colour=chess.WHITE,
+		    notetype_id=self.notetype_id,
+		    deck_id=self.deck_id,
+		)
+		counts = importer.run()
+
+		stats = importer.stats
+		self.assertEqual(2, stats.counters['games'])
+		self.assertEqual(16, stats.counters['plies'])
+		self.assertEqual(8, stats.counters['positions'])
+		self.assertEqual(0, stats.counters['notes read'])
+		self.assertEqual(8, stats.counters['notes written'])
+		self.assertEqual(counts[3], stats.counters['images rendered'])
+		self.assertGreater(stats.counters['bytes written'], counts[3] * 20000)
+		# There is no cache to save.
+		self.assertEqual(['parse', 'read notes', 'diff', 'render images',
+		                  'write notes', 'trash images'],
+		                 list(stats.phases))
+		for phase in stats.phases.values():
+			self.assertGreaterEqual(phase.wall, 0)
+			self.assertGreaterEqual(phase.cpu, 0)
+
+	def test_progress(self):
+		progress = RecordingProgress()
+		counts = self._import(STUDY, progress=progress)
+
+		phases = [report[0] for report in progress.reports]
+		self.assertEqual(['parse', 'diff', 'render images', 'write notes'],
+		                 sorted(set(phases), key=phases.index))
+		self.assertIn(('parse', 1, 1), progress.reports)
+		self.assertIn(('diff', 7, 8), progress.reports)
+		self.assertIn(('render images', counts[3], counts[3]), progress.reports)
+		self.assertIn(('write notes', 0, 8), progress.reports)
+
+	@patch.object(importer_module, 'NOTE_BATCH_SIZE', 3)
+	def test_cancel(self):
+		progress = RecordingProgress(cancel_at=('write notes', 6))
+		with self.assertRaises(ImportCancelled):
+			self._import(STUDY, progress=progress)
+
+		# The notes written so far are complete.
+		self.assertEqual(6, len(self._questions()))
+		for note_id in self.collection.find_notes(f'did:{self.deck_id}'):
+			note = self.collection.get_note(note_id)
+			for field in note.fields:
+				for image in media_references([field]):
+					self.assertIn(image, self._media_files())
+
+		# The next import only does the rest.
+		_, updates, deletes, image_inserts, image_deletes = self._import(STUDY)
+		self.assertEqual((0, 0, 0, 0), (updates, deletes, image_inserts, image_deletes))
+		self.assertEqual(8, len(self._questions()))
+
+		# Undo reverts the notes of the cancelled import.
+		self.collection.undo()
+		self.assertEqual(6, len(self._questions()))
+		self.collection.undo()
+		self.assertEqual(0, len(self._questions()))
+
+	def test_fingerprints(self):
+		self._import(STUDY)
+
+		# Unchanged notes are neither rendered nor compared.
+		with patch.object(Question, 'render') as render, \
+		     patch.object(Page, 'image_path') as image_path:
+			self.assertEqual((0, 0, 0, 0, 0), self._import(STUDY))
+			render.assert_not_called()
+			image_path.assert_not_called()
+
+		# Missing images are created again.
+		media_files = self._media_files()
+		os.unlink(os.path.join(self.media_dir, media_files[0]))
+		self.assertEqual((0, 0, 0, 1, 0), self._import(STUDY))
+		self.assertEqual(media_files, self._media_files())
+
+		# Only the changed note is rendered again.
+		changed = STUDY.replace('{The Spanish.}', '{The Ruy Lopez.}')
+		with patch.object(Question, 'render', autospec=True,
+		                  side_effect=Question.render) as render:
+			self.assertEqual((0, 1, 0, 0, 0), self._import(changed))
+			self.assertEqual(1, render.call_count)
+
+	def test_plan(self):
+		self._import(STUDY)
+		media_files = self._media_files()
+		questions = self._questions()
+
+		changed = STUDY.replace('(3... Nf6 4. O-O) ', '')
+		changed = changed.replace('3. d4 *', '3. d4 Nf6 4. Nc3 *')
+		with open(self.filename, 'w', encoding='utf-8') as file:
+			file.write(changed)
+		importer = Importer(
+		    filenames=[self.filename],
+		    collection=self.collection,
+		    colour=chess.WHITE,
+		    notetype_id=self.notetype_id,
+		    deck_id=self.deck_id,
+		)
+		plan = importer.plan()
+
+		# Planning does not change anything.
+		self.assertEqual((1, 0, 1, 2, 2), plan.counts())
+		self.assertEqual(media_files, self._media_files())
+		self.assertEqual(questions, self._questions())
+		written, trashed = plan.estimated_bytes(self.media_dir)
+		self.assertGreater(written, 2 * 20000)
+		self.assertGreater(trashed, 2 * 20000)
+
+		# The files are not read again.
+		with patch('src.importer.parse_study') as parse_study:
+			self.assertEqual(plan.counts(), importer.apply(plan))
+			parse_study.assert_not_called()
+		self.assertIn('1. e4 c5 2. Nf3 d6 3. d4 Nf6', self._questions())
+		self.assertEqual(len(media_files), len(self._media_files()))
+
+	def test_update(self):
+		self._import(STUDY)
+
+		changed = STUDY.replace('{The Spanish.}', '{The Ruy Lopez.}')
+		changed = changed.replace('(3... Nf6 4. O-O) ', '')
+		inserts, updates, deletes, image_inserts, image_deletes = self._import(changed)
+
+		self.assertEqual(0, inserts)
+		self.assertEqual(1, updates)
+		self.assertEqual(1, deletes)
+		# The deleted note had a question and an answer image.
+		self.assertEqual(2, image_deletes)
+		self.assertEqual(0, image_inserts)
+		self.assertNotIn('1. e4 e5 2. Nf3 Nc6 3. Bb5 Nf6', self._questions())
+
+		note_ids = self.collection.find_notes('"1. e4 e5 2. Nf3 Nc6*"')
+		fields = [self.collection.get_note(nid).fields for nid in note_ids]
+		self.assertTrue(any('The Ruy Lopez.' in field[1] for field in fields))
+
+	def test_undo(self):
+		self._import(STUDY)
+		changed = STUDY.replace('{The Spanish.}', '{The Ruy Lopez.}')
+		changed = changed.replace('(3... Nf6 4. O-O) ', '')
+		changed = changed.replace('3. d4 *', '3. d4 Nf6 4. Nc3 *')
+		self.assertEqual((1, 1, 1), self._import(changed)[:3])
+
+		# Inserts, updates and deletes are undone in one step.
+		self.assertEqual('Import PGN File', self.collection.undo_status().undo)
+		self.collection.undo()
+		self.assertIn('1. e4 e5 2. Nf3 Nc6 3. Bb5 Nf6', self._questions())
+		self.assertNotIn('1. e4 c5 2. Nf3 d6 3. d4 Nf6', self._questions())
+
+	def test_shared_images(self):
+		self._import(STUDY)
+		media_files = self._media_files()
+
+		# The same boards in another deck use the same files.
+		other_deck_id = self.collection.decks.id('Chess::Copy')
+		inserts, _, _, image_inserts, _ = self._import(STUDY, other_deck_id)
+		self.assertEqual((8, 0), (inserts, image_inserts))
+		self.assertEqual(media_files, self._media_files())
+
+		# But not the boards seen from the other side.
+		black_deck_id = self.collection.decks.id('Chess::Black')
+		self.assertLess(0, self._import(STUDY, black_deck_id, chess.BLACK)[3])
+
+		# Images are only deleted, when no other note uses them.
+		changed = STUDY.replace('(3... Nf6 4. O-O) ', '')
+		self.assertEqual(0, self._import(changed)[4])
+		self.assertEqual(2, self._import(changed, other_deck_id)[4])
+
+	def test_delete_hook(self):
+		DeleteHook(lambda media_dir: MediaIndex(self.index_filename, media_dir)
+		          ).installHook()
+		on_notes_delete = hooks.notes_will_be_deleted._hooks[-1]
+		try:
+			self._import(STUDY)
+			other_deck_id = self.collection.decks.id('Chess::Copy')
+			self._import(STUDY, other_deck_id)
+			media_files = self._media_files()
+
+			self.collection.remove_notes(
+			    self.collection.find_notes(f'did:{self.deck_id}'))
+			self.assertEqual(media_files, self._media_files())
+
+			self.collection.remove_notes(
+			    self.collection.find_notes(f'did:{other_deck_id}'))
+			self.assertEqual([], self._media_files())
+		finally:
+			hooks.notes_will_be_deleted.remove(on_notes_delete)
+
+	def test_delete_unrelated(self):
+		DeleteHook(lambda media_dir: MediaIndex(self.index_filename, media_dir)
+		          ).installHook()
+		on_notes_delete = hooks.notes_will_be_deleted._hooks[-1]
+		try:
+			self._import(STUDY)
+			note = self.collection.new_note(
+			    self.collection.models.get(self.notetype_id))
+			note.fields[0] = 'Unrelated'
+			self.collection.add_note(note, self.deck_id)
+
+			with patch.object(utils, 'referenced_media') as referenced:
+				self.collection.remove_notes([note.id])
+				referenced.assert_not_called()
+		finally:
+			hooks.notes_will_be_deleted.remove(on_notes_delete)
+
+	def test_remove_unused_images(self):
+		self._import(STUDY)
+		media_files = self._media_files()
+		unused = f'chess-opening-trainer-{"0" * 40}.svg'
+		with open(os.path.join(self.media_dir, unused), 'w', encoding='ascii'):
+			pass
+
+		index = MediaIndex(self.index_filename, self.media_dir)
+		self.assertEqual(1, remove_unused_images(self.collection, index))
+		self.assertEqual(media_files, self._media_files())
+		self.assertEqual(set(media_files), index.files())
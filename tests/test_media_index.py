@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.media_index import MediaIndex
+
+DIGEST = '0123456789abcdef0123456789abcdef01234567'
+
+
+class TestMediaIndex(unittest.TestCase):
+	def setUp(self):
+		# pylint: disable=consider-using-with
+		self.tmpdir = tempfile.TemporaryDirectory()
+		self.media_dir = os.path.join(self.tmpdir.name, 'collection.media')
+		os.mkdir(self.media_dir)
+		self.filename = os.path.join(self.tmpdir.name, 'user_files',
+		                             'media-index.sqlite')
+		for name in [
+		    f'chess-opening-trainer-{DIGEST}.svg',
+		    f'chess-opening-trainer-1234-{DIGEST}.svg',
+		    f'chess-opening-trainer-5678-{DIGEST}.svg',
+		    'unrelated.jpg',
+		]:
+			self._touch(name)
+		os.mkdir(os.path.join(self.media_dir, f'chess-opening-trainer-{"f" * 40}.svg'))
+
+	def tearDown(self):
+		self.tmpdir.cleanup()
+
+	def _touch(self, name: str) -> None:
+		with open(os.path.join(self.media_dir, name), 'w', encoding='ascii'):
+			pass
+
+	def _index(self) -> MediaIndex:
+		return MediaIndex(self.filename, self.media_dir)
+
+	def test_files(self):
+		self.assertEqual({
+		    f'chess-opening-trainer-{DIGEST}.svg',
+		    f'chess-opening-trainer-1234-{DIGEST}.svg',
+		    f'chess-opening-trainer-5678-{DIGEST}.svg',
+		}, self._index().files())
+		self.assertEqual([f'chess-opening-trainer-1234-{DIGEST}.svg'],
+		                 self._index().note_files([1234, 4321]))
+		self.assertEqual([], self._index().note_files([]))
+
+	def test_stale(self):
+		files = self._index().files()
+
+		# The directory is not read again, as long as it is unchanged.
+		with patch('os.scandir') as scandir:
+			self.assertEqual(files, self._index().files())
+			scandir.assert_not_called()
+
+		self._touch(f'chess-opening-trainer-{"a" * 40}.svg')
+		self.assertIn(f'chess-opening-trainer-{"a" * 40}.svg', self._index().files())
+
+	def test_update(self):
+		index = self._index()
+		index.files()
+
+		added = f'chess-opening-trainer-{"b" * 40}.svg'
+		removed = f'chess-opening-trainer-1234-{DIGEST}.svg'
+		mtime_ns = index.mtime_ns()
+		self._touch(added)
+		os.unlink(os.path.join(self.media_dir, removed))
+		index.update(added=[added], removed=[removed], mtime_ns=mtime_ns)
+
+		with patch('os.scandir') as scandir:
+			files = self._index().files()
+			scandir.assert_not_called()
+		self.assertIn(added, files)
+		self.assertNotIn(removed, files)
+		self.assertEqual([], index.note_files([1234]))
+
+	def test_external_change(self):
+		index = self._index()
+		index.files()
+
+		# Somebody else deletes a file before the add-on adds one.
+		deleted = f'chess-opening-trainer-5678-{DIGEST}.svg'
+		os.unlink(os.path.join(self.media_dir, deleted))
+		os.utime(self.media_dir, ns=(1, 1))
+		mtime_ns = index.mtime_ns()
+		added = f'chess-opening-trainer-{"c" * 40}.svg'
+		self._touch(added)
+		index.update(added=[added], mtime_ns=mtime_ns)
+
+		files = self._index().files()
+		self.assertIn(added, files)
+		self.assertNotIn(deleted, files)
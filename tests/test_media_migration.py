@@ -0,0 +1,166 @@
+import hashlib
+import os
+import sqlite3
+import tempfile
+import unittest
+from contextlib import closing
+from typing import Dict, List, Optional
+from unittest.mock import patch
+
+from anki.collection import Collection
+from anki.notes import NoteId
+
+from src import media_migration
+from src.media_migration import MediaMigration, schedule_migration
+from src.progress import ImportCancelled, Progress
+
+
+def legacy_name(colour: str, i: int) -> str:
+	return f'chess-opening-trainer-{colour}-{i:040x}.svg'
+
+
+def note_name(note_id: int, i: int) -> str:
+	return f'chess-opening-trainer-{note_id}-{i:040x}.svg'
+
+
+def content(name: str) -> bytes:
+	# Two of the images show the same board.
+	if name == legacy_name('b', 7):
+		name = legacy_name('w', 4)
+
+	return name.encode('ascii') + b'\x80'
+
+
+def new_name(name: str) -> str:
+	return f'chess-opening-trainer-{hashlib.sha1(content(name)).hexdigest()}.svg'
+
+
+def image(name: str) -> str:
+	return f'<img src="{name}">'
+
+
+class CancellingProgress(Progress):
+	def __init__(self, cancel_at: int) -> None:
+		self.cancel_at = cancel_at
+		self.done = 0
+
+	def update(self, phase: str, done: int, total: int) -> None:
+		self.done = done
+
+	def cancelled(self) -> bool:
+		return self.done == self.cancel_at
+
+
+class TestMediaMigration(unittest.TestCase):
+	def setUp(self):
+		# pylint: disable=consider-using-with
+		self.tmpdir = tempfile.TemporaryDirectory()
+		self.collection = Collection(os.path.join(self.tmpdir.name, 'collection.anki2'))
+		self.media_dir = self.collection.media.dir()
+		self.journal = os.path.join(self.tmpdir.name, 'user_files', 'media-migration.sqlite')
+		self.deck_id = self.collection.decks.id('Chess::White')
+		other_deck_id = self.collection.decks.id('Other')
+
+		# An image used by several notes, also of another deck, one that
+		# is gone, one with the same content as another, and one that
+		# nobody uses.  Up to version 1.1.0, the note id was part of the
+		# name.
+		self.shared = legacy_name('w', 1)
+		self.notes: List[NoteId] = [
+		    self._add_note(image(self.shared), image(legacy_name('w', 3))),
+		    self._add_note(image(legacy_name('w', 4)), image(self.shared)),
+		    self._add_note(image(self.shared) + image(legacy_name('b', 5)), ''),
+		    self._add_note(image(legacy_name('w', 99)), 'Gone'),
+		    self._add_note(image(self.shared), image(legacy_name('w', 2)), other_deck_id),
+		    self._add_note(image(legacy_name('b', 7)), ''),
+		    self._add_note(image(note_name(1234, 8)), ''),
+		]
+		for name in [self.shared, legacy_name('w', 2), legacy_name('w', 3),
+		             legacy_name('w', 4), legacy_name('b', 5), legacy_name('w', 6),
+		             legacy_name('b', 7), note_name(1234, 8)]:
+			with open(os.path.join(self.media_dir, name), 'wb') as file:
+				file.write(content(name))
+
+		schedule_migration(self.journal)
+
+	def tearDown(self):
+		self.collection.close()
+		self.tmpdir.cleanup()
+
+	def _add_note(self, front: str, back: str, deck_id: Optional[int] = None) -> NoteId:
+		note = self.collection.new_note(self.collection.models.by_name('Basic'))
+		note.fields[0] = front
+		note.fields[1] = back
+		self.collection.add_note(note, self.deck_id if deck_id is None else deck_id)
+
+		return note.id
+
+	def _media(self) -> Dict[str, bytes]:
+		media: Dict[str, bytes] = {}
+		for name in os.listdir(self.media_dir):
+			with open(os.path.join(self.media_dir, name), 'rb') as file:
+				media[name] = file.read()
+
+		return media
+
+	def _fields(self) -> List[str]:
+		return [''.join(self.collection.get_note(note_id).fields) for note_id in self.notes]
+
+	def _migrate(self, progress: Optional[Progress] = None) -> int:
+		return MediaMigration(self.collection, self.journal, progress).run()
+
+	def _assert_migrated(self):
+		self.assertEqual([
+		    image(new_name(self.shared)) + image(new_name(legacy_name('w', 3))),
+		    image(new_name(legacy_name('w', 4))) + image(new_name(self.shared)),
+		    image(new_name(self.shared)) + image(new_name(legacy_name('b', 5))),
+		    image(legacy_name('w', 99)) + 'Gone',
+		    image(new_name(self.shared)) + image(new_name(legacy_name('w', 2))),
+		    image(new_name(legacy_name('w', 4))),
+		    image(new_name(note_name(1234, 8))),
+		], self._fields())
+
+		names = [self.shared] + [legacy_name('w', i) for i in (2, 3, 4)] + [legacy_name('b', 5), note_name(1234, 8)]
+		self.assertEqual({new_name(name): content(name) for name in names}, self._media())
+		self.assertFalse(os.path.exists(self.journal))
+
+	def test_migrate(self):
+		self.assertEqual(6, self._migrate())
+		self._assert_migrated()
+
+		# Nothing to do any more.
+		self.assertEqual(0, self._migrate())
+
+	def test_resume(self):
+		with patch.object(media_migration, 'MIGRATION_BATCH_SIZE', 1):
+			with self.assertRaises(ImportCancelled):
+				self._migrate(CancellingProgress(cancel_at=1))
+			with closing(sqlite3.connect(self.journal)) as db:
+				self.assertEqual([(self.notes[0], )],
+				                 db.execute('SELECT done FROM progress').fetchall())
+
+			self.assertEqual(5, self._migrate())
+		self._assert_migrated()
+
+	def test_crash(self):
+		# The files of the second batch have been renamed, but the notes
+		# have not been updated.
+		update_notes = self.collection.update_notes
+		calls = []
+
+		def crash(notes, **kwargs):
+			calls.append(notes)
+			if len(calls) == 2:
+				raise OSError('crash')
+			return update_notes(notes, **kwargs)
+
+		with patch.object(media_migration, 'MIGRATION_BATCH_SIZE', 2):
+			with patch.object(self.collection, 'update_notes', side_effect=crash):
+				with self.assertRaises(OSError):
+					self._migrate()
+			self.assertFalse(os.path.exists(os.path.join(self.media_dir, self.shared)))
+			self.assertFalse(
+			    os.path.exists(os.path.join(self.media_dir, legacy_name('b', 5))))
+
+			self._migrate()
+		self._assert_migrated()
@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+from typing import Dict, List
+from unittest.mock import MagicMock, patch
+
+import chess
+import chess.svg
+from chess.svg import Arrow
+
+from src import importer
+from src.page import Page, board_from_key
+from src.visitor import PositionVisitor
+
+from .synthetic import random_pgn, read
+
+ANNOTATED = '''[Event "Annotated"]
+
+1. e4 {[%cal Ge2e4,Rd2d4]} e5 2. Nf3 {[%csl Ge5,Yd4]} Nc6 3. Bc4 Nf6
+4. Ng5 d5 5. exd5 Nxd5 6. Nxf7 Kxf7 7. Qf3+ {[%cal Bf3f7]} Ke6 *
+'''
+
+
+def reference_svg(page: Page) -> str:
+	# How the add-on used to render the images.
+	board = page.board
+	assert board is not None
+	lastmove = board.peek() if board.move_stack else None
+	check = board.king(not page.turn) if board.is_check() else None
+	arrows = page.arrows.copy()
+	for square, side in page.fills.items():
+		arrows.append(Arrow(tail=square, head=square, color=side))
+
+	return chess.svg.board(board,
+	                       lastmove=lastmove,
+	                       orientation=page.colour,
+	                       arrows=arrows,
+	                       check=check)
+
+
+def pages(pgn: str, colour: chess.Color) -> List[Page]:
+	visitor = PositionVisitor(colour)
+	read(pgn, visitor)
+	result: List[Page] = []
+	for question in visitor.cards.values():
+		result.append(question)
+		result.extend(question.answers)
+
+	return result
+
+
+class TestPage(unittest.TestCase):
+	def setUp(self):
+		# pylint: disable=consider-using-with
+		self.tmpdir = tempfile.TemporaryDirectory()
+
+	def tearDown(self):
+		self.tmpdir.cleanup()
+
+	def test_render_svg(self):
+		for colour in (chess.WHITE, chess.BLACK):
+			for page in pages(ANNOTATED, colour):
+				path = os.path.join(self.tmpdir.name, 'board.svg')
+				page.render_svg(path)
+				with open(path, encoding='cp1252') as file:
+					self.assertEqual(reference_svg(page), file.read())
+
+	def test_board_from_key(self):
+		# En passant, castling rights, and the move counters.
+		for moves in [[], ['e4'], ['e4', 'Nf6', 'e5', 'd5'],
+		              ['e4', 'Nf6', 'e5', 'd5', 'Ke2', 'Rg8', 'Ke1']]:
+			board = chess.Board()
+			for san in moves:
+				board.push_san(san)
+			page = Page(chess.WHITE, board.turn)
+			page.set_board(board)
+			state = page.board_state()
+			assert state is not None
+			self.assertEqual(board.fen(), board_from_key(state.key).fen())
+
+	def _insert_images(self, workers: int) -> Dict[str, bytes]:
+		media_dir = os.path.join(self.tmpdir.name, f'media-{workers}')
+		os.mkdir(media_dir)
+		collection = MagicMock()
+		collection.media.dir.return_value = media_dir
+		imp = importer.Importer(
+		    filenames=[],
+		    collection=collection,
+		    colour=chess.WHITE,
+		    notetype_id=MagicMock(),
+		    deck_id=MagicMock(),
+		    workers=workers,
+		)
+
+		image_inserts = {
+		    page.image_path(): page
+		    for page in pages(ANNOTATED + '\n' + random_pgn(1, 10, 20), chess.WHITE)
+		}
+		written: List[str] = []
+		imp._insert_images(image_inserts, written)
+		self.assertEqual(sorted(image_inserts), sorted(written))
+
+		images: Dict[str, bytes] = {}
+		for name in os.listdir(media_dir):
+			with open(os.path.join(media_dir, name), 'rb') as file:
+				images[name] = file.read()
+
+		return images
+
+	@patch.object(importer, 'MIN_IMAGES_PER_WORKER', 10)
+	def test_parallel(self):
+		serial = self._insert_images(1)
+		self.assertLess(40, len(serial))
+		self.assertEqual(serial, self._insert_images(4))
@@ -0,0 +1,239 @@
+import importlib
+import os
+import pickle
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import types
+import unittest
+from contextlib import closing
+from typing import List
+from unittest.mock import MagicMock, patch
+
+import chess
+
+from src import importer
+from src.parse_cache import ParseCache
+from src.study import parse_study, read_study
+
+from .synthetic import dump_cards, random_pgn
+
+
+class TestParseCache(unittest.TestCase):
+	def setUp(self):
+		# pylint: disable=consider-using-with
+		self.tmpdir = tempfile.TemporaryDirectory()
+		self.cache_dir = os.path.join(self.tmpdir.name, 'cache')
+		self.filenames: List[str] = []
+		for i in range(3):
+			self.filenames.append(self._write(f'study-{i}.pgn', random_pgn(i, 5, 20)))
+
+	def tearDown(self):
+		self.tmpdir.cleanup()
+
+	def _write(self, name: str, pgn: str) -> str:
+		filename = os.path.join(self.tmpdir.name, name)
+		with open(filename, 'w', encoding='utf-8') as file:
+			file.write(pgn)
+
+		return filename
+
+	def _importer(self, module: types.ModuleType = importer) -> importer.Importer:
+		collection = MagicMock()
+		collection.path = '/path/to/collection.anki2'
+		collection.media.dir.return_value = self.tmpdir.name
+		collection.decks.get.return_value = {'id': 1234, 'mod': 1700000000}
+		collection.decks.card_count.return_value = 42
+		collection.models.get.return_value = {'id': 5678}
+
+		return module.Importer(
+		    filenames=self.filenames,
+		    collection=collection,
+		    colour=chess.WHITE,
+		    notetype_id=MagicMock(),
+		    deck_id=MagicMock(),
+		    cache=ParseCache(self.cache_dir),
+		)
+
+	def test_fingerprint(self):
+		cache = ParseCache(self.cache_dir)
+		first = cache.fingerprint(self.filenames[0])
+
+		# The digest is not computed again for an untouched file.
+		with patch('hashlib.sha1') as sha1:
+			self.assertEqual(first, ParseCache(self.cache_dir).fingerprint(self.filenames[0]))
+			sha1.assert_not_called()
+
+		os.utime(self.filenames[0], ns=(1, 1))
+		touched = cache.fingerprint(self.filenames[0])
+		self.assertEqual(first.digest, touched.digest)
+		self.assertEqual(1, touched.mtime_ns)
+
+	def test_chunks(self):
+		cache = ParseCache(self.cache_dir)
+		fingerprint = cache.fingerprint(self.filenames[0])
+		cards = read_study(self.filenames[0], chess.WHITE)
+		cache.store_chunks(fingerprint, 'options', ['a', 'b'], {
+		    'a': pickle.dumps(cards),
+		    'b': b'b',
+		})
+
+		chunks = ParseCache(self.cache_dir).load_chunks(fingerprint, 'options')
+		self.assertEqual(['a', 'b'], sorted(chunks))
+		self.assertEqual({}, cache.load_chunks(fingerprint, 'other options'))
+
+		# The boards are not stored, but the notes are the same.
+		cached = pickle.loads(chunks['a'])
+		for question in cached.values():
+			self.assertIsNone(question._board)
+		self.assertEqual(self._notes(cards), self._notes(cached))
+		self.assertEqual(dump_cards(cards), dump_cards(cached))
+
+		# Only the chunks of the last version of a file are kept.
+		cache.store_chunks(fingerprint, 'options', ['b', 'c'], {'c': b'c'})
+		self.assertEqual({'b': b'b', 'c': b'c'}, cache.load_chunks(fingerprint, 'options'))
+
+	def _notes(self, cards) -> List:
+		notes = []
+		for question in cards.values():
+			notes.append((question.fingerprint(), question.render(),
+			              question.render_answers(), question.svg_args()))
+			notes += [answer.svg_args() for answer in question.answers]
+
+		return notes
+
+	def test_read_studies(self):
+		wanted = self._importer()
+		wanted.cache = None
+		wanted._read_studies([])
+
+		first = self._importer()
+		first._read_studies([first.cache.fingerprint(f) for f in self.filenames])
+
+		# Change just one file.
+		self._write('study-1.pgn', random_pgn(99, 5, 20))
+		changed = self._importer()
+		with patch.object(importer, 'parse_study', wraps=parse_study) as reader:
+			changed._read_studies(
+			    [changed.cache.fingerprint(f) for f in self.filenames])
+			self.assertTrue(reader.called)
+			for call in reader.call_args_list:
+				self.assertEqual(self.filenames[1], call[0][0])
+
+		uncached = self._importer()
+		uncached.cache = None
+		uncached._read_studies([])
+
+		self.assertEqual(dump_cards(wanted.cards.cards), dump_cards(first.cards.cards))
+		self.assertEqual(dump_cards(uncached.cards.cards),
+		                 dump_cards(changed.cards.cards))
+
+	@patch.object(importer, 'GAMES_PER_CHUNK', 1)
+	def test_read_games(self):
+		first = self._importer()
+		first._read_studies([first.cache.fingerprint(f) for f in self.filenames])
+
+		# Change the comment of just one game.
+		games = random_pgn(1, 5, 20).split('\n[')
+		games[2] = re.sub(r'( \S+ \*)', r' { Changed. }\1', games[2])
+		self._write('study-1.pgn', '\n['.join(games))
+		changed = self._importer()
+		with patch.object(importer, 'parse_study', wraps=parse_study) as reader:
+			changed._read_studies(
+			    [changed.cache.fingerprint(f) for f in self.filenames])
+			reader.assert_called_once()
+		# All the games of the other two files, and four of the changed one.
+		self.assertEqual(14, changed.stats.counters['chunks from cache'])
+
+		uncached = self._importer()
+		uncached.cache = None
+		uncached._read_studies([])
+
+		self.assertEqual(dump_cards(uncached.cards.cards),
+		                 dump_cards(changed.cards.cards))
+		self.assertIn('Changed.', repr(dump_cards(changed.cards.cards)))
+
+	@patch.object(importer, 'GAMES_PER_CHUNK', 1)
+	def test_broken_chunks(self):
+		first = self._importer()
+		first._read_studies([first.cache.fingerprint(f) for f in self.filenames])
+
+		# Truncated, of another version, and not pickled at all.
+		with closing(sqlite3.connect(os.path.join(self.cache_dir, 'chunks.sqlite'))) as db, db:
+			rows = db.execute('SELECT file, key, cards FROM chunks ORDER BY rowid LIMIT 3').fetchall()
+			broken = [
+			    rows[0][2][:len(rows[0][2]) // 2],
+			    rows[1][2].replace(b'question', b'questio_'),
+			    b'garbage',
+			]
+			db.executemany('UPDATE chunks SET cards = ? WHERE file = ? AND key = ?',
+			               [(data, file, key) for (file, key, _), data in zip(rows, broken)])
+
+		second = self._importer()
+		second._read_studies([second.cache.fingerprint(f) for f in self.filenames])
+		self.assertEqual(3, second.stats.counters['broken chunks in cache'])
+		self.assertEqual(dump_cards(first.cards.cards), dump_cards(second.cards.cards))
+
+		# The broken chunks have been replaced.
+		third = self._importer()
+		third._read_studies([third.cache.fingerprint(f) for f in self.filenames])
+		self.assertEqual(0, third.stats.counters['broken chunks in cache'])
+		self.assertEqual(3, third.stats.counters['files from cache'])
+
+	def test_other_package(self):
+		# The command-line script loads the add-on as another package than
+		# Anki, but shares the cache.
+		modules = set(sys.modules)
+		self.addCleanup(lambda: [sys.modules.pop(name) for name in set(sys.modules) - modules])
+		sync_decks = importlib.import_module('src.sync_decks')
+		sync_decks.load_cli()
+		other = importlib.import_module('chess_opening_trainer.importer')
+
+		uncached = self._importer()
+		uncached.cache = None
+		uncached._read_studies([])
+		wanted = dump_cards(uncached.cards.cards)
+
+		for writer, reader in [(importer, other), (other, importer)]:
+			shutil.rmtree(self.cache_dir, ignore_errors=True)
+			first = self._importer(writer)
+			first._read_studies([first.cache.fingerprint(f) for f in self.filenames])
+			second = self._importer(reader)
+			second._read_studies([second.cache.fingerprint(f) for f in self.filenames])
+			self.assertEqual(3, second.stats.counters['files from cache'])
+			self.assertEqual(wanted, dump_cards(second.cards.cards))
+			for question in second.cards.cards.values():
+				self.assertEqual(reader.__package__, type(question).__module__.split('.')[0])
+
+	def _plan(self, fingerprints, inserts: int, image_inserts: int) -> importer.ImportPlan:
+		page = MagicMock()
+		page.svg_args.return_value = None
+		return importer.ImportPlan(
+		    fingerprints, [MagicMock() for _ in range(inserts)], [], [],
+		    {f'{i}.svg': page for i in range(image_inserts)}, set())
+
+	def test_up_to_date(self):
+		first = self._importer()
+		with patch.object(first, '_read_notes') as read_notes, \
+		     patch.object(first, '_plan_deck',
+		                  side_effect=lambda f, _: self._plan(f, 1, 1)):
+			self.assertEqual((1, 0, 0, 1, 0), first.run())
+			read_notes.assert_called_once()
+
+		second = self._importer()
+		with patch.object(second, '_read_studies') as read_studies, \
+		     patch.object(second, '_read_notes') as read_notes:
+			self.assertEqual((0, 0, 0, 0, 0), second.run())
+			read_studies.assert_not_called()
+			read_notes.assert_not_called()
+
+		# Modifying the deck forces a full import.
+		third = self._importer()
+		third.collection.decks.card_count.return_value = 41
+		with patch.object(third, '_read_notes') as read_notes, \
+		     patch.object(third, '_plan_deck',
+		                  side_effect=lambda f, _: self._plan(f, 1, 0)):
+			self.assertEqual((1, 0, 0, 0, 0), third.run())
+			read_notes.assert_called_once()
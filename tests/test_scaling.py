@@ -0,0 +1,147 @@
+import os
+import random
+import tempfile
+import time
+import unittest
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import chess
+import pytest
+
+from src.importer import Importer
+
+from .fake_collection import FakeCollection
+from .synthetic import random_line
+
+# Every line has about that many cards for White.
+DEPTH = 20
+CARDS_PER_LINE = DEPTH // 2
+
+# Growing ten times must not make a card more than that much slower.
+# Quadratic behaviour makes it ten times slower.  The timings are only
+# checked with --benchmark, because they are too noisy on a busy machine.
+MAX_SLOWDOWN = 2.5
+
+# Phases faster than that are too noisy for a comparison.
+MIN_SECONDS = 0.05
+
+PHASES = ['parse', 'read notes', 'diff', 'write']
+
+
+def deck_pgn(cards: int, changed: float = 0.0) -> str:
+	rng = random.Random(cards)
+	lines = [random_line(rng, DEPTH) for _ in range(cards // CARDS_PER_LINE)]
+
+	# Replace some of the lines by others.
+	if changed:
+		other = random.Random(f'changed {cards}')
+		step = int(1 / changed)
+		for i in range(0, len(lines), step):
+			lines[i] = random_line(other, DEPTH)
+
+	return '\n'.join(f'[Event "{i}"]\n\n{line} *\n' for i, line in enumerate(lines))
+
+
+class Run:
+	# pylint: disable=too-few-public-methods
+	def __init__(self, counts: Tuple[int, ...], seconds: Dict[str, float],
+	             calls: Counter):
+		self.counts = counts
+		self.seconds = seconds
+		self.calls = calls
+
+
+class TestScaling(unittest.TestCase):
+	def setUp(self):
+		# pylint: disable=consider-using-with
+		self.tmpdir = tempfile.TemporaryDirectory()
+
+	def tearDown(self):
+		self.tmpdir.cleanup()
+
+	def _import(self, collection: FakeCollection, pgn: str) -> Run:
+		filename = os.path.join(self.tmpdir.name, 'study.pgn')
+		with open(filename, 'w', encoding='utf-8') as file:
+			file.write(pgn)
+
+		importer = Importer(
+		    filenames=[filename],
+		    collection=collection, # type: ignore[arg-type]
+		    colour=chess.WHITE,
+		    notetype_id=collection.models.notetype['id'],
+		    deck_id=collection.decks.id('Chess'),
+		)
+		calls = collection.calls.copy()
+		seconds: Dict[str, float] = {}
+
+		start = time.perf_counter()
+		importer._read_studies([])
+		seconds['parse'] = time.perf_counter() - start
+
+		start = time.perf_counter()
+		got = importer._read_notes()
+		seconds['read notes'] = time.perf_counter() - start
+
+		start = time.perf_counter()
+		plan = importer._plan_deck([], got)
+		seconds['diff'] = time.perf_counter() - start
+
+		start = time.perf_counter()
+		counts = importer.apply(plan)
+		seconds['write'] = time.perf_counter() - start
+
+		return Run(counts, seconds, collection.calls - calls)
+
+	def _runs(self, cards: int) -> Tuple[Run, Run]:
+		directory = os.path.join(self.tmpdir.name, str(cards))
+		collection = FakeCollection(directory)
+		first = self._import(collection, deck_pgn(cards))
+		second = self._import(collection, deck_pgn(cards, changed=0.01))
+
+		return first, second
+
+	def _check(self, sizes: List[int], timings: bool = False) -> None:
+		runs = {cards: self._runs(cards) for cards in sizes}
+
+		for cards, (first, second) in runs.items():
+			print(f'{cards} cards: import {first.counts}, re-import {second.counts}')
+			for phase in PHASES:
+				print(f'  {phase}: {first.seconds[phase]:.3f} s,'
+				      f' {second.seconds[phase]:.3f} s')
+			print(f'  backend calls: {sum(first.calls.values())},'
+			      f' {sum(second.calls.values())}')
+
+			# Only a few of the notes have changed.
+			self.assertGreater(second.counts[0], 0)
+			self.assertLess(second.counts[0], cards * 0.05)
+
+		for small, large in zip(sizes, sizes[1:]):
+			factor = large / small
+			for index in (0, 1):
+				before, after = runs[small][index], runs[large][index]
+
+				# The number of calls into the backend must not grow faster
+				# than the deck.
+				for name, calls in after.calls.items():
+					self.assertLessEqual(calls, max(1, before.calls[name]) * factor, name)
+
+				if not timings:
+					continue
+				for phase in PHASES:
+					if after.seconds[phase] < MIN_SECONDS:
+						continue
+					per_card = after.seconds[phase] / large
+					per_card_before = max(before.seconds[phase], MIN_SECONDS / factor) / small
+					self.assertLess(per_card, MAX_SLOWDOWN * per_card_before, phase)
+
+	def test_scaling(self):
+		self._check([300, 3000])
+
+	@pytest.mark.benchmark
+	def test_scaling_timings(self):
+		self._check([300, 3000], timings=True)
+
+	@pytest.mark.benchmark
+	def test_scaling_large(self):
+		self._check([1000, 10000, 100000], timings=True)
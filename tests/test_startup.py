@@ -0,0 +1,30 @@
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+
+# The modules that the add-on imports when Anki starts, apart from the
+# ones that need Anki's user interface.
+STARTUP = '''
+import sys
+import anki.collection
+import tests.conftest
+import src.delete_hook
+import src.watcher
+print(' '.join(sorted(sys.modules)))
+'''
+
+
+class TestStartup(unittest.TestCase):
+	def test_lazy_imports(self):
+		result = subprocess.run([sys.executable, '-c', STARTUP],
+		                        cwd=ROOT,
+		                        capture_output=True,
+		                        text=True,
+		                        check=True)
+		modules = result.stdout.split()
+		for module in ['chess', 'jsonschema', 'multiprocessing', 'src.importer',
+		               'src.media_index', 'src.sync']:
+			self.assertNotIn(module, modules)
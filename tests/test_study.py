@@ -0,0 +1,132 @@
+import os
+import tempfile
+import time
+import unittest
+from typing import Dict, List
+from unittest.mock import MagicMock, patch
+
+import chess
+
+from src.cardset import CardSet
+from src.importer import Importer
+from src.question import Question
+from src.study import read_study
+from src.visitor import PositionVisitor
+
+from .synthetic import dump_cards, random_pgn, read
+from .test_visitor import PGN, TRANSPOSITIONS
+
+ANNOTATED = '''[Event "Annotated"]
+
+1. e4 {Best by test.} e5 2. Nf3 {[%cal Gg1f3]} Nc6 3. Bb5 a6 4. Ba4 *
+
+[Event "Catalan again"]
+
+1. d4 Nf6 2. c4 e6 3. g3 d5 4. Bg2 Be7 5. Nf3 O-O 6. b3 {Rare.} *
+'''
+
+# Nc3 is already known, when the second game is read, from another file.
+KNOWN_ANSWER = (
+    '[Event "English"]\n\n1. e4 (1. c4 e5 2. Nc3) *\n',
+    '[Event "English again"]\n\n1. c4 e5 2. Nf3 (2. Nc3 {Known.}) *\n',
+)
+
+
+class TestStudy(unittest.TestCase):
+	def setUp(self):
+		# pylint: disable=consider-using-with
+		self.tmpdir = tempfile.TemporaryDirectory()
+		self.filenames: List[str] = []
+		studies = [PGN, TRANSPOSITIONS, ANNOTATED, *KNOWN_ANSWER, random_pgn(1, 20, 30)]
+		for i, study in enumerate(studies):
+			filename = os.path.join(self.tmpdir.name, f'study-{i}.pgn')
+			with open(filename, 'w', encoding='utf-8') as file:
+				file.write(study)
+			self.filenames.append(filename)
+
+	def tearDown(self):
+		self.tmpdir.cleanup()
+
+	def _importer(self, workers: int, merge_transpositions: bool) -> Importer:
+		return Importer(
+		    filenames=self.filenames,
+		    collection=MagicMock(),
+		    colour=chess.WHITE,
+		    notetype_id=MagicMock(),
+		    deck_id=MagicMock(),
+		    merge_transpositions=merge_transpositions,
+		    workers=workers,
+		)
+
+	def _compare_with_one_visitor(self, merge_transpositions: bool) -> Dict[str, Question]:
+		visitor = PositionVisitor(chess.WHITE,
+		                          merge_transpositions=merge_transpositions)
+		for filename in self.filenames:
+			with open(filename, encoding='utf-8') as file:
+				read(file.read(), visitor)
+
+		cards = CardSet(merge_transpositions=merge_transpositions)
+		for filename in self.filenames:
+			cards.merge(
+			    read_study(filename,
+			               chess.WHITE,
+			               merge_transpositions=merge_transpositions))
+
+		self.assertEqual(dump_cards(visitor.cards), dump_cards(cards.cards))
+		self.assertEqual(visitor.positions, cards.positions)
+
+		return cards.cards
+
+	def test_merge(self):
+		cards = self._compare_with_one_visitor(merge_transpositions=False)
+
+		# The comment on the known answer is ignored, and not given to the
+		# answer before.
+		answers = cards['1. c4 e5'].answers
+		self.assertEqual(['Nc3', 'Nf3'], [answer.move for answer in answers])
+		self.assertEqual([[], []], [answer.comments for answer in answers])
+
+	def test_merge_transpositions(self):
+		self._compare_with_one_visitor(merge_transpositions=True)
+
+	@patch('src.importer.MIN_BYTES_PER_WORKER', 1)
+	@patch('src.importer.GAMES_PER_CHUNK', 4)
+	def test_parallel(self):
+		for merge_transpositions in (False, True):
+			serial = self._importer(1, merge_transpositions)
+			serial._read_studies([])
+			parallel = self._importer(4, merge_transpositions)
+			parallel._read_studies([])
+
+			self.assertEqual(dump_cards(serial.cards.cards),
+			                 dump_cards(parallel.cards.cards))
+
+	@patch('src.importer.MIN_BYTES_PER_WORKER', 1)
+	@patch('src.utils.can_fork', return_value=False)
+	def test_without_fork(self, _can_fork):
+		serial = self._importer(1, False)
+		serial._read_studies([])
+		with patch('src.importer.process_pool') as process_pool:
+			importer = self._importer(4, False)
+			importer._read_studies([])
+			process_pool.assert_not_called()
+
+		self.assertEqual(dump_cards(serial.cards.cards), dump_cards(importer.cards.cards))
+
+	def test_parallel_wall_time(self):
+		self.filenames = []
+		for i in range(8):
+			filename = os.path.join(self.tmpdir.name, f'large-{i}.pgn')
+			with open(filename, 'w', encoding='utf-8') as file:
+				file.write(random_pgn(i, 50, 40))
+			self.filenames.append(filename)
+
+		timings = {}
+		for workers in (1, 4):
+			importer = self._importer(workers, False)
+			start = time.perf_counter()
+			importer._read_studies([])
+			timings[workers] = time.perf_counter() - start
+
+		print(f'serial: {timings[1]:.2f} s, 4 workers: {timings[4]:.2f} s'
+		      f' ({os.cpu_count()} CPUs)')
@@ -0,0 +1,140 @@
+import os
+import tempfile
+import unittest
+from collections import Counter
+from typing import List
+from unittest.mock import patch
+
+from anki.collection import Collection
+
+from src import importer
+from src.media_index import MediaIndex
+from src.parse_cache import ParseCache
+from src.study import parse_study
+from src.sync import DeckImport, Sync, configured_imports
+from src.utils import media_references
+
+COMMON = '''[Event "Sidelines"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bb5 a6 (3... Nf6 4. O-O) 4. Ba4 Nf6 5. O-O *
+'''
+
+SICILIAN = '''[Event "Sicilian"]
+
+1. e4 c5 2. Nf3 {[%cal Gd2d4]} d6 3. d4 *
+'''
+
+
+class TestSync(unittest.TestCase):
+	def setUp(self):
+		# pylint: disable=consider-using-with
+		self.tmpdir = tempfile.TemporaryDirectory()
+		self.collection = Collection(os.path.join(self.tmpdir.name, 'collection.anki2'))
+		notetype = self.collection.models.by_name('Basic')
+		assert notetype is not None
+		self.notetype_id = notetype['id']
+		self.media_dir = self.collection.media.dir()
+		self.first = self.collection.decks.id('Chess::First')
+		self.second = self.collection.decks.id('Chess::Second')
+		self.black = self.collection.decks.id('Chess::Black')
+
+	def tearDown(self):
+		self.collection.close()
+		self.tmpdir.cleanup()
+
+	def _write(self, name: str, pgn: str) -> str:
+		filename = os.path.join(self.tmpdir.name, name)
+		with open(filename, 'w', encoding='utf-8') as file:
+			file.write(pgn)
+
+		return filename
+
+	def _sync(self, imports: List[DeckImport]) -> Sync:
+		return Sync(
+		    collection=self.collection,
+		    imports=imports,
+		    notetype_id=self.notetype_id,
+		    cache=ParseCache(os.path.join(self.tmpdir.name, 'cache')),
+		    media_index=MediaIndex(os.path.join(self.tmpdir.name, 'index.sqlite'),
+		                           self.media_dir),
+		)
+
+	def _note_count(self, deck_id) -> int:
+		return len(self.collection.find_notes(f'did:{deck_id}'))
+
+	def test_configured_imports(self):
+		imports = configured_imports({
+		    'imports': {
+		        '12': {
+		            'colour': 'black',
+		            'files': ['a.pgn'],
+		        },
+		        '13': {
+		            'colour': 'white',
+		            'files': ['b.pgn'],
+		            'merge_transpositions': True,
+		        },
+		        '14': {
+		            'colour': 'white',
+		            'files': [],
+		        },
+		    }
+		})
+		self.assertEqual([
+		    DeckImport(12, 'black', ['a.pgn'], False),
+		    DeckImport(13, 'white', ['b.pgn'], True),
+		], imports)
+
+	def test_shared_files(self):
+		common = self._write('common.pgn', COMMON)
+		sicilian = self._write('sicilian.pgn', SICILIAN)
+		sync = self._sync([
+		    DeckImport(self.first, 'white', [common], False),
+		    DeckImport(self.second, 'white', [common, sicilian], False),
+		    DeckImport(self.black, 'black', [common], False),
+		    DeckImport(1234, 'white', [sicilian], False),
+		])
+		self.assertEqual(3, len(sync.importers))
+
+		with patch.object(importer, 'parse_study', wraps=parse_study) as reader:
+			counts = sync.run()
+
+		# Every file is only read once for every colour.
+		self.assertEqual(Counter({
+		    common: 2,
+		    sicilian: 1
+		}), Counter(call[0][0] for call in reader.call_args_list))
+
+		self.assertEqual([6, 8], [counts[0][0], counts[1][0]])
+		self.assertEqual(6, self._note_count(self.first))
+		self.assertEqual(8, self._note_count(self.second))
+		self.assertLess(0, self._note_count(self.black))
+
+		# All decks are undone together.
+		self.collection.undo()
+		for deck_id in (self.first, self.second, self.black):
+			self.assertEqual(0, self._note_count(deck_id))
+
+	def test_shared_images(self):
+		# The images that the first deck no longer needs are needed by the
+		# second one, which does not have the notes yet.
+		common = self._write('common.pgn', COMMON)
+		self._sync([DeckImport(self.first, 'white', [common], False)]).run()
+		images = set(os.listdir(self.media_dir))
+
+		sicilian = self._write('sicilian.pgn', SICILIAN)
+		counts = self._sync([
+		    DeckImport(self.first, 'white', [sicilian], False),
+		    DeckImport(self.second, 'white', [common], False),
+		]).run()
+
+		# Only the note for the first move is kept in the first deck.
+		self.assertEqual(5, counts[0][2])
+		self.assertEqual(0, counts[0][4])
+		self.assertEqual((6, 0, 0, 0, 0), counts[1])
+		self.assertLessEqual(images, set(os.listdir(self.media_dir)))
+
+		for note_id in self.collection.find_notes(''):
+			note = self.collection.get_note(note_id)
+			for image in media_references(note.fields):
+				self.assertTrue(os.path.exists(os.path.join(self.media_dir, image)))
@@ -38,6 +38,9 @@ default_config = {
 	'imports': {},
 	# This is the id of the notetype "Einfach", the German version of "Basic".
 	'notetype': '222222',
+	'workers': 1,
+	'profile': False,
+	'watch': False,
 }
 
 
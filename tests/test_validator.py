@@ -0,0 +1,96 @@
+import copy
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+import jsonschema
+
+from src import validator
+from src.schema import schema
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+
+CONFIG = {
+	'version': '1.1.0',
+	'colour': 'black',
+	'decks': {
+		'white': 1234,
+		'black': None,
+	},
+	'imports': {
+		'1234': {
+			'colour': 'white',
+			'files': ['/path/to/white.pgn'],
+			'merge_transpositions': True,
+		},
+	},
+	'notetype': 5678,
+	'workers': 0,
+	'profile': False,
+	'watch': True,
+}
+
+
+def changed(path, value):
+	config = copy.deepcopy(CONFIG)
+	*parents, key = path
+	record = config
+	for parent in parents:
+		record = record[parent]
+	if value is None and key in record:
+		del record[key]
+	else:
+		record[key] = value
+
+	return config
+
+
+INVALID = [
+	changed(['version'], '1.1'),
+	changed(['colour'], 'red'),
+	changed(['decks', 'black'], 0),
+	changed(['decks', 'white'], '1234'),
+	changed(['decks', 'green'], 1),
+	changed(['imports', 'deck'], {'colour': 'white', 'files': []}),
+	changed(['imports', '1234', 'files'], ['/path/to/white.pgn', 42]),
+	changed(['imports', '1234', 'colour'], None),
+	changed(['imports', '1234', 'merge_transpositions'], 1),
+	changed(['notetype'], None),
+	changed(['workers'], -1),
+	changed(['workers'], True),
+	changed(['watch'], 'yes'),
+	changed(['files'], {}),
+	[],
+]
+
+
+class TestValidator(unittest.TestCase):
+	def test_generated(self):
+		with open(os.path.join(ROOT, 'src', 'config.schema.json'), 'rb') as file:
+			generated = subprocess.run(
+			    [sys.executable, os.path.join(ROOT, 'tools', 'json2validator.py')],
+			    stdin=file,
+			    capture_output=True,
+			    text=True,
+			    check=True).stdout
+		with open(os.path.join(ROOT, 'src', 'validator.py'), encoding='utf-8') as file:
+			self.assertEqual(file.read(), generated,
+			                 'src/validator.py is outdated, run "make src/validator.py"')
+
+	def test_valid(self):
+		with open(os.path.join(ROOT, 'src', 'config.json'), encoding='utf-8') as file:
+			default = json.load(file)
+		for config in [CONFIG, default]:
+			jsonschema.validate(config, schema=schema)
+			validator.validate(config)
+
+	def test_invalid(self):
+		# The same as with jsonschema.
+		for config in INVALID:
+			with self.subTest(config=config):
+				with self.assertRaises(jsonschema.ValidationError):
+					jsonschema.validate(config, schema=schema)
+				with self.assertRaises(validator.ValidationError):
+					validator.validate(config)
@@ -0,0 +1,212 @@
+import time
+import unittest
+from typing import Any, Callable, Dict, List, Tuple
+from unittest.mock import patch
+
+import chess
+import chess.pgn
+import pytest
+
+from src.visitor import PositionVisitor
+
+from .synthetic import random_pgn, read
+
+PGN = '''[Event "Test"]
+
+1. e4 e5 (1... c5 2. Nf3 d6 (2... Nc6 3. d4) 3. d4 cxd4 4. Nxd4 Nf6
+5. Nc3 a6) 2. Nf3 Nc6 3. Bb5 (3. Bc4 Bc5 4. c3 Nf6 5. d4 exd4 6. cxd4 Bb4+
+7. Bd2 Bxd2+ 8. Nbxd2) 3... a6 4. Ba4 Nf6 5. O-O Be7 6. Re1 b5 7. Bb3 d6
+8. c3 O-O 9. h3 Na5 10. Bc2 c5 11. d4 Qc7 *
+
+[Event "Custom start"]
+[FEN "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4"]
+[SetUp "1"]
+
+4. Ng5 d5 (4... Bc5 5. Nxf7) 5. exd5 Na5 6. Bb5+ c6 7. dxc6 bxc6 8. Qf3 *
+
+[Event "Promotion"]
+[FEN "8/P4k2/8/8/8/8/5K2/8 w - - 0 1"]
+[SetUp "1"]
+
+1. a8=Q Ke6 (1... Kg6 2. Qg8+) 2. Qe8+ *
+'''
+
+GERMAN = {
+	'p': 'b',
+	'n': 's',
+	'b': 'l',
+	'r': 't',
+	'q': 'd',
+	'k': 'k',
+}
+
+
+TRANSPOSITIONS = '''[Event "Catalan"]
+
+1. d4 Nf6 2. c4 e6 3. g3 d5 4. Bg2 Be7 (4... dxc4 5. Nf3) 5. Nf3 O-O 6. O-O *
+
+[Event "Catalan via Nf3"]
+
+1. d4 Nf6 2. c4 e6 3. Nf3 d5 4. g3 Be7 5. Bg2 O-O 6. Qc2 {Main line.} *
+'''
+
+TRANSPOSED = (
+	'1. d4 Nf6 2. c4 e6 3. g3 d5 4. Bg2 Be7 5. Nf3 O-O',
+	'1. d4 Nf6 2. c4 e6 3. Nf3 d5 4. g3 Be7 5. Bg2 O-O',
+)
+
+
+def german(msgid: str) -> str:
+	return GERMAN.get(msgid, msgid)
+
+
+def _counting(method: Callable, counts: Dict[str, int], name: str) -> Callable:
+	def wrapper(*args: Any, **kwargs: Any) -> Any:
+		counts[name] += 1
+		return method(*args, **kwargs)
+
+	return wrapper
+
+
+class ReferenceVisitor(chess.pgn.BaseVisitor):
+	# The key generation that the add-on used to do, replaying the whole
+	# line for every move.
+	def __init__(self, colour: chess.Color):
+		self.colour = colour
+		self.initial = chess.Board()
+		self.has_board = False
+		self.moves: List[Tuple[str, str]] = []
+
+	def begin_game(self):
+		self.has_board = False
+
+	def visit_board(self, board):
+		if not self.has_board:
+			self.initial = board.copy()
+			self.has_board = True
+
+	def visit_move(self, board, move):
+		if board.turn != self.colour:
+			return
+
+		def piece_symbol(piece_type: chess.PieceType) -> str:
+			return german(chess.PIECE_SYMBOLS[piece_type])
+
+		saved_piece_symbol = chess.piece_symbol
+		chess.piece_symbol = piece_symbol
+		try:
+			if board.ply():
+				text = self.initial.variation_san(board.move_stack)
+			else:
+				text = _('Moves from starting position?')
+			san = board.san(move)
+		finally:
+			chess.piece_symbol = saved_piece_symbol
+		self.moves.append((text, san))
+
+	def result(self):
+		return True
+
+
+class TestVisitor(unittest.TestCase):
+	def _compare(self, colour: chess.Color):
+		reference = ReferenceVisitor(colour)
+		read(PGN, reference)
+
+		visitor = PositionVisitor(colour)
+		read(PGN, visitor)
+
+		got: Dict[str, List[str]] = {}
+		for text, question in visitor.cards.items():
+			got[text] = [answer.move for answer in question.answers]
+
+		wanted: Dict[str, List[str]] = {}
+		for text, san in reference.moves:
+			sans = wanted.setdefault(text, [])
+			if san not in sans:
+				sans.append(san)
+
+		self.assertEqual(list(wanted.items()), list(got.items()))
+
+	@patch('builtins._', german)
+	def test_keys_white(self):
+		self._compare(chess.WHITE)
+
+	@patch('builtins._', german)
+	def test_keys_black(self):
+		self._compare(chess.BLACK)
+
+	def test_one_san_per_move(self):
+		pgn = random_pgn(seed=1, lines=5, depth=60)
+		num_moves = 5 * 60
+
+		calls: Dict[str, int] = {'san': 0}
+		original_san = chess.Board.san
+
+		def san(board: chess.Board, move: chess.Move) -> str:
+			calls['san'] += 1
+			return original_san(board, move)
+
+		visitor = PositionVisitor(chess.WHITE)
+		with patch.object(chess.Board, 'san', san):
+			read(pgn, visitor)
+
+		self.assertEqual(num_moves, calls['san'])
+
+	def test_cost_per_move_is_flat(self):
+		# The same number of plies, once as many short and once as few
+		# deep lines.  Re-deriving the move text from the start of the
+		# line made the deep variant about 30 times slower.  The work on
+		# the boards must not grow with the depth.
+		plies = 4800
+		calls: Dict[int, Dict[str, int]] = {}
+		for depth in (16, 160):
+			counts = calls[depth] = {'san': 0, 'push': 0, 'copy': 0}
+			pgn = random_pgn(seed=depth, lines=plies // depth, depth=depth)
+			with patch.multiple(chess.Board, **{
+			    name: _counting(getattr(chess.Board, name), counts, name)
+			    for name in counts
+			}):
+				read(pgn, PositionVisitor(chess.WHITE))
+
+		for name, count in calls[160].items():
+			self.assertLess(count, 1.1 * calls[16][name], name)
+
+	@pytest.mark.benchmark
+	def test_time_per_move_is_flat(self):
+		timings: Dict[int, float] = {}
+		plies = 4800
+		for depth in (16, 160):
+			pgn = random_pgn(seed=depth, lines=plies // depth, depth=depth)
+			visitor = PositionVisitor(chess.WHITE)
+			start = time.perf_counter()
+			read(pgn, visitor)
+			timings[depth] = (time.perf_counter() - start) / plies
+
+		for depth, seconds in timings.items():
+			print(f'depth {depth}: {seconds * 1e6:.1f} µs per ply')
+
+		self.assertLess(timings[160], 3 * timings[16])
+
+	def test_transpositions_separate(self):
+		visitor = PositionVisitor(chess.WHITE)
+		read(TRANSPOSITIONS, visitor)
+
+		first = visitor.cards[TRANSPOSED[0]]
+		second = visitor.cards[TRANSPOSED[1]]
+		self.assertEqual(first.position, second.position)
+		self.assertEqual(TRANSPOSED[0], visitor.positions[second.position])
+		self.assertListEqual(['O-O'], [answer.move for answer in first.answers])
+		self.assertListEqual(['Qc2'], [answer.move for answer in second.answers])
+
+	def test_transpositions_merged(self):
+		visitor = PositionVisitor(chess.WHITE, merge_transpositions=True)
+		read(TRANSPOSITIONS, visitor)
+
+		self.assertNotIn(TRANSPOSED[1], visitor.cards)
+
+		question = visitor.cards[TRANSPOSED[0]]
+		self.assertListEqual(['O-O', 'Qc2'],
+		                     [answer.move for answer in question.answers])
+		self.assertListEqual(['Main line.'], question.answers[1].comments)
+		self.assertEqual(len(visitor.positions), len(visitor.cards))
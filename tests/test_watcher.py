@@ -0,0 +1,141 @@
+import os
+import tempfile
+import unittest
+
+from src.parse_cache import ParseCache, import_key
+from src.sync import DeckImport
+from src.watcher import UNKNOWN_STATE, FileWatcher, file_state, imported_states
+
+
+class Clock:
+	# pylint: disable=too-few-public-methods
+	def __init__(self) -> None:
+		self.now = 100.0
+
+	def __call__(self) -> float:
+		return self.now
+
+
+class TestWatcher(unittest.TestCase):
+	def setUp(self):
+		# pylint: disable=consider-using-with
+		self.tmpdir = tempfile.TemporaryDirectory()
+		self.common = self._write('common.pgn', '1. e4 *\n')
+		self.black = self._write('black.pgn', '1. d4 *\n')
+		self.imports = [
+		    DeckImport(1, 'white', [self.common], False),
+		    DeckImport(2, 'black', [self.common, self.black], False),
+		]
+		self.clock = Clock()
+		self.watcher = FileWatcher(settle_time=2, retry_time=30, clock=self.clock)
+
+	def tearDown(self):
+		self.tmpdir.cleanup()
+
+	def _write(self, name: str, pgn: str) -> str:
+		filename = os.path.join(self.tmpdir.name, name)
+		with open(filename, 'w', encoding='utf-8') as file:
+			file.write(pgn)
+
+		return filename
+
+	def _poll(self, seconds: float = 1):
+		self.clock.now += seconds
+		return [deck_import.deck_id for deck_import in self.watcher.poll(self.imports)]
+
+	def _imported(self):
+		self.watcher.imported(self.imports)
+
+	def test_modified(self):
+		# The first poll only remembers the files.
+		self.assertEqual([], self._poll())
+		self.assertEqual([], self._poll())
+
+		self._write('black.pgn', '1. d4 d5 *\n')
+		self.assertEqual([], self._poll())
+		self.assertEqual([], self._poll())
+		self.assertEqual([2], self._poll())
+		self._imported()
+		self.assertEqual([], self._poll(10))
+
+		self._write('common.pgn', '1. e4 e5 *\n')
+		self._poll()
+		self.assertEqual([1, 2], self._poll(5))
+		self._imported()
+		self.assertEqual([], self._poll(10))
+
+	def test_failed(self):
+		self._poll()
+		self._write('black.pgn', '1. d4 d5 *\n')
+		self._poll()
+		self.assertEqual([2], self._poll(5))
+		self.watcher.import_failed(self.imports)
+
+		# Reported again, but not before the retry time.
+		self.assertEqual([], self._poll(5))
+		self.assertEqual([], self._poll(5))
+		self.assertEqual([2], self._poll(30))
+		self._imported()
+		self.assertEqual([], self._poll(30))
+		self.assertEqual([], self._poll(30))
+
+	def test_changed_while_importing(self):
+		self._poll()
+		self._write('black.pgn', '1. d4 d5 *\n')
+		self._poll()
+		self.assertEqual([2], self._poll(5))
+		self._write('black.pgn', '1. d4 d5 2. c4 *\n')
+		self._imported()
+		self._poll()
+		self.assertEqual([2], self._poll(5))
+
+	def test_imported_states(self):
+		cache = ParseCache(os.path.join(self.tmpdir.name, 'cache'))
+
+		def record(*paths):
+			return {'files': [list(cache.fingerprint(path)) for path in paths]}
+
+		# The file for white was modified after the last import of the deck
+		# for white.  Nothing is known about a deck that was never
+		# imported.
+		cache.store_import(import_key('collection.anki2', 2),
+		                   record(self.common, self.black))
+		self._write('common.pgn', '1. e4 e5 *\n')
+		os.utime(self.common, ns=(1, 1))
+		cache.store_import(import_key('collection.anki2', 1), record(self.common))
+		self.assertEqual({
+		    self.common: UNKNOWN_STATE,
+		    self.black: file_state(self.black),
+		}, imported_states(cache, 'collection.anki2', self.imports))
+		self.assertEqual({}, imported_states(cache, 'other.anki2', self.imports))
+
+		# Modified while Anki was not running.
+		self.watcher = FileWatcher(imported_states(cache, 'collection.anki2', self.imports),
+		                           settle_time=2,
+		                           clock=self.clock)
+		self._write('black.pgn', '1. d4 d5 *\n')
+		self._poll()
+		self.assertEqual([1, 2], self._poll(5))
+		self._imported()
+		self.assertEqual([], self._poll(5))
+
+	def test_debounce(self):
+		self._poll()
+		self._write('common.pgn', '1. e4 e5 *\n')
+		self._poll()
+
+		# Still being written.
+		self._write('common.pgn', '1. e4 e5 2. Nf3 *\n')
+		self.assertEqual([], self._poll(3))
+		self.assertEqual([], self._poll(1))
+		self.assertEqual([1, 2], self._poll(1))
+
+	def test_missing(self):
+		self._poll()
+		os.unlink(self.black)
+		self._poll()
+		self.assertEqual([], self._poll(5))
+
+		self._write('black.pgn', '1. d4 Nf6 *\n')
+		self._poll()
+		self.assertEqual([2], self._poll(5))
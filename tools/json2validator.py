@@ -0,0 +1,156 @@
+import json
+import sys
+from typing import Any, Dict, List
+
+# Checks for the types of JSON schema, for the value in "data".
+TYPES = {
+	'object': 'isinstance(data, dict)',
+	'array': 'isinstance(data, list)',
+	'string': 'isinstance(data, str)',
+	'integer': '(isinstance(data, int) and not isinstance(data, bool))',
+	'number': '(isinstance(data, (int, float)) and not isinstance(data, bool))',
+	'boolean': 'isinstance(data, bool)',
+	'null': 'data is None',
+}
+
+# Keywords that do not change what is valid.
+ANNOTATIONS = {'$schema', '$id', 'title', 'description', 'default'}
+
+HEADER = '''# Generated from config.schema.json by tools/json2validator.py.  Do not
+# edit, but run "make src/validator.py" after changing the schema.
+
+import re
+from typing import Any
+
+
+class ValidationError(ValueError):
+	def __init__(self, path: str, message: str) -> None:
+		super().__init__(f'{path or "/"}: {message}')
+		self.path = path
+
+
+def validate(data: Any) -> None:
+	_validate_0(data, '')
+'''
+
+
+class Generator:
+	def __init__(self) -> None:
+		self.functions: List[str] = []
+		self.patterns: List[str] = []
+		# Identical schemas share one function.
+		self.names: Dict[str, str] = {}
+
+	def generate(self, schema: Dict[str, Any]) -> str:
+		self.node(schema)
+		code = HEADER
+		if self.patterns:
+			code += '\n\n' + ''.join(f'_PATTERN_{i} = re.compile({pattern!r})\n'
+			                        for i, pattern in enumerate(self.patterns))
+		for function in self.functions:
+			code += '\n\n' + function
+
+		return code
+
+	def pattern(self, regex: str) -> str:
+		if regex not in self.patterns:
+			self.patterns.append(regex)
+
+		return f'_PATTERN_{self.patterns.index(regex)}'
+
+	def node(self, schema: Dict[str, Any]) -> str:
+		unsupported = set(schema) - ANNOTATIONS - {
+		    'type', 'enum', 'pattern', 'minimum', 'required', 'properties',
+		    'patternProperties', 'additionalProperties', 'items'
+		}
+		if unsupported:
+			raise ValueError(f'unsupported keywords: {", ".join(sorted(unsupported))}')
+
+		key = json.dumps({k: v for k, v in schema.items() if k not in ANNOTATIONS},
+		                 sort_keys=True)
+		if key in self.names:
+			return self.names[key]
+
+		index = len(self.functions)
+		name = self.names[key] = f'_validate_{index}'
+		self.functions.append('')
+
+		lines = [f'def {name}(data: Any, path: str) -> None:']
+		if 'type' in schema:
+			types = schema['type'] if isinstance(schema['type'], list) else [schema['type']]
+			check = ' or '.join(TYPES[t] for t in types)
+			if len(types) > 1:
+				check = f'({check})'
+			lines += [
+			    f'\tif not {check}:',
+			    f'\t\traise ValidationError(path, {"must be " + " or ".join(types)!r})',
+			]
+		if 'enum' in schema:
+			lines += [
+			    f'\tif data not in {tuple(schema["enum"])!r}:',
+			    f'\t\traise ValidationError(path, {"must be one of " + ", ".join(map(json.dumps, schema["enum"]))!r})',
+			]
+		if 'pattern' in schema:
+			lines += [
+			    f'\tif isinstance(data, str) and not {self.pattern(schema["pattern"])}.search(data):',
+			    f'\t\traise ValidationError(path, {"must match " + schema["pattern"]!r})',
+			]
+		if 'minimum' in schema:
+			lines += [
+			    f'\tif {TYPES["number"]} and data < {schema["minimum"]!r}:',
+			    f'\t\traise ValidationError(path, {"must be at least " + str(schema["minimum"])!r})',
+			]
+		lines += self.object(schema)
+		if 'items' in schema:
+			lines += [
+			    '\tif isinstance(data, list):',
+			    '\t\tfor i, item in enumerate(data):',
+			    f'\t\t\t{self.node(schema["items"])}(item, f\'{{path}}/{{i}}\')',
+			]
+		if len(lines) == 1:
+			lines.append('\tpass')
+
+		self.functions[index] = '\n'.join(lines) + '\n'
+
+		return name
+
+	def object(self, schema: Dict[str, Any]) -> List[str]:
+		properties = schema.get('properties', {})
+		patterns = schema.get('patternProperties', {})
+		closed = schema.get('additionalProperties', True) is False
+		if not properties and not patterns and not closed and 'required' not in schema:
+			return []
+
+		lines = ['\tif isinstance(data, dict):']
+		for key in schema.get('required', []):
+			lines += [
+			    f'\t\tif {key!r} not in data:',
+			    f'\t\t\traise ValidationError(path, {"needs " + key!r})',
+			]
+		if not properties and not patterns and not closed:
+			return lines
+
+		lines.append('\t\tfor key, value in data.items():')
+		if closed:
+			lines.append('\t\t\tknown = False')
+		for i, (key, subschema) in enumerate(properties.items()):
+			lines.append(f'\t\t\t{"if" if i == 0 else "elif"} key == {key!r}:')
+			if closed:
+				lines.append('\t\t\t\tknown = True')
+			lines.append(f'\t\t\t\t{self.node(subschema)}(value, f\'{{path}}/{{key}}\')')
+		for regex, subschema in patterns.items():
+			lines.append(f'\t\t\tif {self.pattern(regex)}.search(key):')
+			if closed:
+				lines.append('\t\t\t\tknown = True')
+			lines.append(f'\t\t\t\t{self.node(subschema)}(value, f\'{{path}}/{{key}}\')')
+		if closed:
+			lines += [
+			    '\t\t\tif not known:',
+			    '\t\t\t\traise ValidationError(path, f\'unexpected property {key}\')',
+			]
+
+		return lines
+
+
+if __name__ == '__main__':
+	print(Generator().generate(json.load(sys.stdin)), end='')
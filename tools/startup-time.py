@@ -0,0 +1,70 @@
+#! /usr/bin/env python3
+
+# Measures how much the add-on adds to the time that Anki spends importing
+# modules on startup:
+#
+#     python3 tools/startup-time.py [--top N] [ADDON_DIR]
+#
+# Needs the packages "anki" and "aqt" from requirements/dev.txt.  Anki's
+# own modules are imported first, because Anki has loaded them anyway when
+# it loads the add-ons.  Every module imported after that is counted for
+# the add-on.
+
+import argparse
+import os
+import subprocess
+import sys
+
+CHILD = '''
+import importlib.util, os, sys
+import aqt
+sys.stderr.write('--- add-on ---\\n')
+sys.stderr.flush()
+directory = sys.argv[1]
+sys.path.append(os.path.join(directory, 'vendor'))
+spec = importlib.util.spec_from_file_location(
+    'chess_opening_trainer', os.path.join(directory, '__init__.py'),
+    submodule_search_locations=[directory])
+module = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = module
+spec.loader.exec_module(module)
+'''
+
+
+def measure(directory: str):
+	result = subprocess.run([sys.executable, '-X', 'importtime', '-c', CHILD, directory],
+	                        capture_output=True,
+	                        text=True,
+	                        check=True)
+	anki, addon = [], []
+	current = anki
+	for line in result.stderr.splitlines():
+		if line == '--- add-on ---':
+			current = addon
+		elif line.startswith('import time:') and '|' in line:
+			self_us, _, name = line[len('import time:'):].split('|')
+			if self_us.strip().isdigit():
+				current.append((int(self_us), name.strip()))
+
+	return anki, addon
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser()
+	parser.add_argument('directory', nargs='?', default='src')
+	parser.add_argument('--top', type=int, default=10)
+	args = parser.parse_args()
+
+	anki, addon = measure(os.path.abspath(args.directory))
+	anki_us = sum(us for us, _ in anki)
+	addon_us = sum(us for us, _ in addon)
+	total_us = anki_us + addon_us
+	print(f'Anki:   {anki_us / 1000:8.1f} ms, {len(anki)} modules')
+	print(f'add-on: {addon_us / 1000:8.1f} ms, {len(addon)} modules'
+	      f' ({100 * addon_us / total_us:.1f} % of {total_us / 1000:.1f} ms)')
+	for us, name in sorted(addon, reverse=True)[:args.top]:
+		print(f'  {us / 1000:8.1f} ms  {name}')
+
+
+if __name__ == '__main__':
+	main()